@@ -0,0 +1,172 @@
+"""
+Benchmark authenticate latency against the size of the users table.
+
+For each table size the script times the username lookup through the
+``username_hash`` index, the lookup that decrypted every row before it, and
+a full authentication (indexed lookup plus bcrypt verification).
+
+The users table of ``DATABASE_URL`` is dropped and refilled, so point it at
+a scratch database with pgcrypto installed:
+
+    python -m benchmarks.authenticate --reset --sizes 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Callable, List
+
+from sqlalchemy import text
+
+from src.config import DB_ENCRYPTION_KEY
+from src.crud import get_user_by_username, hash_username
+from src.database import AsyncSessionLocal, Base, async_engine, engine
+from src.jwt import get_password_executor, hash_password, verify_password_async
+
+INSERT_BATCH_SIZE = 10000
+PASSWORD = "benchmark-password"
+
+# The lookup get_user_by_username used before username_hash existed.
+DECRYPT_SCAN_QUERY = text(
+    """
+    SELECT id, pgp_sym_decrypt(username, :key) AS decrypted_username, hashed_password
+    FROM users
+    WHERE pgp_sym_decrypt(username, :key) = :username
+"""
+)
+
+
+def username(index: int) -> str:
+    return f"user{index:08d}"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(label: str, size: int, samples: List[float]):
+    print(
+        f"{label:<14} {size:>9} {len(samples):>7} "
+        f"{statistics.mean(samples) * 1000:>9.2f} "
+        f"{percentile(samples, 0.5) * 1000:>9.2f} "
+        f"{percentile(samples, 0.99) * 1000:>9.2f}"
+    )
+
+
+def fill_users(start: int, stop: int, hashed_password: str):
+    """
+    Insert users ``start`` to ``stop - 1`` in batches.
+    """
+    with engine.begin() as conn:
+        for batch_start in range(start, stop, INSERT_BATCH_SIZE):
+            names = [
+                username(index)
+                for index in range(
+                    batch_start, min(stop, batch_start + INSERT_BATCH_SIZE)
+                )
+            ]
+            conn.execute(
+                text(
+                    """
+                    INSERT INTO users (username, username_hash, hashed_password)
+                    SELECT pgp_sym_encrypt(u.username, :key), u.username_hash,
+                           :hashed_password
+                    FROM unnest(CAST(:usernames AS text[]),
+                                CAST(:username_hashes AS text[]))
+                        AS u(username, username_hash)
+                """
+                ),
+                {
+                    "key": DB_ENCRYPTION_KEY,
+                    "usernames": names,
+                    "username_hashes": [hash_username(name) for name in names],
+                    "hashed_password": hashed_password,
+                },
+            )
+        conn.execute(text("ANALYZE users"))
+
+
+async def time_calls(count: int, size: int, call: Callable) -> List[float]:
+    samples = []
+    for _ in range(count):
+        name = username(random.randrange(size))
+        start = time.perf_counter()
+        await call(name)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def run(sizes: List[int], lookups: int, scan_lookups: int, auths: int):
+    get_password_executor()
+    hashed_password = hash_password(PASSWORD)
+
+    async def indexed_lookup(name: str):
+        async with AsyncSessionLocal() as db:
+            assert await get_user_by_username(db, name) is not None
+
+    async def decrypt_scan(name: str):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                DECRYPT_SCAN_QUERY, {"key": DB_ENCRYPTION_KEY, "username": name}
+            )
+            assert result.fetchone() is not None
+
+    async def authenticate(name: str):
+        async with AsyncSessionLocal() as db:
+            user = await get_user_by_username(db, name)
+        assert await verify_password_async(PASSWORD, user.hashed_password)
+
+    print(f"{'lookup':<14} {'users':>9} {'calls':>7}", end=" ")
+    print(f"{'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    filled = 0
+    for size in sorted(sizes):
+        fill_users(filled, size, hashed_password)
+        filled = size
+        report("index", size, await time_calls(lookups, size, indexed_lookup))
+        if scan_lookups:
+            report(
+                "decrypt scan", size, await time_calls(scan_lookups, size, decrypt_scan)
+            )
+        if auths:
+            report("authenticate", size, await time_calls(auths, size, authenticate))
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark authenticate latency.")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument(
+        "--scan-lookups",
+        type=int,
+        default=20,
+        help="lookups through the old decrypt scan per size; 0 skips it",
+    )
+    parser.add_argument(
+        "--auths",
+        type=int,
+        default=50,
+        help="full authentications (lookup and bcrypt) per size; 0 skips them",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="required: drop and recreate the users table",
+    )
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("this drops the users table of DATABASE_URL; pass --reset")
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS users"))
+    Base.metadata.create_all(bind=engine)
+    asyncio.run(run(args.sizes, args.lookups, args.scan_lookups, args.auths))
+
+
+if __name__ == "__main__":
+    main()
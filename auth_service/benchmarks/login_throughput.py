@@ -0,0 +1,121 @@
+"""
+Benchmark authentications per second and per core.
+
+``/authenticate`` is driven through the application in-process with
+``--concurrency`` clients, once for every combination of password hashing
+executor kind and worker count. Each worker runs one bcrypt check at a time,
+so the rate per core is the rate divided by the number of workers that can
+run at once.
+
+One benchmark user is registered in the users table of ``DATABASE_URL`` if
+it does not exist yet:
+
+    python -m benchmarks.login_throughput --executors thread process --workers 1 4
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+from typing import List
+
+import httpx
+
+from src import jwt as jwt_module
+from src.main import app
+
+USERNAME = "benchmark-user"
+PASSWORD = "benchmark-password"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def drive(client: httpx.AsyncClient, requests: int, concurrency: int):
+    """
+    Send ``requests`` authentications from ``concurrency`` concurrent clients.
+
+    Returns:
+        List[float]: The latency of each authentication, in seconds.
+    """
+    latencies: List[float] = []
+    remaining = iter(range(requests))
+    credentials = {"username": USERNAME, "password": PASSWORD}
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.post("/authenticate", json=credentials)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def measure(executor: str, workers: int, requests: int, concurrency: int):
+    jwt_module.PASSWORD_HASH_EXECUTOR = executor
+    jwt_module.PASSWORD_HASH_WORKERS = workers
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://auth"
+    ) as client:
+        response = await client.post(
+            "/register", json={"username": USERNAME, "password": PASSWORD}
+        )
+        if response.status_code not in (201, 400):
+            response.raise_for_status()
+        # Warm up the executor, the database pool and the process workers.
+        await drive(client, workers * 2, concurrency)
+        start = time.perf_counter()
+        latencies = await drive(client, requests, concurrency)
+        elapsed = time.perf_counter() - start
+
+    rate = requests / elapsed
+    cores = min(workers, os.cpu_count() or 1)
+    print(
+        f"{executor:<8} {workers:>7} {requests:>8} {rate:>8.1f} {rate / cores:>9.1f} "
+        f"{statistics.mean(latencies) * 1000:>9.1f} "
+        f"{percentile(latencies, 0.99) * 1000:>9.1f}"
+    )
+
+
+async def run(
+    executors: List[str], workers: List[int], requests: int, concurrency: int
+):
+    # The client would otherwise log every request it sends.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(f"{'executor':<8} {'workers':>7} {'requests':>8} {'auth/s':>8}", end=" ")
+    print(f"{'per core':>9} {'mean ms':>9} {'p99 ms':>9}")
+    for executor in executors:
+        for count in workers:
+            await measure(executor, count, requests, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark authentications/sec.")
+    parser.add_argument(
+        "--executors",
+        nargs="+",
+        choices=["thread", "process"],
+        default=["thread", "process"],
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1, os.cpu_count() or 1],
+        help="password hashing worker counts to measure",
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args.executors, args.workers, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark the start-up time of the service entry points.
+
+Each entry point module is imported ``--runs`` times, every time in a fresh
+interpreter, as the container does on start. The import time is measured
+inside the interpreter and the process time around it, which adds the
+interpreter start-up. The log handlers ``setup_logger`` creates during the
+import are counted too; every module calls it, and only the first call
+should install handlers.
+
+The service's usual environment variables must be set, but nothing is
+connected to:
+
+    python -m benchmarks.startup --runs 20
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+ENTRY_POINTS = ["src.main"]
+
+# Run in the fresh interpreter: import the entry point, counting the
+# New Relic handlers created meanwhile, and report the import time.
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+from src import logger
+created = 0
+init = logger.NewRelicHandler.__init__
+def counting_init(self, *args, **kwargs):
+    global created
+    created += 1
+    init(self, *args, **kwargs)
+logger.NewRelicHandler.__init__ = counting_init
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({"import": elapsed, "handlers": created}))
+"""
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(module: str, runs: int):
+    imports, processes, handlers = [], [], set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT, module],
+            capture_output=True,
+            text=True,
+        )
+        processes.append(time.perf_counter() - start)
+        if process.returncode != 0:
+            raise SystemExit(f"Importing {module} failed:\n{process.stderr}")
+        result = json.loads(process.stdout.splitlines()[-1])
+        imports.append(result["import"])
+        handlers.add(result["handlers"])
+    print(
+        f"{module:<12} {runs:>5} {statistics.mean(imports) * 1000:>10.1f} "
+        f"{percentile(imports, 0.5) * 1000:>10.1f} "
+        f"{percentile(imports, 0.99) * 1000:>10.1f} "
+        f"{statistics.mean(processes) * 1000:>11.1f} "
+        f"{'/'.join(str(count) for count in sorted(handlers)):>9}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark start-up time.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--modules", nargs="+", default=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    print(f"{'module':<12} {'runs':>5} {'import ms':>10} {'p50 ms':>10}", end=" ")
+    print(f"{'p99 ms':>10} {'process ms':>11} {'handlers':>9}")
+    for module in args.modules:
+        measure(module, args.runs)
+
+
+if __name__ == "__main__":
+    main()
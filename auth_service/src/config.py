@@ -6,9 +6,34 @@ from decouple import config
 
 # Define PostgreSQL settings
 DATABASE_URL = config("DATABASE_URL")
+ASYNC_DATABASE_URL = config(
+    "ASYNC_DATABASE_URL",
+    default=DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+)
+DB_POOL_SIZE = config("DB_POOL_SIZE", default=10, cast=int)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", default=10, cast=int)
 DB_ENCRYPTION_KEY = config("DB_ENCRYPTION_KEY")
 
+# Key of the deterministic username lookup hash. When unset, a separate key is
+# derived from DB_ENCRYPTION_KEY with HKDF, so the encryption key itself is
+# never used for hashing. Changing it requires ``python -m src.migrations
+# --rehash``.
+USERNAME_HASH_KEY = config("USERNAME_HASH_KEY", default="")
+USERNAME_HASH_BACKFILL_BATCH_SIZE = config(
+    "USERNAME_HASH_BACKFILL_BATCH_SIZE", default=1000, cast=int
+)
+
+# Define registration settings
+BULK_REGISTER_MAX_USERS = config("BULK_REGISTER_MAX_USERS", default=1000, cast=int)
+
 # Define JWT settings
 JWT_SECRET_KEY = config("JWT_SECRET_KEY")
 JWT_ALGORITHM = config("JWT_ALGORITHM")
 JWT_ACCESS_TOKEN_EXPIRE_MINUTES = config("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", cast=int)
+
+# Define password hashing settings
+# bcrypt releases the GIL, so a thread pool scales across cores; "process"
+# isolates hashing from the event loop process entirely.
+BCRYPT_ROUNDS = config("BCRYPT_ROUNDS", default=12, cast=int)
+PASSWORD_HASH_EXECUTOR = config("PASSWORD_HASH_EXECUTOR", default="thread")
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=0, cast=int)
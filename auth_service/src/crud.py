@@ -2,81 +2,278 @@
 This module contains the CRUD operations for the User model.
 
 The username is encrypted before storing it in the database and
-decrypted when retrieving it for testing purposes.
+decrypted when retrieving it for testing purposes. Lookups go through
+the ``username_hash`` column, a keyed HMAC of the normalized username,
+so only the matching row is ever decrypted.
 """
 
+import asyncio
+import hashlib
+import hmac
+import time
+import unicodedata
+from typing import Dict, List, Tuple
+
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .config import DB_ENCRYPTION_KEY
-from .jwt import hash_password
+from .config import DB_ENCRYPTION_KEY, USERNAME_HASH_KEY
+from .jwt import hash_password_async
+from .metrics import registry
 from .models import User
 from .schemas import UserCreate
 
+USERNAME_HASH_KEY_INFO = b"auth_service username_hash"
+USERNAME_HASH_INDEX = "ix_users_username_hash"
+
+stage_seconds = registry.histogram(
+    "auth_stage_seconds",
+    "Time spent in each stage of registration and authentication.",
+    ["stage"],
+)
+
+
+class UsernameAlreadyRegisteredError(Exception):
+    """
+    Raised when a user is created with a username that is already taken.
+    """
+
+
+def derive_key(secret: str, info: bytes) -> bytes:
+    """
+    Derive a 32-byte subkey from a secret with HKDF-SHA256 (RFC 5869).
+
+    Args:
+        secret (str): The input keying material.
+        info (bytes): The context that distinguishes this subkey from others
+            derived from the same secret.
+
+    Returns:
+        bytes: The derived key.
+    """
+    pseudorandom_key = hmac.new(
+        bytes(hashlib.sha256().digest_size), secret.encode("utf-8"), hashlib.sha256
+    ).digest()
+    return hmac.new(pseudorandom_key, info + b"\x01", hashlib.sha256).digest()
+
+
+username_hash_key = (
+    USERNAME_HASH_KEY.encode("utf-8")
+    if USERNAME_HASH_KEY
+    else derive_key(DB_ENCRYPTION_KEY, USERNAME_HASH_KEY_INFO)
+)
+
+
+def hash_username(username: str) -> str:
+    """
+    Compute the deterministic lookup hash for a username.
+
+    The username is NFKC-normalized so visually identical spellings map to
+    the same hash, then hashed with HMAC-SHA256 under ``USERNAME_HASH_KEY``,
+    or a key derived from ``DB_ENCRYPTION_KEY`` if it is not set.
+
+    Args:
+        username (str): The plaintext username.
+
+    Returns:
+        str: The hex-encoded HMAC digest.
+    """
+    normalized = unicodedata.normalize("NFKC", username)
+    return hmac.new(
+        username_hash_key, normalized.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
 
-def create_user(db: Session, user: UserCreate):
+async def username_index_exists(db: AsyncSession) -> bool:
+    """
+    Check whether the unique index on ``username_hash`` exists.
+
+    Registration relies on it to reject duplicate usernames; it is missing
+    while usernames that normalize to the same name are unresolved.
+
+    Args:
+        db (AsyncSession): The database session.
+
+    Returns:
+        bool: True if the index exists.
+    """
+    result = await db.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"),
+        {"name": USERNAME_HASH_INDEX},
+    )
+    return bool(result.scalar_one())
+
+
+async def create_user(db: AsyncSession, user: UserCreate):
     """
     Create a new user in the database.
 
+    The username is encrypted inside the INSERT and the new ID comes back
+    with RETURNING, so registration is a single round-trip. Duplicates are
+    rejected by the unique index on ``username_hash``, so callers must check
+    that it exists with ``username_index_exists``.
+
     Parameters:
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
     - user (UserCreate): The user data to be created.
 
     Returns:
     - User: The created user object.
+
+    Raises:
+    - UsernameAlreadyRegisteredError: If the username is already taken.
     """
+    with stage_seconds.time(stage="hash_password"):
+        hashed_password = await hash_password_async(user.password)
+
+    start = time.perf_counter()
+    try:
+        user_id = (
+            await db.execute(
+                text(
+                    """
+                    INSERT INTO users (username, username_hash, hashed_password)
+                    VALUES (
+                        pgp_sym_encrypt(:username, :key),
+                        :username_hash,
+                        :hashed_password
+                    )
+                    RETURNING id
+                """
+                ),
+                {
+                    "username": user.username,
+                    "key": DB_ENCRYPTION_KEY,
+                    "username_hash": hash_username(user.username),
+                    "hashed_password": hashed_password,
+                },
+            )
+        ).scalar_one()
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise UsernameAlreadyRegisteredError(user.username) from exc
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage="insert_user")
 
-    # Encrypt the username before storing it
-    encrypted_username = db.execute(
-        text("SELECT pgp_sym_encrypt(:username, :key)"),
-        {"username": user.username, "key": DB_ENCRYPTION_KEY},
-    ).scalar()
+    return User(id=user_id, username=user.username, hashed_password=hashed_password)
 
-    db_user = User(
-        username=encrypted_username,
-        hashed_password=hash_password(user.password),
+
+async def create_users(
+    db: AsyncSession, users: List[UserCreate]
+) -> Tuple[List[User], List[str]]:
+    """
+    Create many users with a single INSERT.
+
+    Passwords are hashed concurrently on the password hashing executor.
+    Usernames that are already registered, or repeated within ``users``, are
+    skipped rather than failing the whole batch. Like ``create_user``, this
+    requires the unique index on ``username_hash``.
+
+    Parameters:
+    - db (AsyncSession): The database session.
+    - users (List[UserCreate]): The users to be created.
+
+    Returns:
+    - Tuple[List[User], List[str]]: The created users and the usernames that
+      were skipped.
+    """
+    unique_users: Dict[str, UserCreate] = {}
+    for user in users:
+        unique_users.setdefault(hash_username(user.username), user)
+    if not unique_users:
+        return [], []
+
+    username_hashes = list(unique_users)
+    hashed_passwords = await asyncio.gather(
+        *(hash_password_async(user.password) for user in unique_users.values())
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
 
-    # Decrypt the username after retrieving it
-    decrypted_username = db.execute(
-        text("SELECT pgp_sym_decrypt(:encrypted_username, :key)"),
-        {"encrypted_username": db_user.username, "key": DB_ENCRYPTION_KEY},
-    ).scalar()
+    rows = (
+        await db.execute(
+            text(
+                """
+                INSERT INTO users (username, username_hash, hashed_password)
+                SELECT pgp_sym_encrypt(u.username, :key),
+                       u.username_hash,
+                       u.hashed_password
+                FROM unnest(
+                    CAST(:usernames AS text[]),
+                    CAST(:username_hashes AS text[]),
+                    CAST(:hashed_passwords AS text[])
+                ) AS u(username, username_hash, hashed_password)
+                ON CONFLICT (username_hash) DO NOTHING
+                RETURNING id, username_hash
+            """
+            ),
+            {
+                "key": DB_ENCRYPTION_KEY,
+                "usernames": [user.username for user in unique_users.values()],
+                "username_hashes": username_hashes,
+                "hashed_passwords": hashed_passwords,
+            },
+        )
+    ).fetchall()
+    await db.commit()
 
-    db_user.username = decrypted_username
+    hashed_by_username_hash = dict(zip(username_hashes, hashed_passwords))
+    created = [
+        User(
+            id=row.id,
+            username=unique_users[row.username_hash].username,
+            hashed_password=hashed_by_username_hash[row.username_hash],
+        )
+        for row in rows
+    ]
 
-    return db_user
+    # Only the first occurrence of each created username counts as created.
+    remaining = {row.username_hash for row in rows}
+    skipped = []
+    for user in users:
+        username_hash = hash_username(user.username)
+        if username_hash in remaining:
+            remaining.discard(username_hash)
+        else:
+            skipped.append(user.username)
+    return created, skipped
 
 
-def get_user_by_username(db: Session, username: str):
+async def get_user_by_username(db: AsyncSession, username: str):
     """
     Retrieve a user from the database by their username.
 
+    Before the unique index on ``username_hash`` exists, users registered
+    with usernames that normalize to the same name share a hash; among them
+    only the exact spelling matches.
+
     Args:
-        db (Session): The database session.
+        db (AsyncSession): The database session.
         username (str): The username of the user to retrieve.
 
     Returns:
         User: The user object if found, None otherwise.
     """
 
-    result = db.execute(
-        text(
-            """
+    rows = (
+        await db.execute(
+            text(
+                """
             SELECT id, 
                    pgp_sym_decrypt(username, :key) AS decrypted_username, 
                    hashed_password
             FROM users
-            WHERE pgp_sym_decrypt(username, :key) = :username
+            WHERE username_hash = :username_hash
         """
-        ),
-        {"key": DB_ENCRYPTION_KEY, "username": username},
-    ).fetchone()
+            ),
+            {"key": DB_ENCRYPTION_KEY, "username_hash": hash_username(username)},
+        )
+    ).fetchall()
 
-    if result:
+    if len(rows) > 1:
+        rows = [row for row in rows if row[1] == username]
+    if len(rows) == 1:
+        result = rows[0]
         return User(id=result[0], username=result[1], hashed_password=result[2])
 
     return None
@@ -4,14 +4,24 @@ This module contains functions for interacting with the database.
 
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-from .config import DATABASE_URL
+from .config import ASYNC_DATABASE_URL, DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_SIZE
 
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine used by the request handlers; the sync engine above is kept
+# for schema setup and maintenance scripts.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def check_db_connection():
     """
@@ -47,3 +57,15 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Get an async database session.
+
+    Yields:
+        AsyncSession: A session object for interacting with the database
+        from async request handlers.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
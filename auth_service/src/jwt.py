@@ -4,13 +4,26 @@ JSON Web Tokens (JWT) used for authentication in the application. JWTs are used
 securely transmit information between parties as a JSON object.
 """
 
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 import bcrypt
 from jose import JWTError, jwt
 
-from .config import JWT_ACCESS_TOKEN_EXPIRE_MINUTES, JWT_ALGORITHM, JWT_SECRET_KEY
+from .config import (
+    BCRYPT_ROUNDS,
+    JWT_ACCESS_TOKEN_EXPIRE_MINUTES,
+    JWT_ALGORITHM,
+    JWT_SECRET_KEY,
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+)
+
+_password_executor: Optional[Executor] = None
 
 
 def hash_password(password: str) -> str:
@@ -24,7 +37,7 @@ def hash_password(password: str) -> str:
         str: The hashed password.
     """
     pwd_bytes = password.encode("utf-8")
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(password=pwd_bytes, salt=salt)
     return hashed_password.decode("utf-8")
 
@@ -47,6 +60,76 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
+def get_password_executor() -> Executor:
+    """
+    Return the executor that runs bcrypt, creating it on first use.
+
+    The executor is dedicated to password hashing so CPU-heavy bcrypt calls
+    do not compete with the server's default thread pool. Its kind and size
+    come from ``PASSWORD_HASH_EXECUTOR`` and ``PASSWORD_HASH_WORKERS``
+    (0 means one worker per CPU).
+
+    Returns:
+        Executor: The password hashing executor.
+    """
+    global _password_executor
+    if _password_executor is None:
+        workers = PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        if PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _password_executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="bcrypt"
+            )
+    return _password_executor
+
+
+def shutdown_password_executor():
+    """
+    Shut down the password hashing executor, if it was started.
+
+    Returns:
+        None
+    """
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=True)
+        _password_executor = None
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hashes the provided password on the password hashing executor.
+
+    Args:
+        password (str): The password to be hashed.
+
+    Returns:
+        str: The hashed password.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_password_executor(), hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifies a password against its hash on the password hashing executor.
+
+    Args:
+        plain_password (str): The plain password to be verified.
+        hashed_password (str): The hashed password to compare against.
+
+    Returns:
+        bool: True if the plain password matches the hashed password, False otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_password_executor(), verify_password, plain_password, hashed_password
+    )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
     Generates an access token using the given data and expiration delta.
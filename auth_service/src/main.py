@@ -3,28 +3,119 @@ This module contains the main FastAPI application instance and the
 API routes for the authentication service.
 """
 
-from fastapi import Depends, FastAPI, HTTPException, status
-from sqlalchemy.orm import Session
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List
 
-from .crud import create_user, get_user_by_username
-from .database import Base, engine, get_db
-from .jwt import create_access_token, verify_password
+from fastapi import Depends, FastAPI, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import BULK_REGISTER_MAX_USERS
+from .crud import (
+    UsernameAlreadyRegisteredError,
+    create_user,
+    create_users,
+    get_user_by_username,
+    stage_seconds,
+    username_index_exists,
+)
+from .database import Base, async_engine, engine, get_async_db
+from .jwt import (
+    create_access_token,
+    get_password_executor,
+    shutdown_password_executor,
+    verify_password_async,
+)
 from .logger import setup_logger
-from .schemas import Token, UserCreate, UserOut
+from .metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from .migrations import migrate_username_hashes
+from .schemas import BulkRegisterOut, Token, UserCreate, UserOut
+
+# Whether the unique index on username_hash is known to exist. Until it is,
+# registration is refused, since nothing else rejects duplicate usernames.
+username_index_ready = False
+
+
+def setup_database() -> bool:
+    """
+    Create the users table and add, backfill and index ``username_hash``.
+
+    Returns:
+        bool: True if the unique index on ``username_hash`` exists.
+    """
+    Base.metadata.create_all(bind=engine)
+    return migrate_username_hashes(engine)
+
 
-app = FastAPI()
-logger = setup_logger()
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Create and migrate the users table and start the password hashing
+    executor on startup, and release it and the database pool on shutdown.
+
+    Schema setup runs here rather than at import, so importing the
+    application never touches the database.
 
+    Args:
+        _app (FastAPI): The application instance.
 
-@app.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+    Yields:
+        None
+    """
+    global username_index_ready
+    username_index_ready = await asyncio.to_thread(setup_database)
+    get_password_executor()
+    yield
+    shutdown_password_executor()
+    await async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+logger = setup_logger(__name__)
+
+
+async def require_username_index(db: AsyncSession = Depends(get_async_db)):
+    """
+    Refuse registration while the unique index on ``username_hash`` is
+    missing.
+
+    The index is looked up again on every refused request, so registration
+    reopens once another instance's migration creates it.
+
+    Args:
+        db (AsyncSession, optional): The database session. Defaults to
+            Depends(get_async_db).
+
+    Raises:
+        HTTPException: If the index does not exist.
+    """
+    global username_index_ready
+    if not username_index_ready:
+        username_index_ready = await username_index_exists(db)
+    if not username_index_ready:
+        logger.error("Registration refused: the username_hash index is missing")
+        raise HTTPException(
+            status_code=503,
+            detail="Registration is unavailable until duplicate usernames "
+            "are resolved",
+        )
+
+
+@app.post(
+    "/register",
+    response_model=UserOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_username_index)],
+)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new user.
 
     Args:
         user (schemas.UserCreate): The user data to be created.
-        db (Session, optional): The database session. Defaults to Depends(get_db).
+        db (AsyncSession, optional): The database session. Defaults to
+            Depends(get_async_db).
 
     Returns:
         The created user.
@@ -32,23 +123,61 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     Raises:
         HTTPException: If the username is already registered.
     """
-    db_user = get_user_by_username(db, username=user.username)
-    if db_user:
+    try:
+        db_user = await create_user(db, user=user)
+    except UsernameAlreadyRegisteredError as e:
         logger.error("Username already registered")
-        raise HTTPException(status_code=400, detail="Username already registered")
+        raise HTTPException(
+            status_code=400, detail="Username already registered"
+        ) from e
 
     logger.info("User created successfully")
-    return create_user(db, user=user)
+    return db_user
+
+
+@app.post(
+    "/register/bulk",
+    response_model=BulkRegisterOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_username_index)],
+)
+async def register_bulk(
+    users: List[UserCreate], db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create many users in one statement, for migration imports.
+
+    Args:
+        users (List[UserCreate]): The users to be created.
+        db (AsyncSession, optional): The database session. Defaults to
+            Depends(get_async_db).
+
+    Returns:
+        BulkRegisterOut: The created users and the skipped usernames.
+
+    Raises:
+        HTTPException: If more than ``BULK_REGISTER_MAX_USERS`` users are sent.
+    """
+    if len(users) > BULK_REGISTER_MAX_USERS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_REGISTER_MAX_USERS} users per request",
+        )
+
+    created, skipped = await create_users(db, users)
+    logger.info("Bulk registration created %d users", len(created))
+    return {"created": created, "skipped": skipped}
 
 
 @app.post("/authenticate", response_model=Token, status_code=status.HTTP_200_OK)
-def authenticate(user: UserCreate, db: Session = Depends(get_db)):
+async def authenticate(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Authenticates a user and generates an access token.
 
     Args:
         user (UserCreate): The user credentials.
-        db (Session, optional): The database session. Defaults to Depends(get_db).
+        db (AsyncSession, optional): The database session. Defaults to
+            Depends(get_async_db).
 
     Raises:
         HTTPException: If the username or password is incorrect.
@@ -56,12 +185,31 @@ def authenticate(user: UserCreate, db: Session = Depends(get_db)):
     Returns:
         dict: A dictionary containing the access token and token type.
     """
-    db_user = get_user_by_username(db, username=user.username)
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    with stage_seconds.time(stage="lookup_user"):
+        db_user = await get_user_by_username(db, username=user.username)
+    verified = False
+    if db_user:
+        with stage_seconds.time(stage="verify_password"):
+            verified = await verify_password_async(
+                user.password, db_user.hashed_password
+            )
+    if not verified:
         logger.error("Incorrect username or password")
         raise HTTPException(status_code=401, detail="Incorrect username or password")
-    access_token = create_access_token(
-        data={"sub": db_user.username, "user_id": str(db_user.id)}
-    )
+    with stage_seconds.time(stage="create_token"):
+        access_token = create_access_token(
+            data={"sub": db_user.username, "user_id": str(db_user.id)}
+        )
     logger.info("User authenticated successfully")
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """
+    Return the service metrics in the Prometheus text format.
+
+    Returns:
+        Response: The metrics.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
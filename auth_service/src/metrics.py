@@ -0,0 +1,427 @@
+"""
+This module contains the in-process metrics registry.
+
+Counters and histograms are updated in the hot paths and rendered in the
+Prometheus text format. The FastAPI applications serve them on ``/metrics``
+and the consumer workers on a small HTTP listener started with
+``serve_metrics``.
+
+Histograms have fixed buckets, so an observation costs a bisect and two
+additions under a lock. Percentiles such as p50 and p99 are computed when
+the data is queried, with ``histogram_quantile`` over the buckets.
+Every process keeps its own registry and is scraped on its own.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets, in seconds.
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+# Size buckets, for example messages per batch.
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _format_labels(
+    names: Sequence[str],
+    values: Sequence[str],
+    extra: Optional[Tuple[str, str]] = None,
+) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    """
+    Base class of the metric types.
+
+    Args:
+        name (str): The metric name.
+        documentation (str): The help text.
+        labelnames (Sequence[str]): The names of the labels every update
+            must give.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        """
+        Return the sample lines of the metric.
+
+        Returns:
+            List[str]: The lines, without the HELP and TYPE comments.
+        """
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """
+        Return the metric in the Prometheus text format.
+
+        Returns:
+            List[str]: The HELP and TYPE comments followed by the samples.
+        """
+        return [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    """
+    A monotonically increasing count per label set.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Increase the count.
+
+        Args:
+            amount (float): The increment.
+            **labels: The label values.
+
+        Returns:
+            None
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Histogram(Metric):
+    """
+    A distribution of observed values over fixed buckets per label set.
+
+    Args:
+        name (str): The metric name.
+        documentation (str): The help text.
+        labelnames (Sequence[str]): The label names.
+        buckets (Sequence[float]): The upper bounds of the buckets; a
+            ``+Inf`` bucket is always added.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: the count of each bucket (not cumulative) and the sum.
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        """
+        Record an observation.
+
+        Args:
+            value (float): The observed value.
+            **labels: The label values.
+
+        Returns:
+            None
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            state[0][index] += 1
+            state[1][0] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[Dict[str, object]]:
+        """
+        Observe the duration of a block, in seconds.
+
+        The label values are yielded as a dict, so the block can change them
+        once the outcome is known. The duration is recorded even if the block
+        raises.
+
+        Args:
+            **labels: The label values.
+
+        Yields:
+            Dict[str, object]: The label values.
+        """
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [
+                (key, list(counts), total[0])
+                for key, (counts, total) in self._values.items()
+            ]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(
+                    self.labelnames, key, ("le", _format_value(bound))
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    The metrics of a process, by name.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already a {metric.kind}")
+            return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        """
+        Return the counter with a name, creating it if needed.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (Sequence[str]): The label names.
+
+        Returns:
+            Counter: The counter.
+        """
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """
+        Return the histogram with a name, creating it if needed.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text.
+            labelnames (Sequence[str]): The label names.
+            buckets (Sequence[float]): The bucket upper bounds.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        """
+        Return every metric in the Prometheus text format.
+
+        Returns:
+            str: The exposition text.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the duration of every HTTP request by
+    method, route template and status code.
+
+    Args:
+        app: The ASGI application to wrap.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.histogram = registry.histogram(
+            "http_request_duration_seconds",
+            "Time to handle an HTTP request.",
+            ["method", "route", "status"],
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; using its
+            # path template keeps the number of label sets bounded.
+            route = scope.get("route")
+            self.histogram.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serve the registry on ``/metrics``.
+    """
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would otherwise be logged to stderr every few seconds.
+        pass
+
+
+def serve_metrics(port: int) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve the registry on ``/metrics`` from a daemon thread.
+
+    Args:
+        port (int): The port to listen on. Zero or less disables the listener.
+
+    Returns:
+        ThreadingHTTPServer or None: The server, or None if it is disabled or
+        the port is unavailable.
+    """
+    if port <= 0:
+        return None
+    try:
+        server = ThreadingHTTPServer(("", port), MetricsHandler)
+    except OSError as e:
+        logger.warning("Metrics listener could not bind port %d: %s", port, e)
+        return None
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-listener", daemon=True
+    ).start()
+    logger.info("Serving metrics on port %d.", port)
+    return server
+
+
+def serve_worker_metrics(
+    base_port: int, worker_id: int
+) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve a consumer worker's registry on ``base_port + worker_id``.
+
+    Args:
+        base_port (int): The port of worker 0. Zero or less disables the
+            listener of every worker, whatever its ID.
+        worker_id (int): The index of the worker.
+
+    Returns:
+        ThreadingHTTPServer or None: The server, or None if it is disabled or
+        the port is unavailable.
+    """
+    if base_port <= 0:
+        return None
+    return serve_metrics(base_port + worker_id)
@@ -0,0 +1,202 @@
+"""
+This module contains the schema upgrades that ``Base.metadata.create_all``
+cannot apply to an existing database.
+
+``migrate_username_hashes`` runs at startup. It can also be run on its own
+to backfill an existing users table, or with ``--rehash`` to recompute every
+hash after ``USERNAME_HASH_KEY`` changed:
+
+    python -m src.migrations [--rehash]
+"""
+
+import argparse
+from typing import List
+
+from sqlalchemy import Engine, text
+from sqlalchemy.orm import Session
+
+from .config import DB_ENCRYPTION_KEY, USERNAME_HASH_BACKFILL_BATCH_SIZE
+from .crud import USERNAME_HASH_INDEX, hash_username
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Serializes the migration across service instances starting together.
+MIGRATION_LOCK_ID = 0x757365726E616D65
+
+
+def upgrade_schema(engine: Engine):
+    """
+    Add the ``username_hash`` lookup column to a users table created before
+    the column existed.
+
+    The unique index is created by ``create_username_hash_index`` once every
+    row has a hash.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine to run the DDL on.
+
+    Returns:
+        None
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text("ALTER TABLE users ADD COLUMN IF NOT EXISTS username_hash VARCHAR(64)")
+        )
+
+
+def backfill_username_hashes(
+    db: Session,
+    batch_size: int = USERNAME_HASH_BACKFILL_BATCH_SIZE,
+    rehash: bool = False,
+) -> int:
+    """
+    Populate ``username_hash`` for rows written before the column existed.
+
+    Rows are processed in batches, each committed separately, so a large
+    table is backfilled without holding one long transaction. Every row is
+    decrypted exactly once.
+
+    Args:
+        db (Session): The database session.
+        batch_size (int): The number of rows to hash per transaction.
+        rehash (bool): Recompute the hash of every row, not only the missing
+            ones.
+
+    Returns:
+        int: The number of rows updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            text(
+                f"""
+                SELECT id, pgp_sym_decrypt(username, :key) AS decrypted_username
+                FROM users
+                WHERE id > :last_id
+                {"" if rehash else "AND username_hash IS NULL"}
+                ORDER BY id
+                LIMIT :batch_size
+            """
+            ),
+            {"key": DB_ENCRYPTION_KEY, "last_id": last_id, "batch_size": batch_size},
+        ).fetchall()
+        if not rows:
+            return updated
+
+        db.execute(
+            text("UPDATE users SET username_hash = :username_hash WHERE id = :id"),
+            [
+                {"id": row.id, "username_hash": hash_username(row.decrypted_username)}
+                for row in rows
+            ],
+        )
+        db.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+
+
+def find_username_hash_collisions(db: Session) -> List[List[int]]:
+    """
+    Find users whose usernames normalize to the same name.
+
+    Such users were registered before lookups were normalized; they share a
+    ``username_hash``, so the unique index cannot be created until all but
+    one of them are renamed or removed.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        List[List[int]]: The IDs of each group of colliding users.
+    """
+    rows = db.execute(
+        text(
+            """
+            SELECT array_agg(id ORDER BY id) AS ids
+            FROM users
+            WHERE username_hash IS NOT NULL
+            GROUP BY username_hash
+            HAVING count(*) > 1
+        """
+        )
+    ).fetchall()
+    return [list(row.ids) for row in rows]
+
+
+def create_username_hash_index(engine: Engine):
+    """
+    Create the unique index on ``username_hash``.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine to run the DDL on.
+
+    Returns:
+        None
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {USERNAME_HASH_INDEX} "
+                "ON users (username_hash)"
+            )
+        )
+
+
+def migrate_username_hashes(engine: Engine, rehash: bool = False) -> bool:
+    """
+    Add, backfill and index the ``username_hash`` column.
+
+    Colliding usernames are reported instead of failing the migration: the
+    service keeps running without the unique index, refusing registrations,
+    and the next start creates it once the collisions are resolved.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine.
+        rehash (bool): Recompute the hash of every row.
+
+    Returns:
+        bool: True if the unique index exists.
+    """
+    with engine.connect() as lock_conn:
+        lock_conn.execute(
+            text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}
+        )
+        # The lock is held by the session, not the transaction.
+        lock_conn.commit()
+        try:
+            upgrade_schema(engine)
+            with Session(engine) as session:
+                backfilled = backfill_username_hashes(session, rehash=rehash)
+                if backfilled:
+                    logger.info("Backfilled username hashes for %d users", backfilled)
+                collisions = find_username_hash_collisions(session)
+            if collisions:
+                logger.error(
+                    "Not creating the unique username_hash index: users %s have "
+                    "usernames that normalize to the same name. Rename or remove "
+                    "all but one user of each group and restart.",
+                    collisions,
+                )
+                return False
+            create_username_hash_index(engine)
+            return True
+        finally:
+            lock_conn.execute(
+                text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID}
+            )
+            lock_conn.commit()
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Migrate the username hashes.")
+    parser.add_argument(
+        "--rehash",
+        action="store_true",
+        help="recompute every username hash, after USERNAME_HASH_KEY changed",
+    )
+    args = parser.parse_args()
+    migrate_username_hashes(engine, rehash=args.rehash)
@@ -14,6 +14,8 @@ class User(Base):
     Attributes:
         id (int): The unique identifier for the user.
         username (str): The username of the user.
+        username_hash (str): Keyed HMAC of the normalized username, used for
+            indexed lookups without decrypting the username column.
         hashed_password (str): The hashed password of the user.
     """
 
@@ -21,4 +23,5 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     username = Column(LargeBinary, unique=True, index=True)
+    username_hash = Column(String(64), unique=True, index=True)
     hashed_password = Column(String)
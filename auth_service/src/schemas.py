@@ -2,6 +2,8 @@
 This module contains the schema classes for the application.
 """
 
+from typing import List
+
 from pydantic import BaseModel
 
 
@@ -38,6 +40,20 @@ class UserOut(BaseModel):
         from_attributes = True
 
 
+class BulkRegisterOut(BaseModel):
+    """
+    BulkRegisterOut schema class.
+
+    Attributes:
+        created (List[UserOut]): The users that were created.
+        skipped (List[str]): The usernames that were already registered or
+            repeated in the request.
+    """
+
+    created: List[UserOut]
+    skipped: List[str]
+
+
 class Token(BaseModel):
     """
     Represents a token object.
@@ -0,0 +1,28 @@
+import hashlib
+import hmac
+
+from src.config import DB_ENCRYPTION_KEY
+from src.crud import derive_key, hash_username, username_hash_key
+
+
+def test_derive_key_matches_rfc5869_vector():
+    # RFC 5869 test case 3: SHA-256, 22 bytes of 0x0b, no salt, no info.
+    okm = derive_key("\x0b" * 22, b"")
+    assert okm.hex() == (
+        "8da4e775a563c18f715f802a063c5a31b8a11f5c5ee1879ec3454e5f3c738d2d"
+    )
+
+
+def test_username_hash_key_is_not_the_encryption_key():
+    assert username_hash_key != DB_ENCRYPTION_KEY.encode("utf-8")
+    assert len(username_hash_key) == 32
+
+
+def test_hash_username_is_keyed_hmac():
+    expected = hmac.new(username_hash_key, b"alice", hashlib.sha256).hexdigest()
+    assert hash_username("alice") == expected
+
+
+def test_hash_username_normalizes_nfkc():
+    assert hash_username("ａlice") == hash_username("alice")
+    assert hash_username("Alice") != hash_username("alice")
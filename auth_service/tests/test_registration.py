@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+
+from src import crud, main
+from src.database import get_async_db
+
+CREDENTIALS = {"username": "alice", "password": "secret"}
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, statement, params=None):
+        return FakeResult(self.rows)
+
+
+async def no_db():
+    yield None
+
+
+def post(path: str, json):
+    async def send():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://auth"
+        ) as client:
+            return await client.post(path, json=json)
+
+    main.app.dependency_overrides[get_async_db] = no_db
+    try:
+        return asyncio.run(send())
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+def test_registration_is_refused_while_the_index_is_missing(monkeypatch):
+    created = []
+
+    async def index_exists(db):
+        return False
+
+    async def create(db, *args, **kwargs):
+        created.append(args or kwargs)
+
+    monkeypatch.setattr(main, "username_index_ready", False)
+    monkeypatch.setattr(main, "username_index_exists", index_exists)
+    monkeypatch.setattr(main, "create_user", create)
+    monkeypatch.setattr(main, "create_users", create)
+
+    assert post("/register", CREDENTIALS).status_code == 503
+    assert post("/register/bulk", [CREDENTIALS]).status_code == 503
+    assert created == []
+
+
+def test_registration_reopens_once_the_index_exists(monkeypatch):
+    checks = []
+
+    async def index_exists(db):
+        checks.append(db)
+        return True
+
+    async def create(db, user):
+        return crud.User(id=1, username=user.username, hashed_password="x")
+
+    monkeypatch.setattr(main, "username_index_ready", False)
+    monkeypatch.setattr(main, "username_index_exists", index_exists)
+    monkeypatch.setattr(main, "create_user", create)
+
+    assert post("/register", CREDENTIALS).status_code == 201
+    assert post("/register", CREDENTIALS).status_code == 201
+    # Once found, the index is not looked up again.
+    assert len(checks) == 1
+
+
+def test_lookup_matches_the_exact_spelling_among_colliding_users():
+    rows = [(1, "ａlice", "hash-1"), (2, "alice", "hash-2")]
+    user = asyncio.run(crud.get_user_by_username(FakeSession(rows), "alice"))
+    assert (user.id, user.hashed_password) == (2, "hash-2")
+
+
+def test_lookup_of_another_spelling_among_colliding_users_finds_no_user():
+    rows = [(1, "ａlice", "hash-1"), (2, "alice", "hash-2")]
+    assert asyncio.run(crud.get_user_by_username(FakeSession(rows), "ａｌice")) is None
+    assert asyncio.run(crud.get_user_by_username(FakeSession([]), "alice")) is None
+
+
+def test_lookup_of_a_single_match_accepts_a_normalized_spelling():
+    rows = [(1, "alice", "hash-1")]
+    user = asyncio.run(crud.get_user_by_username(FakeSession(rows), "ａlice"))
+    assert user.id == 1
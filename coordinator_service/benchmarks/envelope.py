@@ -0,0 +1,105 @@
+"""
+Benchmark message size and encode/decode time of the task envelopes.
+
+Each sample task is encoded with ``encode_task`` in the legacy JSON envelope
+and in the versioned JSON and msgpack envelopes, then decoded the way the
+consumers decode it. The wire size counts the body and the token header,
+which the versioned envelopes move out of the body:
+
+    python -m benchmarks.envelope --iterations 100000
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Callable
+
+import msgpack
+import orjson
+
+from src.envelope import TOKEN_HEADER, encode_task
+
+SAMPLE_TASKS = {
+    "product": (
+        "product",
+        {"name": "Widget", "description": "A small blue widget", "price": 9.99},
+    ),
+    "inventory": ("inventory", {"product_id": 123456, "quantity": -2}),
+    "large": (
+        "product",
+        {
+            "name": "Widget deluxe",
+            "description": "A widget " * 100,
+            "price": 1999.99,
+            "tags": [f"tag{index}" for index in range(50)],
+        },
+    ),
+}
+
+
+def make_token() -> str:
+    """
+    Build a token the size of the JWTs the auth service issues.
+    """
+
+    def encode(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    header = encode(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    payload = encode(
+        json.dumps({"sub": "benchmark", "user_id": "1", "exp": 1700000000}).encode()
+    )
+    signature = hmac.new(
+        b"secret", f"{header}.{payload}".encode(), hashlib.sha256
+    ).digest()
+    return f"{header}.{payload}.{encode(signature)}"
+
+
+def decode_legacy(body: bytes):
+    data = json.loads(body.decode())
+    return data.get("task"), data.get("token")
+
+
+DECODERS = {
+    "legacy": decode_legacy,
+    "json": orjson.loads,
+    "msgpack": msgpack.unpackb,
+}
+
+
+def time_per_call(iterations: int, call: Callable) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark task envelopes.")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    token = make_token()
+    print(f"{'task':<10} {'envelope':<8} {'body B':>7} {'wire B':>7}", end=" ")
+    print(f"{'encode us':>10} {'decode us':>10}")
+    for name, (task_type, task) in SAMPLE_TASKS.items():
+        for envelope, decode in DECODERS.items():
+            message = encode_task(task, token, task_type, envelope)
+            body = message.body
+            wire = len(body) + len(message.headers.get(TOKEN_HEADER, ""))
+            encode_seconds = time_per_call(
+                args.iterations,
+                lambda: encode_task(task, token, task_type, envelope),
+            )
+            decode_seconds = time_per_call(args.iterations, lambda: decode(body))
+            print(
+                f"{name:<10} {envelope:<8} {len(body):>7} {wire:>7} "
+                f"{encode_seconds * 1e6:>10.2f} {decode_seconds * 1e6:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
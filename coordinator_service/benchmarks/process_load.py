@@ -0,0 +1,163 @@
+"""
+Load test the ``/process`` endpoints against the connect-per-request path.
+
+Requests are driven through the application in-process with ``--concurrency``
+clients. Authentication is replaced by a fixed token, so only the publishing
+path is measured:
+
+- ``pooled``: the application as shipped, publishing through the long-lived
+  aio-pika publisher.
+- ``legacy``: ``send_task_to_rabbitmq`` as it was before the publisher, a
+  blocking pika connection per request opened on the event loop. Requires
+  the ``bench`` dependency group.
+- ``batch``: the same tasks submitted to ``/process/batch`` in batches of
+  ``--batch-size``, authenticated once per batch and published with
+  pipelined confirms. Latencies are per batch request.
+
+Point ``RABBITMQ_HOST`` at a scratch broker; every task publishes a
+message to ``product_tasks``. Compare single and batch submission of 10k
+products with:
+
+    python -m benchmarks.process_load --mode pooled batch --requests 10000
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import statistics
+import time
+from typing import List, Optional
+
+import httpx
+
+from src import main as app_module
+from src.config import RABBITMQ_HOST, RABBITMQ_PORT
+
+AUTHORIZATION = "Basic " + base64.b64encode(b"bench:bench").decode()
+TASK = {"name": "Benchmark product", "description": "load test", "price": 9.99}
+
+
+async def fixed_token(username: str, password: str) -> str:
+    return "benchmark-token"
+
+
+async def legacy_send_task_to_rabbitmq(task_data, jwt_token):
+    # The pre-publisher implementation, blocking the event loop as it did.
+    import pika
+
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(host=RABBITMQ_HOST, port=RABBITMQ_PORT)
+    )
+    channel = connection.channel()
+    channel.queue_declare(queue="product_tasks")
+    payload = {"task": task_data, "token": jwt_token}
+    channel.basic_publish(
+        exchange="", routing_key="product_tasks", body=json.dumps(payload)
+    )
+    connection.close()
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def drive(
+    tasks: int, concurrency: int, batch_size: Optional[int] = None
+) -> List[float]:
+    """
+    Submit ``tasks`` tasks from ``concurrency`` concurrent clients.
+
+    Tasks are sent one per ``/process`` request, or ``batch_size`` per
+    ``/process/batch`` request when a batch size is given.
+
+    Returns:
+        List[float]: The latency of each request, in seconds.
+    """
+    latencies: List[float] = []
+    if batch_size:
+        path = "/process/batch"
+        bodies = [
+            [TASK] * min(batch_size, tasks - start)
+            for start in range(0, tasks, batch_size)
+        ]
+    else:
+        path = "/process"
+        bodies = [TASK] * tasks
+    remaining = iter(bodies)
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://coordinator"
+    ) as client:
+
+        async def worker():
+            for body in remaining:
+                start = time.perf_counter()
+                response = await client.post(
+                    path, json=body, headers={"Authorization": AUTHORIZATION}
+                )
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+                if batch_size and response.json()["rejected"]:
+                    raise RuntimeError(f"Batch rejected: {response.json()}")
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def run(
+    modes: List[str], requests: int, concurrency: int, warmup: int, batch_size: int
+):
+    # The client would otherwise log every request it sends.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    app_module.get_access_token = fixed_token
+    shipped_send = app_module.send_task_to_rabbitmq
+    print(f"{'mode':<8} {'tasks':>8} {'conc':>5} {'tasks/s':>9}", end=" ")
+    print(f"{'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    throughput = {}
+    async with app_module.app.router.lifespan_context(app_module.app):
+        for mode in modes:
+            app_module.send_task_to_rabbitmq = (
+                legacy_send_task_to_rabbitmq if mode == "legacy" else shipped_send
+            )
+            size = batch_size if mode == "batch" else None
+            await drive(warmup, concurrency, size)
+            start = time.perf_counter()
+            latencies = await drive(requests, concurrency, size)
+            elapsed = time.perf_counter() - start
+            throughput[mode] = requests / elapsed
+            print(
+                f"{mode:<8} {requests:>8} {concurrency:>5} "
+                f"{requests / elapsed:>9.0f} "
+                f"{statistics.mean(latencies) * 1000:>9.2f} "
+                f"{percentile(latencies, 0.5) * 1000:>9.2f} "
+                f"{percentile(latencies, 0.99) * 1000:>9.2f}"
+            )
+    for mode in ("pooled", "legacy"):
+        if "batch" in throughput and mode in throughput:
+            gain = throughput["batch"] / throughput[mode]
+            print(f"batch vs {mode}: {gain:.1f}x tasks/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /process.")
+    parser.add_argument(
+        "--mode",
+        nargs="+",
+        choices=["pooled", "legacy", "batch"],
+        default=["pooled", "legacy"],
+    )
+    parser.add_argument("--requests", type=int, default=5000, help="Tasks to submit")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(
+        run(args.mode, args.requests, args.concurrency, args.warmup, args.batch_size)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+This module contains the HTTP client the coordinator uses to talk to the
+authentication service.
+
+One ``httpx.AsyncClient`` is created for the lifetime of the application so
+connections to the auth service are pooled and kept alive between requests
+instead of being opened and torn down on every call.
+"""
+
+from typing import Optional
+
+import httpx
+
+
+class AuthServiceClient:
+    """
+    Pooled client for the authentication service.
+
+    Args:
+        base_url (str): The base URL of the authentication service.
+        max_connections (int): The maximum number of open connections.
+        max_keepalive_connections (int): The maximum number of idle
+            connections kept in the pool.
+        keepalive_expiry (float): Seconds an idle connection is kept open.
+        timeout (float): The default timeout for reads, writes and pool
+            acquisition, in seconds.
+        connect_timeout (float): The timeout for establishing a connection,
+            in seconds.
+        http2 (bool): Whether to negotiate HTTP/2 when the server supports it.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        timeout: float,
+        connect_timeout: float,
+        http2: bool = False,
+    ):
+        self.base_url = base_url
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        """
+        Create the underlying connection pool.
+
+        Returns:
+            None
+        """
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=self.limits,
+            timeout=self.timeout,
+            http2=self.http2,
+        )
+
+    async def close(self):
+        """
+        Close all pooled connections.
+
+        Returns:
+            None
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The shared ``httpx.AsyncClient``.
+
+        Raises:
+            RuntimeError: If the client has not been started.
+        """
+        if self._client is None:
+            raise RuntimeError("Auth service client is not started")
+        return self._client
+
+    async def authenticate(self, username: str, password: str) -> httpx.Response:
+        """
+        Exchange user credentials for an access token.
+
+        Args:
+            username (str): The username.
+            password (str): The password.
+
+        Returns:
+            httpx.Response: The response from the authentication service.
+        """
+        return await self.client.post(
+            "/authenticate", json={"username": username, "password": password}
+        )
+
+    async def register(self, user_data: dict) -> httpx.Response:
+        """
+        Register a new user.
+
+        Args:
+            user_data (dict): The username and password of the new user.
+
+        Returns:
+            httpx.Response: The response from the authentication service.
+        """
+        return await self.client.post("/register", json=user_data)
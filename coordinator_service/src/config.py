@@ -2,10 +2,62 @@
 This module contains the configuration settings for the application.
 """
 
-from decouple import config
+from decouple import Csv, config
 
 # Define auth service settings
 AUTH_SERVICE_URL = config("AUTH_SERVICE_URL")
+AUTH_HTTP2 = config("AUTH_HTTP2", default=False, cast=bool)
+AUTH_MAX_CONNECTIONS = config("AUTH_MAX_CONNECTIONS", default=100, cast=int)
+AUTH_MAX_KEEPALIVE_CONNECTIONS = config(
+    "AUTH_MAX_KEEPALIVE_CONNECTIONS", default=20, cast=int
+)
+AUTH_KEEPALIVE_EXPIRY = config("AUTH_KEEPALIVE_EXPIRY", default=30.0, cast=float)
+AUTH_TIMEOUT = config("AUTH_TIMEOUT", default=5.0, cast=float)
+AUTH_CONNECT_TIMEOUT = config("AUTH_CONNECT_TIMEOUT", default=2.0, cast=float)
 
 # Define rabbitmq settings
 RABBITMQ_HOST = config("RABBITMQ_HOST")
+RABBITMQ_PORT = config("RABBITMQ_PORT", default=5672, cast=int)
+RABBITMQ_USER = config("RABBITMQ_DEFAULT_USER", default="guest")
+RABBITMQ_PASSWORD = config("RABBITMQ_DEFAULT_PASS", default="guest")
+RABBITMQ_CONNECT_RETRY_DELAY = config(
+    "RABBITMQ_CONNECT_RETRY_DELAY", default=5.0, cast=float
+)
+
+# Define publisher settings
+PUBLISHER_CHANNEL_POOL_SIZE = config(
+    "PUBLISHER_CHANNEL_POOL_SIZE", default=10, cast=int
+)
+PUBLISHER_MAX_IN_FLIGHT = config("PUBLISHER_MAX_IN_FLIGHT", default=100, cast=int)
+PUBLISHER_TIMEOUT = config("PUBLISHER_TIMEOUT", default=5.0, cast=float)
+# Tasks are routed by their "type" to the queue bound for it, given as
+# comma-separated type:queue pairs.
+TASK_EXCHANGE = config("TASK_EXCHANGE", default="tasks")
+TASK_ROUTES = dict(
+    route.split(":", 1)
+    for route in config(
+        "TASK_ROUTES",
+        default="product:product_tasks,inventory:inventory_tasks",
+        cast=Csv(),
+    )
+)
+DEFAULT_TASK_TYPE = config("DEFAULT_TASK_TYPE", default="product")
+# Inventory tasks are hashed on product_id across this many queues; the
+# inventory service must use the same value.
+INVENTORY_PARTITIONS = config("INVENTORY_PARTITIONS", default=1, cast=int)
+# "msgpack" or "json" send the versioned envelope with the token in headers;
+# "legacy" sends the original JSON body for consumers that predate it.
+TASK_ENVELOPE = config("TASK_ENVELOPE", default="msgpack")
+PROCESS_BATCH_MAX_TASKS = config("PROCESS_BATCH_MAX_TASKS", default=10000, cast=int)
+PROCESS_BATCH_CONFIRM_WINDOW = config(
+    "PROCESS_BATCH_CONFIRM_WINDOW", default=1000, cast=int
+)
+STREAM_CONFIRM_WINDOW = config("STREAM_CONFIRM_WINDOW", default=1000, cast=int)
+STREAM_MAX_LINE_BYTES = config("STREAM_MAX_LINE_BYTES", default=1048576, cast=int)
+STREAM_MAX_REPORTED_ERRORS = config("STREAM_MAX_REPORTED_ERRORS", default=100, cast=int)
+
+# Define credential cache settings
+CREDENTIAL_CACHE_MAX_SIZE = config("CREDENTIAL_CACHE_MAX_SIZE", default=10000, cast=int)
+CREDENTIAL_CACHE_EXPIRY_MARGIN = config(
+    "CREDENTIAL_CACHE_EXPIRY_MARGIN", default=30.0, cast=float
+)
@@ -0,0 +1,191 @@
+"""
+This module contains a bounded cache of verified credentials.
+
+Once the authentication service has exchanged a username and password for a
+JWT, the token is kept here until shortly before it expires so repeated
+requests with the same Basic credentials skip the auth round-trip (and the
+bcrypt check behind it). Credentials are never stored: entries are keyed by a
+keyed BLAKE2b digest whose salt is generated per process.
+
+The authentication service does not notify the coordinator of password
+changes or removed users, so a cached password keeps working until its token
+expires. The window is shortened where the coordinator can tell: every entry
+for a user is dropped when the authentication service verifies a new password
+for them and when the username is registered. A rejected password only drops
+its own entry, so a wrong guess cannot evict the tokens of the real user.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+
+def get_token_expiry(token: str) -> Optional[float]:
+    """
+    Read the ``exp`` claim of a JWT without verifying it.
+
+    The coordinator does not hold the signing key; the token came straight
+    from the authentication service and is only used to size the cache TTL.
+
+    Args:
+        token (str): The JWT.
+
+    Returns:
+        float or None: The expiry as a Unix timestamp, or None if the token
+        has no readable ``exp`` claim.
+    """
+    try:
+        payload_segment = token.split(".")[1]
+        padded = payload_segment + "=" * (-len(payload_segment) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        return float(payload["exp"])
+    except (IndexError, KeyError, TypeError, ValueError, binascii.Error):
+        return None
+
+
+class CredentialCache:
+    """
+    TTL + LRU cache mapping credentials to the JWT issued for them.
+
+    Args:
+        max_size (int): The maximum number of cached entries. Zero disables
+            the cache.
+        expiry_margin (float): Seconds before the token's ``exp`` at which the
+            entry is treated as expired.
+    """
+
+    def __init__(self, max_size: int, expiry_margin: float):
+        self.max_size = max_size
+        self.expiry_margin = expiry_margin
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._salt = os.urandom(32)
+        self._entries: "OrderedDict[bytes, Tuple[str, float, bytes]]" = OrderedDict()
+        self._keys_by_user: Dict[bytes, Set[bytes]] = {}
+
+    def _digest(self, *parts: str) -> bytes:
+        hasher = hashlib.blake2b(key=self._salt, digest_size=32)
+        for part in parts:
+            hasher.update(part.encode("utf-8"))
+            hasher.update(b"\0")
+        return hasher.digest()
+
+    def _remove(self, key: bytes):
+        _, _, user_key = self._entries.pop(key)
+        user_keys = self._keys_by_user.get(user_key)
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[user_key]
+
+    def get(self, username: str, password: str) -> Optional[str]:
+        """
+        Return the cached token for the credentials if it is still fresh.
+
+        Args:
+            username (str): The username.
+            password (str): The password.
+
+        Returns:
+            str or None: The cached JWT, or None on a miss.
+        """
+        key = self._digest(username, password)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        token, expires_at, _ = entry
+        if time.time() >= expires_at:
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return token
+
+    def put(self, username: str, password: str, token: str):
+        """
+        Cache the token issued for the credentials.
+
+        Tokens without an ``exp`` claim, or that expire within the margin,
+        are not cached.
+
+        Args:
+            username (str): The username.
+            password (str): The password.
+            token (str): The JWT returned by the authentication service.
+
+        Returns:
+            None
+        """
+        if self.max_size <= 0:
+            return
+
+        expiry = get_token_expiry(token)
+        if expiry is None:
+            return
+        expires_at = expiry - self.expiry_margin
+        if expires_at <= time.time():
+            return
+
+        key = self._digest(username, password)
+        user_key = self._digest(username)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (token, expires_at, user_key)
+        self._keys_by_user.setdefault(user_key, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, username: str, password: str):
+        """
+        Drop the entry for one username and password, if any.
+
+        Args:
+            username (str): The username.
+            password (str): The password.
+
+        Returns:
+            None
+        """
+        key = self._digest(username, password)
+        if key in self._entries:
+            self._remove(key)
+
+    def invalidate_user(self, username: str):
+        """
+        Drop every entry for a user, whatever password it was cached under.
+
+        Args:
+            username (str): The username.
+
+        Returns:
+            None
+        """
+        for key in list(self._keys_by_user.get(self._digest(username), ())):
+            self._remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the cache counters.
+
+        Returns:
+            Dict[str, int]: The current size and the hit, miss and eviction
+            counts.
+        """
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
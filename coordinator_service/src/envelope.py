@@ -0,0 +1,81 @@
+"""
+This module encodes tasks into RabbitMQ messages.
+
+Two envelope formats are supported:
+
+- Version 1 (``legacy``): a JSON body ``{"task": ..., "token": ...}``.
+- Version 2 (``json`` or ``msgpack``): the body is only the task, encoded
+  with orjson or msgpack as named by the ``content_type`` property. The JWT
+  travels in the ``x-token`` header, the envelope version in
+  ``x-envelope-version`` and the task type in the ``type`` property, so
+  consumers can authenticate and route a message without decoding its body.
+
+Every message carries a unique ``message_id`` so consumers can recognise and
+drop redeliveries, and an ``x-published-at`` header with the publish time in
+milliseconds since the epoch so they can measure queue lag.
+"""
+
+import json
+import time
+import uuid
+
+import aio_pika
+import msgpack
+import orjson
+
+ENVELOPE_VERSION = 2
+VERSION_HEADER = "x-envelope-version"
+TOKEN_HEADER = "x-token"
+PUBLISHED_AT_HEADER = "x-published-at"
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+
+
+def encode_task(
+    task_data: dict, jwt_token: str, task_type: str, envelope: str
+) -> aio_pika.Message:
+    """
+    Build the message for a task.
+
+    Args:
+        task_data (dict): The data of the task to be sent.
+        jwt_token (str): The JWT token that authorizes the task.
+        task_type (str): The type of the task, for example "product".
+        envelope (str): "legacy", "json" or "msgpack".
+
+    Returns:
+        aio_pika.Message: The message to publish.
+
+    Raises:
+        ValueError: If the task cannot be encoded, for example because it
+            holds an integer too large for the format.
+    """
+    try:
+        if envelope == "legacy":
+            body = json.dumps({"task": task_data, "token": jwt_token}).encode("utf-8")
+        elif envelope == "msgpack":
+            body = msgpack.packb(task_data)
+        else:
+            body = orjson.dumps(task_data)
+    except (OverflowError, TypeError, ValueError) as exc:
+        raise ValueError(f"Task cannot be encoded: {exc}") from exc
+
+    if envelope == "legacy":
+        return aio_pika.Message(
+            body=body,
+            message_id=uuid.uuid4().hex,
+            headers={PUBLISHED_AT_HEADER: int(time.time() * 1000)},
+        )
+
+    content_type = CONTENT_TYPE_MSGPACK if envelope == "msgpack" else CONTENT_TYPE_JSON
+    return aio_pika.Message(
+        body=body,
+        content_type=content_type,
+        type=task_type,
+        message_id=uuid.uuid4().hex,
+        headers={
+            VERSION_HEADER: ENVELOPE_VERSION,
+            TOKEN_HEADER: jwt_token,
+            PUBLISHED_AT_HEADER: int(time.time() * 1000),
+        },
+    )
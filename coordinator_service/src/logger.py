@@ -1,45 +1,341 @@
 """
-This module initializes New Relic, creates a custom logging handler,
-and configures the logging for the application.
+This module creates a custom logging handler that ships records to New
+Relic, and configures the logging for the application.
+
+New Relic is initialized lazily: nothing is imported or registered until
+the first record is logged, and registration then runs on a background
+thread while records are buffered. Without a license key, or with
+``NEW_RELIC_ENABLED=false``, the agent is never loaded and the handler drops
+records immediately.
 """
 
+import configparser
 import logging
 import os
+import random
+import threading
+from collections import deque
+from typing import Dict, Optional
 
-import newrelic.agent
+NEW_RELIC_CONFIG = os.path.join(os.path.dirname(__file__), "newrelic.ini")
+PLACEHOLDER_LICENSE_KEY = "YOUR_LICENSE_KEY"
 
-# Initialize New Relic
-newrelic.agent.initialize(os.path.join(os.path.dirname(__file__), "newrelic.ini"))
-application = newrelic.agent.register_application(timeout=10)
 
+def telemetry_enabled() -> bool:
+    """
+    Check whether New Relic telemetry is configured.
 
-class NewRelicHandler(logging.Handler):
+    Returns:
+        bool: False if ``NEW_RELIC_ENABLED`` is false or no license key is
+        set in ``NEW_RELIC_LICENSE_KEY`` or ``newrelic.ini``.
+    """
+    if os.getenv("NEW_RELIC_ENABLED", "true").lower() in ("false", "0", "no", "off"):
+        return False
+    if os.getenv("NEW_RELIC_LICENSE_KEY"):
+        return True
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read(NEW_RELIC_CONFIG)
+    license_key = parser.get("newrelic", "license_key", fallback="").strip()
+    return bool(license_key) and license_key != PLACEHOLDER_LICENSE_KEY
+
+
+class Telemetry:
+    """
+    Register the New Relic application once per process, in the background.
+
+    Attributes:
+        agent: The ``newrelic.agent`` module, once registered.
+        application: The registered application, once registered.
+    """
+
+    def __init__(self):
+        self.agent = None
+        self.application = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._enabled = False
+        self._pid: Optional[int] = None
+
+    def start(self):
+        """
+        Start registering in a background thread, unless already started in
+        this process. Returns immediately.
+
+        Returns:
+            None
+        """
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._done = threading.Event()
+            self.agent = None
+            self.application = None
+            self._enabled = telemetry_enabled()
+            if not self._enabled:
+                self._done.set()
+                return
+            threading.Thread(
+                target=self._register, name="newrelic-register", daemon=True
+            ).start()
+
+    def _register(self):
+        try:
+            import newrelic.agent
+
+            newrelic.agent.initialize(NEW_RELIC_CONFIG)
+            application = newrelic.agent.register_application(
+                timeout=float(os.getenv("NEW_RELIC_REGISTER_TIMEOUT", "10"))
+            )
+            self.agent, self.application = newrelic.agent, application
+        except Exception as exc:  # Telemetry must never break the service
+            self._enabled = False
+            logging.getLogger(__name__).warning(
+                "New Relic registration failed, telemetry disabled: %r", exc
+            )
+        finally:
+            self._done.set()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        bool: Whether telemetry is on in this process, as decided by
+        ``start`` and the outcome of registration.
+        """
+        return self._enabled
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for registration to finish.
+
+        Args:
+            timeout (float): The maximum wait, in seconds.
+
+        Returns:
+            bool: True if registration finished, successfully or not.
+        """
+        return self._done.wait(timeout)
+
+
+telemetry = Telemetry()
+
+
+def parse_sampling_rates(spec: str) -> Dict[str, float]:
     """
-    Emit a log record to New Relic.
+    Parse per-logger sampling rates.
 
     Args:
-        record (logging.LogRecord): The log record to emit.
+        spec (str): Comma-separated ``logger=rate`` pairs, for example
+            ``"src.consumer=0.1,aio_pika=0"``.
 
     Returns:
-        None
+        Dict[str, float]: The sampling rate for each logger name.
     """
+    rates = {}
+    for item in spec.split(","):
+        name, sep, rate = item.partition("=")
+        if sep and name.strip():
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class NewRelicHandler(logging.Handler):
+    """
+    Ship log records to New Relic from a background thread.
+
+    The first record starts New Relic registration. Records are buffered
+    until it finishes and are dropped without buffering once telemetry is
+    disabled.
+
+    ``emit`` only appends the record to a bounded ring buffer, so logging
+    never waits on telemetry. When the buffer is full the oldest record is
+    dropped and counted. A listener thread drains the buffer in batches,
+    formats each record and sends it as a custom event. Records below
+    WARNING can be sampled per logger; a logger inherits the rate of its
+    closest configured parent.
+
+    Records are formatted lazily on the listener thread, so log arguments
+    should not be mutated after the logging call.
+
+    Args:
+        capacity (int): The maximum number of buffered records.
+        batch_size (int): The number of buffered records that wakes the
+            listener early, and the maximum it ships per batch.
+        flush_interval (float): The maximum time a record waits in the
+            buffer, in seconds.
+        sampling_rates (Dict[str, float], optional): The fraction of
+            sub-WARNING records to keep, per logger name.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        sampling_rates: Optional[Dict[str, float]] = None,
+    ):
+        super().__init__()
+        self.buffer = deque(maxlen=capacity)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sampling_rates = sampling_rates or {}
+        self.sent = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self._rate_cache: Dict[str, float] = {}
+        self._wakeup = threading.Event()
+        self._closing = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _sampling_rate(self, name: str) -> float:
+        rate = self._rate_cache.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.sampling_rates:
+                    rate = self.sampling_rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._rate_cache[name] = rate
+        return rate
+
+    def _ensure_listener(self):
+        # Started on first use, and again in a forked child, whose copy of
+        # the handler has no listener thread. Records inherited from the
+        # parent are the parent's to ship.
+        if self._pid != os.getpid():
+            if self._pid is not None:
+                self.buffer.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="newrelic-log-listener", daemon=True
+            )
+            self._thread.start()
 
     def emit(self, record):
-        log_entry = self.format(record)
-        newrelic.agent.record_custom_event(
-            "LogEvent",
-            {"level": record.levelname, "message": log_entry},
-            application=application,
-        )
+        telemetry.start()
+        if not telemetry.enabled:
+            return
+        if record.levelno < logging.WARNING:
+            rate = self._sampling_rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                self.sampled_out += 1
+                return
+
+        self._ensure_listener()
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._closing.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if telemetry.wait(0):
+                self._drain()
+        if telemetry.wait(self.flush_interval):
+            self._drain()
+
+    def _drain(self):
+        if telemetry.application is None:
+            self.buffer.clear()
+            return
+        while self.buffer:
+            batch = []
+            while self.buffer and len(batch) < self.batch_size:
+                batch.append(self.buffer.popleft())
+            for record in batch:
+                self._ship(record)
 
+    def _ship(self, record):
+        try:
+            log_entry = self.format(record)
+            telemetry.agent.record_custom_event(
+                "LogEvent",
+                {"level": record.levelname, "message": log_entry},
+                application=telemetry.application,
+            )
+            self.sent += 1
+        except Exception:
+            self.handleError(record)
 
-def setup_logger():
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the handler counters.
+
+        Returns:
+            Dict[str, int]: The number of buffered, sent, dropped and
+            sampled-out records.
+        """
+        return {
+            "buffered": len(self.buffer),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+        }
+
+    def close(self):
+        """
+        Stop the listener thread after shipping the buffered records.
+
+        Returns:
+            None
+        """
+        self._closing.set()
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+        super().close()
+
+
+# Whether setup_logger has installed the root handlers in this interpreter.
+# A forked child inherits them, and NewRelicHandler restarts its listener
+# there, so they are never installed twice.
+_handlers_installed = False
+_setup_lock = threading.Lock()
+
+
+def setup_logger(name: Optional[str] = None):
     """
     Set up the logger with the specified log level and handlers.
 
+    Every module calls this at import. The first call installs the handlers
+    on the root logger; later calls only return the named logger, so they
+    neither replace the handlers nor close a handler that may still be
+    shipping records.
+
+    Args:
+        name (str, optional): The name of the logger to return. The handlers
+            are always installed on the root logger.
+
     Returns:
         logger (logging.Logger): The configured logger object.
     """
+    global _handlers_installed
+    logger = logging.getLogger()
+    with _setup_lock:
+        if not _handlers_installed:
+            install_handlers(logger)
+            _handlers_installed = True
+    return logging.getLogger(name) if name else logger
+
+
+def install_handlers(logger: logging.Logger):
+    """
+    Replace a logger's handlers with the New Relic and console handlers.
+
+    Args:
+        logger (logging.Logger): The logger to configure.
+
+    Returns:
+        None
+    """
     # Get log level from environment variable or default to INFO
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
     level = getattr(logging, log_level, logging.INFO)
@@ -50,19 +346,23 @@ def setup_logger():
     )
 
     # Create handlers
-    new_relic_handler = NewRelicHandler()
+    new_relic_handler = NewRelicHandler(
+        capacity=int(os.getenv("LOG_BUFFER_SIZE", "10000")),
+        batch_size=int(os.getenv("LOG_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", "1.0")),
+        sampling_rates=parse_sampling_rates(os.getenv("LOG_SAMPLING", "")),
+    )
     new_relic_handler.setFormatter(formatter)
 
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
 
-    # Configure the root logger
-    logger = logging.getLogger()
+    # Configure the logger
     logger.setLevel(level)
+    for handler in logger.handlers:
+        handler.close()
     logger.handlers = []  # Clear any existing handlers
 
-    # Add handlers to the root logger
+    # Add handlers to the logger
     logger.addHandler(new_relic_handler)
     logger.addHandler(console_handler)
-
-    return logger
@@ -4,19 +4,125 @@ This module contains the main FastAPI application for the Coordinator Service.
 """
 
 import base64
-import json
-from typing import Dict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
 
-import httpx
-import pika
-from fastapi import FastAPI, HTTPException, Request, status
+import aio_pika
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response, status
 from pydantic import BaseModel
 
-from .config import AUTH_SERVICE_URL, RABBITMQ_HOST
+from .auth_client import AuthServiceClient
+from .config import (
+    AUTH_CONNECT_TIMEOUT,
+    AUTH_HTTP2,
+    AUTH_KEEPALIVE_EXPIRY,
+    AUTH_MAX_CONNECTIONS,
+    AUTH_MAX_KEEPALIVE_CONNECTIONS,
+    AUTH_SERVICE_URL,
+    AUTH_TIMEOUT,
+    CREDENTIAL_CACHE_EXPIRY_MARGIN,
+    CREDENTIAL_CACHE_MAX_SIZE,
+    DEFAULT_TASK_TYPE,
+    INVENTORY_PARTITIONS,
+    PROCESS_BATCH_CONFIRM_WINDOW,
+    PROCESS_BATCH_MAX_TASKS,
+    PUBLISHER_CHANNEL_POOL_SIZE,
+    PUBLISHER_MAX_IN_FLIGHT,
+    PUBLISHER_TIMEOUT,
+    RABBITMQ_CONNECT_RETRY_DELAY,
+    RABBITMQ_HOST,
+    RABBITMQ_PASSWORD,
+    RABBITMQ_PORT,
+    RABBITMQ_USER,
+    STREAM_CONFIRM_WINDOW,
+    STREAM_MAX_LINE_BYTES,
+    STREAM_MAX_REPORTED_ERRORS,
+    TASK_ENVELOPE,
+    TASK_EXCHANGE,
+    TASK_ROUTES,
+)
+from .credential_cache import CredentialCache
+from .envelope import encode_task
 from .logger import setup_logger
+from .metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from .partitioning import (
+    PARTITION_QUEUE_ARGUMENTS,
+    partition_of,
+    partition_routes,
+    partition_routing_key,
+)
+from .publisher import PublisherUnavailableError, PublishStream, RabbitMQPublisher
+
+logger = setup_logger(__name__)
+stage_seconds = registry.histogram(
+    "coordinator_stage_seconds",
+    "Time spent in each stage of publishing tasks.",
+    ["stage"],
+)
+credential_lookups = registry.counter(
+    "coordinator_credential_cache_lookups_total",
+    "Credential cache lookups by result.",
+    ["result"],
+)
+published_tasks = registry.counter(
+    "coordinator_tasks_total", "Tasks received by outcome.", ["outcome"]
+)
+auth_client = AuthServiceClient(
+    base_url=AUTH_SERVICE_URL,
+    max_connections=AUTH_MAX_CONNECTIONS,
+    max_keepalive_connections=AUTH_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=AUTH_KEEPALIVE_EXPIRY,
+    timeout=AUTH_TIMEOUT,
+    connect_timeout=AUTH_CONNECT_TIMEOUT,
+    http2=AUTH_HTTP2,
+)
+credential_cache = CredentialCache(
+    max_size=CREDENTIAL_CACHE_MAX_SIZE, expiry_margin=CREDENTIAL_CACHE_EXPIRY_MARGIN
+)
+task_routes = partition_routes(TASK_ROUTES, "inventory", INVENTORY_PARTITIONS)
+publisher = RabbitMQPublisher(
+    host=RABBITMQ_HOST,
+    port=RABBITMQ_PORT,
+    login=RABBITMQ_USER,
+    password=RABBITMQ_PASSWORD,
+    channel_pool_size=PUBLISHER_CHANNEL_POOL_SIZE,
+    max_in_flight=PUBLISHER_MAX_IN_FLIGHT,
+    publish_timeout=PUBLISHER_TIMEOUT,
+    connect_retry_delay=RABBITMQ_CONNECT_RETRY_DELAY,
+    exchange=TASK_EXCHANGE,
+    routes=task_routes,
+    queue_arguments={
+        queue: PARTITION_QUEUE_ARGUMENTS
+        for queue in task_routes.values()
+        if queue not in TASK_ROUTES.values()
+    },
+)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Open the auth service client and the RabbitMQ publisher on startup and
+    close them on shutdown.
+
+    Args:
+        _app (FastAPI): The application instance.
+
+    Yields:
+        None
+    """
+    await auth_client.start()
+    await publisher.connect()
+    logger.info("RabbitMQ publisher connected")
+    yield
+    await publisher.close()
+    await auth_client.close()
+    logger.info("RabbitMQ publisher and auth service client closed")
 
-app = FastAPI()
-logger = setup_logger()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 
 # Define Pydantic models for request payload
@@ -48,9 +154,103 @@ class UserResponse(BaseModel):
     username: str
 
 
-def send_task_to_rabbitmq(task_data, jwt_token):
+class TaskResult(BaseModel):
+    """
+    Represents the outcome of one task in a batch.
+
+    Attributes:
+        index (int): The position of the task in the request.
+        status (str): "accepted" or "rejected".
+        detail (str, optional): Why the task was rejected.
+    """
+
+    index: int
+    status: str
+    detail: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    """
+    Represents the response to a batch of tasks.
+
+    Attributes:
+        accepted (int): The number of tasks confirmed by the broker.
+        rejected (int): The number of tasks that could not be published.
+        results (List[TaskResult]): The outcome of each task.
+    """
+
+    accepted: int
+    rejected: int
+    results: List[TaskResult]
+
+
+class StreamError(BaseModel):
+    """
+    Represents a rejected line of an NDJSON stream.
+
+    Attributes:
+        line (int): The 1-based line number.
+        detail (str): Why the line was rejected.
+    """
+
+    line: int
+    detail: str
+
+
+class StreamSummary(BaseModel):
     """
-    Sends a task to RabbitMQ with the JWT token included in the payload.
+    Represents the summary of an NDJSON stream.
+
+    Attributes:
+        lines (int): The number of non-empty lines read.
+        accepted (int): The number of tasks confirmed by the broker.
+        rejected (int): The number of lines that were not published.
+        errors (List[StreamError]): The first rejected lines.
+    """
+
+    lines: int
+    accepted: int
+    rejected: int
+    errors: List[StreamError]
+
+
+def build_task_message(task_data, jwt_token) -> Tuple[aio_pika.Message, str]:
+    """
+    Build the message for a task, carrying the JWT token in the configured
+    envelope format.
+
+    The task type is taken from the task's "type" field, which is removed
+    from the payload, and defaults to ``DEFAULT_TASK_TYPE``. When inventory
+    tasks are partitioned, they are routed to the partition of their
+    product ID.
+
+    Args:
+        task_data (dict): The data of the task to be sent.
+        jwt_token (str): The JWT token to be included with the task.
+
+    Returns:
+        Tuple[aio_pika.Message, str]: The message to publish and the routing
+        key to publish it with.
+
+    Raises:
+        ValueError: If the task type is not a string with a route, or a
+            partitioned task has no valid product ID.
+    """
+    task_data = dict(task_data)
+    task_type = task_data.pop("type", DEFAULT_TASK_TYPE)
+    if not isinstance(task_type, str) or task_type not in TASK_ROUTES:
+        raise ValueError(f"Unknown task type: {task_type}")
+
+    routing_key = task_type
+    if task_type == "inventory" and INVENTORY_PARTITIONS > 1:
+        partition = partition_of(task_data.get("product_id"), INVENTORY_PARTITIONS)
+        routing_key = partition_routing_key(task_type, partition)
+    return encode_task(task_data, jwt_token, task_type, TASK_ENVELOPE), routing_key
+
+
+async def send_task_to_rabbitmq(task_data, jwt_token):
+    """
+    Sends a task to RabbitMQ with the JWT token included in the message.
 
     Args:
         task_data (dict): The data of the task to be sent.
@@ -58,18 +258,87 @@ def send_task_to_rabbitmq(task_data, jwt_token):
 
     Returns:
         None
+
+    Raises:
+        HTTPException: If the task type is unknown, or the broker is
+        unavailable or applying backpressure.
     """
-    connection = pika.BlockingConnection(pika.ConnectionParameters(host=RABBITMQ_HOST))
-    channel = connection.channel()
-    channel.queue_declare(queue="product_tasks")
+    try:
+        message, routing_key = build_task_message(task_data, jwt_token)
+    except ValueError as e:
+        published_tasks.inc(outcome="rejected")
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    try:
+        with stage_seconds.time(stage="publish"):
+            await publisher.publish(message, routing_key=routing_key)
+    except PublisherUnavailableError as e:
+        logger.error("Failed to send task to RabbitMQ: %s", e)
+        raise HTTPException(status_code=503, detail="Task queue unavailable") from e
+    published_tasks.inc(outcome="accepted")
 
-    # Include the token in the task payload
-    payload = {"task": task_data, "token": jwt_token}
 
-    channel.basic_publish(
-        exchange="", routing_key="product_tasks", body=json.dumps(payload)
-    )
-    connection.close()
+async def get_access_token(username: str, password: str) -> str:
+    """
+    Return a JWT for the credentials, from the cache when possible and from the
+    authentication service otherwise.
+
+    Args:
+        username (str): The username.
+        password (str): The password.
+
+    Returns:
+        str: The access token.
+
+    Raises:
+        HTTPException: If the authentication fails or no token is returned.
+    """
+    jwt_token = credential_cache.get(username, password)
+    if jwt_token:
+        credential_lookups.inc(result="hit")
+        return jwt_token
+    credential_lookups.inc(result="miss")
+
+    with stage_seconds.time(stage="auth_service"):
+        response = await auth_client.authenticate(username, password)
+    if response.status_code != 200:
+        logger.error("Authentication failed")
+        # Only this password is known to be wrong: anyone can send one, so it
+        # must not evict the tokens cached for the user's real password.
+        credential_cache.invalidate(username, password)
+        raise HTTPException(status_code=401, detail="Authentication failed")
+
+    jwt_token = response.json().get("access_token")
+    if not jwt_token:
+        raise HTTPException(status_code=500, detail="No access token returned")
+
+    # A newly verified password confirms a credential change and replaces any
+    # other cached for the user.
+    credential_cache.invalidate_user(username)
+    credential_cache.put(username, password, jwt_token)
+    return jwt_token
+
+
+async def authenticate_request(request: Request) -> str:
+    """
+    Authenticate a request from its Basic Authorization header.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        str: The access token for the credentials.
+
+    Raises:
+        HTTPException: If the header is missing or invalid, or the
+        authentication fails.
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        raise HTTPException(status_code=401, detail="Authorization header missing")
+
+    credentials = parse_basic_auth_header(auth_header)
+    return await get_access_token(credentials["username"], credentials["password"])
 
 
 def parse_basic_auth_header(auth_header: str) -> Dict[str, str]:
@@ -111,10 +380,14 @@ async def process_request(
 ):
     """
     Process the incoming request by authenticating the request data with the authentication
-    service. If authentication is successful, send the task to RabbitMQ with the JWT token
+    service, reusing a cached token for recently verified credentials. If authentication is
+    successful, send the task to RabbitMQ with the JWT token
     included in the payload and return a success response. If authentication fails, raise
     an HTTPException with a status code of 401.
 
+    The task's "type" field ("product" or "inventory" by default) selects the queue it is
+    routed to; tasks without one are product tasks.
+
     Parameters:
     - additional_data (RequestData, optional): The additional data of the incoming request.
     - Username (str): The username for authentication (provided in headers).
@@ -124,35 +397,88 @@ async def process_request(
     - dict: A dictionary containing the status of the request.
 
     Raises:
-    - HTTPException: If the authentication fails.
+    - HTTPException: If the authentication fails or the task type is unknown.
     """
 
-    auth_header = request.headers.get("Authorization")
-    if not auth_header:
-        raise HTTPException(status_code=401, detail="Authorization header missing")
+    with stage_seconds.time(stage="authenticate"):
+        jwt_token = await authenticate_request(request)
 
-    credentials = parse_basic_auth_header(auth_header)
-    username = credentials["username"]
-    password = credentials["password"]
+    # Send task to RabbitMQ with JWT token
+    await send_task_to_rabbitmq(request_data, jwt_token)
+    logger.info("Task sent to RabbitMQ")
+    return {"status": "success"}
+
+
+@app.post(
+    "/process/batch",
+    response_model=BatchResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def process_batch(request: Request, tasks: List[dict]):
+    """
+    Authenticate once and publish a batch of tasks on one channel.
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{AUTH_SERVICE_URL}/authenticate",
-            json={"username": username, "password": password},
+    Messages are published with pipelined publisher confirms, and each task
+    is reported as accepted once the broker confirms it or rejected if it
+    could not be published or its type is unknown. Each task is routed by
+    its own "type" field.
+
+    Parameters:
+    - tasks (List[dict]): The tasks to be sent.
+    - Username (str): The username for authentication (provided in headers).
+    - Password (str): The password for authentication (provided in headers).
+
+    Returns:
+    - BatchResponse: The accepted and rejected counts and per-task results.
+
+    Raises:
+    - HTTPException: If the authentication fails, the batch is too large, or
+      the broker is unavailable.
+    """
+    if len(tasks) > PROCESS_BATCH_MAX_TASKS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {PROCESS_BATCH_MAX_TASKS} tasks per batch",
         )
-        if response.status_code == 200:
-            # Authentication successful, get the JWT token
-            jwt_token = response.json().get("access_token")
-            if not jwt_token:
-                raise HTTPException(status_code=500, detail="No access token returned")
 
-            # Send task to RabbitMQ with JWT token
-            send_task_to_rabbitmq(request_data, jwt_token)
-            logger.info("Task sent to RabbitMQ")
-            return {"status": "success"}
-        else:
-            logger.error("Authentication failed")
-            raise HTTPException(status_code=401, detail="Authentication failed")
+    jwt_token = await authenticate_request(request)
+
+    errors: List[Optional[Exception]] = [None] * len(tasks)
+    messages = []
+    indexes = []
+    for index, task in enumerate(tasks):
+        try:
+            messages.append(build_task_message(task, jwt_token))
+            indexes.append(index)
+        except ValueError as e:
+            errors[index] = e
+
+    try:
+        with stage_seconds.time(stage="publish_batch"):
+            published = await publisher.publish_batch(
+                messages, PROCESS_BATCH_CONFIRM_WINDOW
+            )
+    except PublisherUnavailableError as e:
+        logger.error("Failed to send batch to RabbitMQ: %s", e)
+        raise HTTPException(status_code=503, detail="Task queue unavailable") from e
+    for index, error in zip(indexes, published):
+        errors[index] = error
+
+    results = [
+        (
+            TaskResult(index=index, status="rejected", detail=str(error))
+            if error
+            else TaskResult(index=index, status="accepted")
+        )
+        for index, error in enumerate(errors)
+    ]
+    rejected = sum(1 for error in errors if error)
+    published_tasks.inc(len(tasks) - rejected, outcome="accepted")
+    published_tasks.inc(rejected, outcome="rejected")
+    logger.info("Batch of %d tasks sent to RabbitMQ, %d rejected", len(tasks), rejected)
+    return BatchResponse(
+        accepted=len(tasks) - rejected, rejected=rejected, results=results
+    )
 
 
 @app.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -169,16 +495,138 @@ async def register_user(user: UserCreate):
     Raises:
         HTTPException: If the registration fails.
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{AUTH_SERVICE_URL}/register", json=user.model_dump()
+    response = await auth_client.register(user.model_dump())
+    if response.status_code == 201:
+        # Registration successful, return user data
+        logger.info("User registered successfully")
+        # Tokens cached for an earlier user of the same name are stale.
+        credential_cache.invalidate_user(user.username)
+        return response.json()
+    else:
+        logger.error("User registration failed")
+        raise HTTPException(
+            status_code=response.status_code, detail="User registration failed"
         )
-        if response.status_code == 201:
-            # Registration successful, return user data
-            logger.info("User registered successfully")
-            return response.json()
-        else:
-            logger.error("User registration failed")
-            raise HTTPException(
-                status_code=response.status_code, detail="User registration failed"
-            )
+
+
+@app.post(
+    "/process/stream",
+    response_model=StreamSummary,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def process_stream(request: Request):
+    """
+    Publish tasks from an NDJSON request body while it is being uploaded.
+
+    The body is read incrementally and each line is published as soon as it
+    is parsed. Reading pauses while ``STREAM_CONFIRM_WINDOW`` messages await
+    broker confirms, so memory stays flat regardless of the upload size.
+
+    If the stream is cut short, the error detail carries the summary of the
+    lines read until then, since their tasks may already be queued.
+
+    Parameters:
+    - Username (str): The username for authentication (provided in headers).
+    - Password (str): The password for authentication (provided in headers).
+
+    Returns:
+    - StreamSummary: The line, accepted and rejected counts and the first
+      rejected lines.
+
+    Raises:
+    - HTTPException: If the authentication fails, a line is longer than
+      ``STREAM_MAX_LINE_BYTES``, or the broker is unavailable.
+    """
+    jwt_token = await authenticate_request(request)
+    line_number = 0
+    lines = 0
+    publish_stream: Optional[PublishStream] = None
+    failure: Optional[Tuple[int, str]] = None
+
+    async def publish_line(line: bytes):
+        nonlocal lines
+        if not line.strip():
+            return
+        lines += 1
+        try:
+            task = orjson.loads(line)
+        except ValueError:
+            publish_stream.reject(line_number, "Invalid JSON")
+            return
+        if not isinstance(task, dict):
+            publish_stream.reject(line_number, "Task must be a JSON object")
+            return
+        try:
+            message, routing_key = build_task_message(task, jwt_token)
+        except ValueError as e:
+            publish_stream.reject(line_number, str(e))
+            return
+        await publish_stream.send(line_number, message, routing_key)
+
+    def line_too_long(number: int) -> Tuple[int, str]:
+        return 413, f"Line {number} exceeds {STREAM_MAX_LINE_BYTES} bytes"
+
+    try:
+        async with publisher.stream(
+            STREAM_CONFIRM_WINDOW, STREAM_MAX_REPORTED_ERRORS
+        ) as publish_stream:
+            # The pieces of the current line, joined once it is complete.
+            pieces: List[bytes] = []
+            size = 0
+            async for chunk in request.stream():
+                start = 0
+                end = chunk.find(b"\n")
+                while end != -1:
+                    line_number += 1
+                    if size + end - start > STREAM_MAX_LINE_BYTES:
+                        failure = line_too_long(line_number)
+                        break
+                    pieces.append(chunk[start:end])
+                    await publish_line(b"".join(pieces))
+                    pieces = []
+                    size = 0
+                    start = end + 1
+                    end = chunk.find(b"\n", start)
+                if failure:
+                    break
+                pieces.append(chunk[start:])
+                size += len(chunk) - start
+                if size > STREAM_MAX_LINE_BYTES:
+                    failure = line_too_long(line_number + 1)
+                    break
+            if not failure:
+                line_number += 1
+                await publish_line(b"".join(pieces))
+    except PublisherUnavailableError as e:
+        logger.error("Failed to stream tasks to RabbitMQ: %s", e)
+        failure = (503, "Task queue unavailable")
+
+    summary = StreamSummary(lines=lines, accepted=0, rejected=0, errors=[])
+    if publish_stream is not None:
+        summary.accepted = publish_stream.accepted
+        summary.rejected = publish_stream.rejected
+        summary.errors = [
+            StreamError(line=line, detail=detail)
+            for line, detail in publish_stream.errors
+        ]
+    published_tasks.inc(summary.accepted, outcome="accepted")
+    published_tasks.inc(summary.rejected, outcome="rejected")
+    logger.info("Streamed %d tasks to RabbitMQ, %d rejected", lines, summary.rejected)
+    if failure:
+        status_code, message = failure
+        raise HTTPException(
+            status_code=status_code,
+            detail={"message": message, "summary": summary.model_dump()},
+        )
+    return summary
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """
+    Return the service metrics in the Prometheus text format.
+
+    Returns:
+        Response: The metrics.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
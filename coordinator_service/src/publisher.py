@@ -0,0 +1,427 @@
+"""
+This module contains the long-lived RabbitMQ publisher used by the coordinator.
+
+A single robust connection is opened at application startup and shared by a
+pool of channels. The connection reconnects automatically if the broker goes
+away, and the number of messages in flight is bounded so a slow broker pushes
+back on callers instead of piling up work. Single publishes share one bound;
+a batch or stream holds a channel of its own and is paced by its own confirm
+window instead, so large uploads neither starve single publishes nor time out
+while queued behind them.
+
+Messages are published to a direct exchange with the task type as routing
+key. The exchange, the task queues and their bindings are declared once at
+startup, so each consumer pool only receives the task type it handles.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractExchange, AbstractRobustConnection
+from aio_pika.pool import Pool
+
+logger = logging.getLogger(__name__)
+
+
+class PublisherUnavailableError(Exception):
+    """
+    Raised when a message cannot be handed to the broker in time.
+    """
+
+
+class PublishStream:
+    """
+    Publish an open-ended sequence of messages on one channel.
+
+    ``send`` returns as soon as the message is handed to the broker, but
+    blocks while ``window`` messages are still waiting for their confirms, so
+    a producer that reads its input incrementally is paced by the broker.
+    The window belongs to the stream: a message waiting for it is not timed
+    out, and the stream does not use the publisher's shared in-flight bound.
+
+    Args:
+        publisher (RabbitMQPublisher): The publisher that owns the channel.
+        exchange (AbstractExchange): The task exchange, bound to the channel.
+        window (int): The maximum number of unconfirmed messages.
+        max_errors (int): The maximum number of errors kept for reporting.
+    """
+
+    def __init__(
+        self,
+        publisher: "RabbitMQPublisher",
+        exchange: AbstractExchange,
+        window: int,
+        max_errors: int,
+    ):
+        self.publisher = publisher
+        self.exchange = exchange
+        self.max_errors = max_errors
+        self.accepted = 0
+        self.rejected = 0
+        self.errors: List[Tuple[int, str]] = []
+        self._window = asyncio.Semaphore(window)
+        self._pending: Set[asyncio.Task] = set()
+
+    def reject(self, index: int, detail: str):
+        """
+        Record a message that was rejected before publishing.
+
+        Args:
+            index (int): The position of the message in the stream.
+            detail (str): Why the message was rejected.
+
+        Returns:
+            None
+        """
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((index, detail))
+
+    async def send(self, index: int, message: aio_pika.Message, routing_key: str):
+        """
+        Publish a message, waiting first if the confirm window is full.
+
+        Args:
+            index (int): The position of the message in the stream.
+            message (aio_pika.Message): The message to publish.
+            routing_key (str): The routing key: the task type or its partition.
+
+        Returns:
+            None
+        """
+        await self._window.acquire()
+        task = asyncio.create_task(self._publish(index, message, routing_key))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _publish(self, index: int, message: aio_pika.Message, routing_key: str):
+        try:
+            await self.publisher._send(self.exchange, message, routing_key)
+            self.accepted += 1
+        except PublisherUnavailableError as exc:
+            self.reject(index, str(exc))
+        finally:
+            self._window.release()
+
+    async def wait(self):
+        """
+        Wait for every sent message to be confirmed or rejected.
+
+        Returns:
+            None
+        """
+        if self._pending:
+            await asyncio.gather(*self._pending)
+
+
+class RabbitMQPublisher:
+    """
+    Publish messages to RabbitMQ over a pooled, auto-reconnecting connection.
+
+    Args:
+        host (str): The RabbitMQ host.
+        port (int): The RabbitMQ port.
+        login (str): The RabbitMQ user.
+        password (str): The RabbitMQ password.
+        channel_pool_size (int): The maximum number of pooled channels.
+        max_in_flight (int): The maximum number of concurrent single
+            publishes.
+        publish_timeout (float): Seconds to wait for a free slot or a broker
+            confirm before giving up.
+        connect_retry_delay (float): Seconds to wait between startup
+            connection attempts.
+        exchange (str): The name of the direct exchange tasks are published
+            to.
+        routes (Dict[str, str]): The queue bound to the exchange for each
+            routing key.
+        queue_arguments (Dict[str, dict], optional): Extra declaration
+            arguments per queue name.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        login: str,
+        password: str,
+        channel_pool_size: int,
+        max_in_flight: int,
+        publish_timeout: float,
+        connect_retry_delay: float,
+        exchange: str,
+        routes: Dict[str, str],
+        queue_arguments: Optional[Dict[str, dict]] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.login = login
+        self.password = password
+        self.channel_pool_size = channel_pool_size
+        self.max_in_flight = max_in_flight
+        self.publish_timeout = publish_timeout
+        self.connect_retry_delay = connect_retry_delay
+        self.exchange = exchange
+        self.routes = routes
+        self.queue_arguments = queue_arguments or {}
+
+        self._connection: Optional[AbstractRobustConnection] = None
+        self._channel_pool: Optional[Pool] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+
+    async def connect(self):
+        """
+        Open the robust connection and the channel pool, and declare the task
+        exchange, queues and bindings.
+
+        Retries until the broker accepts the connection, so the service can
+        start before RabbitMQ is ready.
+
+        Returns:
+            None
+        """
+        while True:
+            try:
+                self._connection = await aio_pika.connect_robust(
+                    host=self.host,
+                    port=self.port,
+                    login=self.login,
+                    password=self.password,
+                )
+                break
+            except (ConnectionError, aio_pika.exceptions.AMQPConnectionError):
+                logger.warning(
+                    "RabbitMQ connection failed, retrying in %.1fs",
+                    self.connect_retry_delay,
+                )
+                await asyncio.sleep(self.connect_retry_delay)
+
+        self._channel_pool = Pool(
+            self._connection.channel, max_size=self.channel_pool_size
+        )
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        await self._declare_topology()
+
+    async def close(self):
+        """
+        Close the channel pool and the connection.
+
+        Returns:
+            None
+        """
+        if self._channel_pool is not None:
+            await self._channel_pool.close()
+            self._channel_pool = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _declare_topology(self):
+        """
+        Declare the task exchange and bind each task queue to it.
+
+        The queues are declared here as well as by their consumers, so tasks
+        published before a consumer first starts are not dropped. The robust
+        connection replays these declarations after a reconnect.
+
+        Returns:
+            None
+        """
+        async with self._channel_pool.acquire() as channel:
+            exchange = await channel.declare_exchange(
+                self.exchange, aio_pika.ExchangeType.DIRECT, durable=True
+            )
+            for routing_key, queue_name in self.routes.items():
+                queue = await channel.declare_queue(
+                    queue_name, arguments=self.queue_arguments.get(queue_name)
+                )
+                await queue.bind(exchange, routing_key=routing_key)
+        logger.info("Declared exchange %s with routes %s", self.exchange, self.routes)
+
+    async def _get_exchange(self, channel: AbstractChannel) -> AbstractExchange:
+        """
+        Return the task exchange on a channel without a broker round trip.
+
+        The exchange was declared by ``connect``.
+
+        Args:
+            channel (AbstractChannel): The channel to publish on.
+
+        Returns:
+            AbstractExchange: The exchange, bound to the channel.
+        """
+        return await channel.get_exchange(self.exchange, ensure=False)
+
+    async def _send(
+        self, exchange: AbstractExchange, message: aio_pika.Message, routing_key: str
+    ):
+        """
+        Publish one message and wait for the broker confirm.
+
+        Args:
+            exchange (AbstractExchange): The exchange to publish to.
+            message (aio_pika.Message): The message to publish.
+            routing_key (str): The routing key: the task type or its partition.
+
+        Returns:
+            None
+
+        Raises:
+            PublisherUnavailableError: If the broker does not confirm the
+                message within ``publish_timeout``.
+        """
+        try:
+            await exchange.publish(
+                message,
+                routing_key=routing_key,
+                timeout=self.publish_timeout,
+            )
+        except (asyncio.TimeoutError, aio_pika.exceptions.AMQPError) as exc:
+            raise PublisherUnavailableError("Failed to publish message") from exc
+
+    async def _publish_on(
+        self, exchange: AbstractExchange, message: aio_pika.Message, routing_key: str
+    ):
+        """
+        Publish one message within the shared in-flight bound.
+
+        Args:
+            exchange (AbstractExchange): The exchange to publish to.
+            message (aio_pika.Message): The message to publish.
+            routing_key (str): The routing key: the task type or its partition.
+
+        Returns:
+            None
+
+        Raises:
+            PublisherUnavailableError: If too many messages are already in
+                flight or the broker does not confirm the message within
+                ``publish_timeout``.
+        """
+        try:
+            await asyncio.wait_for(
+                self._in_flight.acquire(), timeout=self.publish_timeout
+            )
+        except asyncio.TimeoutError as exc:
+            raise PublisherUnavailableError("Too many messages in flight") from exc
+
+        try:
+            await self._send(exchange, message, routing_key)
+        finally:
+            self._in_flight.release()
+
+    async def publish(self, message: aio_pika.Message, routing_key: str):
+        """
+        Publish a message to the task exchange.
+
+        Args:
+            message (aio_pika.Message): The message to publish.
+            routing_key (str): The routing key: the task type or its partition.
+
+        Returns:
+            None
+
+        Raises:
+            PublisherUnavailableError: If the publisher is not connected, too
+                many messages are already in flight, or the broker does not
+                confirm the message within ``publish_timeout``.
+        """
+        if self._channel_pool is None:
+            raise PublisherUnavailableError("Publisher is not connected")
+
+        try:
+            async with self._channel_pool.acquire() as channel:
+                exchange = await self._get_exchange(channel)
+                await self._publish_on(exchange, message, routing_key)
+        except aio_pika.exceptions.AMQPError as exc:
+            raise PublisherUnavailableError("Failed to publish message") from exc
+
+    async def publish_batch(
+        self, messages: List[Tuple[aio_pika.Message, str]], window: int
+    ) -> List[Optional[Exception]]:
+        """
+        Publish many messages on one channel with pipelined confirms.
+
+        Messages are sent without waiting for each other's confirms; up to
+        ``window`` are outstanding at once, and the next message is sent as
+        soon as one is confirmed. The window belongs to the batch, so messages
+        waiting for it are neither timed out nor counted against single
+        publishes. Each message succeeds or fails on its own.
+
+        Args:
+            messages (List[Tuple[aio_pika.Message, str]]): The messages to
+                publish, each with its routing key.
+            window (int): The maximum number of unconfirmed messages.
+
+        Returns:
+            List[Optional[Exception]]: For each message, None if the broker
+            confirmed it, or the error that prevented it.
+
+        Raises:
+            PublisherUnavailableError: If the publisher is not connected or no
+                channel can be opened.
+        """
+        if self._channel_pool is None:
+            raise PublisherUnavailableError("Publisher is not connected")
+
+        errors: List[Optional[Exception]] = [None] * len(messages)
+        slots = asyncio.Semaphore(window)
+
+        async def send(index: int, message: aio_pika.Message, routing_key: str):
+            try:
+                await self._send(exchange, message, routing_key)
+            except PublisherUnavailableError as exc:
+                errors[index] = exc
+            finally:
+                slots.release()
+
+        try:
+            async with self._channel_pool.acquire() as channel:
+                exchange = await self._get_exchange(channel)
+                pending = []
+                for index, (message, routing_key) in enumerate(messages):
+                    await slots.acquire()
+                    pending.append(
+                        asyncio.create_task(send(index, message, routing_key))
+                    )
+                await asyncio.gather(*pending)
+        except aio_pika.exceptions.AMQPError as exc:
+            raise PublisherUnavailableError("Failed to publish messages") from exc
+        return errors
+
+    @asynccontextmanager
+    async def stream(
+        self, window: int, max_errors: int
+    ) -> AsyncIterator[PublishStream]:
+        """
+        Open a publish stream on one pooled channel.
+
+        On exit the stream waits for all outstanding confirms before the
+        channel goes back to the pool.
+
+        Args:
+            window (int): The maximum number of unconfirmed messages.
+            max_errors (int): The maximum number of errors kept for reporting.
+
+        Yields:
+            PublishStream: The stream to send messages on.
+
+        Raises:
+            PublisherUnavailableError: If the publisher is not connected or no
+                channel can be opened.
+        """
+        if self._channel_pool is None:
+            raise PublisherUnavailableError("Publisher is not connected")
+
+        try:
+            async with self._channel_pool.acquire() as channel:
+                exchange = await self._get_exchange(channel)
+                publish_stream = PublishStream(self, exchange, window, max_errors)
+                try:
+                    yield publish_stream
+                finally:
+                    await publish_stream.wait()
+        except aio_pika.exceptions.AMQPError as exc:
+            raise PublisherUnavailableError("Failed to open publish stream") from exc
@@ -0,0 +1,10 @@
+"""
+Test configuration: the settings the service reads at import, so the tests
+run without a deployment environment. Nothing connects to them.
+"""
+
+import os
+
+os.environ.setdefault("AUTH_SERVICE_URL", "http://auth.test")
+os.environ.setdefault("RABBITMQ_HOST", "localhost")
+os.environ.setdefault("NEW_RELIC_ENABLED", "false")
@@ -0,0 +1,54 @@
+import asyncio
+import base64
+
+import httpx
+import pytest
+
+from src import main
+
+
+def test_task_type_selects_routing_key():
+    message, routing_key = main.build_task_message(
+        {"type": "inventory", "product_id": 1, "quantity": 2}, "token"
+    )
+    assert routing_key == "inventory"
+    assert message.type == "inventory"
+
+
+def test_missing_task_type_defaults_to_product():
+    _, routing_key = main.build_task_message({"name": "Widget"}, "token")
+    assert routing_key == "product"
+
+
+@pytest.mark.parametrize("task_type", ["unknown", ["product"], {"x": 1}, 1, None])
+def test_invalid_task_type_raises_value_error(task_type):
+    with pytest.raises(ValueError):
+        main.build_task_message({"type": task_type}, "token")
+
+
+def test_batch_reports_invalid_task_types_as_rejected(monkeypatch):
+    async def get_access_token(username, password):
+        return "token"
+
+    async def publish_batch(messages, window):
+        return [None] * len(messages)
+
+    monkeypatch.setattr(main, "get_access_token", get_access_token)
+    monkeypatch.setattr(main.publisher, "publish_batch", publish_batch)
+
+    async def post():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://coordinator"
+        ) as client:
+            return await client.post(
+                "/process/batch",
+                json=[{"name": "Widget"}, {"type": ["x"]}],
+                headers={"Authorization": "Basic " + base64.b64encode(b"a:b").decode()},
+            )
+
+    response = asyncio.run(post())
+    assert response.status_code == 202
+    body = response.json()
+    assert (body["accepted"], body["rejected"]) == (1, 1)
+    assert body["results"][1]["status"] == "rejected"
@@ -0,0 +1,97 @@
+import asyncio
+import base64
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from src import main
+from src.credential_cache import CredentialCache
+
+
+def make_token(expires_in: float = 300) -> str:
+    payload = json.dumps({"sub": "alice", "exp": time.time() + expires_in})
+    encoded = base64.urlsafe_b64encode(payload.encode()).rstrip(b"=").decode()
+    return f"header.{encoded}.signature"
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = CredentialCache(max_size=10, expiry_margin=30)
+    monkeypatch.setattr(main, "credential_cache", cache)
+    return cache
+
+
+def respond(monkeypatch, status_code: int, body: dict):
+    async def authenticate(username, password):
+        return httpx.Response(status_code, json=body)
+
+    monkeypatch.setattr(main.auth_client, "authenticate", authenticate)
+
+
+def test_put_and_get():
+    cache = CredentialCache(max_size=10, expiry_margin=30)
+    token = make_token()
+    cache.put("alice", "secret", token)
+    assert cache.get("alice", "secret") == token
+    assert cache.get("alice", "other") is None
+
+
+def test_token_expiring_within_margin_is_not_cached():
+    cache = CredentialCache(max_size=10, expiry_margin=30)
+    cache.put("alice", "secret", make_token(expires_in=10))
+    assert cache.get("alice", "secret") is None
+
+
+def test_invalidate_user_drops_every_password():
+    cache = CredentialCache(max_size=10, expiry_margin=30)
+    cache.put("alice", "old", make_token())
+    cache.put("alice", "new", make_token())
+    cache.put("bob", "secret", make_token())
+    cache.invalidate_user("alice")
+    assert cache.get("alice", "old") is None
+    assert cache.get("alice", "new") is None
+    assert cache.get("bob", "secret") is not None
+
+
+def test_new_password_replaces_cached_one(monkeypatch, cache):
+    cache.put("alice", "old", make_token())
+    token = make_token()
+    respond(monkeypatch, 200, {"access_token": token})
+    assert asyncio.run(main.get_access_token("alice", "new")) == token
+    assert cache.get("alice", "old") is None
+    assert cache.get("alice", "new") == token
+
+
+def test_rejected_password_keeps_the_cached_ones(monkeypatch, cache):
+    token = make_token()
+    cache.put("alice", "secret", token)
+    respond(monkeypatch, 401, {"detail": "Incorrect username or password"})
+    with pytest.raises(HTTPException):
+        asyncio.run(main.get_access_token("alice", "wrong"))
+    assert cache.get("alice", "secret") == token
+
+
+def test_invalidate_drops_only_that_password():
+    cache = CredentialCache(max_size=10, expiry_margin=30)
+    cache.put("alice", "old", make_token())
+    cache.put("alice", "new", make_token())
+    cache.invalidate("alice", "old")
+    cache.invalidate("alice", "missing")
+    assert cache.get("alice", "old") is None
+    assert cache.get("alice", "new") is not None
+    cache.invalidate("alice", "new")
+    assert cache.stats()["size"] == 0
+
+
+def test_register_drops_cached_tokens(monkeypatch, cache):
+    cache.put("alice", "secret", make_token())
+
+    async def register(user):
+        return httpx.Response(201, json={"id": 1, "username": "alice"})
+
+    monkeypatch.setattr(main.auth_client, "register", register)
+    asyncio.run(main.register_user(main.UserCreate(username="alice", password="x")))
+    assert cache.get("alice", "secret") is None
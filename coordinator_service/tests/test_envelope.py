@@ -0,0 +1,44 @@
+import json
+
+import msgpack
+import orjson
+import pytest
+
+from src.envelope import (
+    CONTENT_TYPE_JSON,
+    CONTENT_TYPE_MSGPACK,
+    ENVELOPE_VERSION,
+    TOKEN_HEADER,
+    VERSION_HEADER,
+    encode_task,
+)
+
+TASK = {"name": "Widget", "description": "A widget", "price": 9.99}
+
+
+def test_legacy_envelope_carries_token_in_body():
+    message = encode_task(TASK, "token", "product", "legacy")
+    assert json.loads(message.body) == {"task": TASK, "token": "token"}
+    assert message.message_id
+
+
+@pytest.mark.parametrize(
+    "envelope, content_type, decode",
+    [
+        ("json", CONTENT_TYPE_JSON, orjson.loads),
+        ("msgpack", CONTENT_TYPE_MSGPACK, msgpack.unpackb),
+    ],
+)
+def test_versioned_envelope_carries_token_in_headers(envelope, content_type, decode):
+    message = encode_task(TASK, "token", "product", envelope)
+    assert decode(message.body) == TASK
+    assert message.content_type == content_type
+    assert message.type == "product"
+    assert message.headers[TOKEN_HEADER] == "token"
+    assert message.headers[VERSION_HEADER] == ENVELOPE_VERSION
+
+
+@pytest.mark.parametrize("envelope", ["json", "msgpack"])
+def test_unencodable_task_raises_value_error(envelope):
+    with pytest.raises(ValueError):
+        encode_task({"product_id": 2**70}, "token", "inventory", envelope)
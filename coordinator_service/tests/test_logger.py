@@ -0,0 +1,34 @@
+import logging
+
+import pytest
+
+from src import logger as logger_module
+
+
+@pytest.fixture
+def fresh_root(monkeypatch):
+    root = logging.getLogger()
+    monkeypatch.setattr(logger_module, "_handlers_installed", False)
+    monkeypatch.setattr(root, "handlers", [])
+    yield root
+    for handler in root.handlers:
+        handler.close()
+
+
+def test_handlers_are_installed_once(fresh_root):
+    named = logger_module.setup_logger("src.example")
+    handlers = list(fresh_root.handlers)
+    assert named is logging.getLogger("src.example")
+    assert [type(handler) for handler in handlers] == [
+        logger_module.NewRelicHandler,
+        logging.StreamHandler,
+    ]
+
+    for name in ("src.other", None):
+        logger_module.setup_logger(name)
+    assert fresh_root.handlers == handlers
+    assert not handlers[0]._closing.is_set()
+
+
+def test_setup_logger_without_a_name_returns_the_root_logger(fresh_root):
+    assert logger_module.setup_logger() is fresh_root
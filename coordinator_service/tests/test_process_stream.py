@@ -0,0 +1,111 @@
+import asyncio
+import base64
+from contextlib import asynccontextmanager
+
+import httpx
+
+from src import main
+
+AUTHORIZATION = "Basic " + base64.b64encode(b"a:b").decode()
+TASK = b'{"name": "Widget"}'
+
+
+class RecordingExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key, timeout):
+        await asyncio.sleep(0.001)
+        self.published.append(routing_key)
+
+
+class FakeChannel:
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    async def get_exchange(self, name, ensure):
+        return self.exchange
+
+
+class FakePool:
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeChannel(self.exchange)
+
+
+def post_stream(monkeypatch, chunks):
+    exchange = RecordingExchange()
+
+    async def get_access_token(username, password):
+        return "token"
+
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    async def post():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://coordinator"
+        ) as client:
+            return await client.post(
+                "/process/stream",
+                content=body(),
+                headers={"Authorization": AUTHORIZATION},
+            )
+
+    monkeypatch.setattr(main, "get_access_token", get_access_token)
+    monkeypatch.setattr(main.publisher, "_channel_pool", FakePool(exchange))
+    # A shared in-flight bound with no free slot: streams must not need it.
+    monkeypatch.setattr(main.publisher, "_in_flight", asyncio.Semaphore(0))
+    return asyncio.run(post()), exchange
+
+
+def test_lines_split_across_chunks_are_published(monkeypatch):
+    body = b"\n".join([TASK] * 50) + b"\n\n" + TASK
+    chunks = [body[start : start + 7] for start in range(0, len(body), 7)]
+    response, exchange = post_stream(monkeypatch, chunks)
+
+    assert response.status_code == 202
+    assert response.json() == {"lines": 51, "accepted": 51, "rejected": 0, "errors": []}
+    assert exchange.published == ["product"] * 51
+
+
+def test_a_window_smaller_than_the_stream_paces_it(monkeypatch):
+    monkeypatch.setattr(main, "STREAM_CONFIRM_WINDOW", 4)
+    response, exchange = post_stream(monkeypatch, [TASK + b"\n"] * 100)
+
+    assert response.json()["accepted"] == 100
+    assert len(exchange.published) == 100
+
+
+def test_long_line_completed_in_one_chunk_is_refused_with_a_summary(monkeypatch):
+    monkeypatch.setattr(main, "STREAM_MAX_LINE_BYTES", 30)
+    long_task = b'{"name": "Widget", "description": "far too long"}'
+    response, exchange = post_stream(
+        monkeypatch, [TASK + b"\n" + b"[1]\n" + long_task + b"\n" + TASK + b"\n"]
+    )
+
+    assert response.status_code == 413
+    detail = response.json()["detail"]
+    assert detail["message"] == "Line 3 exceeds 30 bytes"
+    assert detail["summary"] == {
+        "lines": 2,
+        "accepted": 1,
+        "rejected": 1,
+        "errors": [{"line": 2, "detail": "Task must be a JSON object"}],
+    }
+    assert exchange.published == ["product"]
+
+
+def test_long_partial_line_is_refused_before_it_ends(monkeypatch):
+    monkeypatch.setattr(main, "STREAM_MAX_LINE_BYTES", 30)
+    response, exchange = post_stream(monkeypatch, [TASK + b"\n", b"x" * 20, b"x" * 20])
+
+    assert response.status_code == 413
+    detail = response.json()["detail"]
+    assert detail["message"] == "Line 2 exceeds 30 bytes"
+    assert detail["summary"]["accepted"] == 1
@@ -0,0 +1,111 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aio_pika
+
+from src.publisher import PublisherUnavailableError, RabbitMQPublisher
+
+
+class SlowExchange:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.outstanding = 0
+        self.max_outstanding = 0
+        self.published = []
+
+    async def publish(self, message, routing_key, timeout):
+        self.outstanding += 1
+        self.max_outstanding = max(self.max_outstanding, self.outstanding)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.outstanding -= 1
+        self.published.append(routing_key)
+
+
+class FakeChannel:
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    async def get_exchange(self, name, ensure):
+        return self.exchange
+
+
+class FakePool:
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeChannel(self.exchange)
+
+
+def make_publisher(exchange, max_in_flight=2, publish_timeout=0.05):
+    publisher = RabbitMQPublisher(
+        host="localhost",
+        port=5672,
+        login="guest",
+        password="guest",
+        channel_pool_size=10,
+        max_in_flight=max_in_flight,
+        publish_timeout=publish_timeout,
+        connect_retry_delay=0,
+        exchange="tasks",
+        routes={},
+    )
+    publisher._channel_pool = FakePool(exchange)
+    publisher._in_flight = asyncio.Semaphore(max_in_flight)
+    return publisher
+
+
+def messages(count: int):
+    return [(aio_pika.Message(b"{}"), "product")] * count
+
+
+def test_batch_larger_than_the_in_flight_bound_is_not_rejected():
+    exchange = SlowExchange(delay=0.01)
+
+    async def run():
+        publisher = make_publisher(exchange)
+        return await publisher.publish_batch(messages(500), window=50)
+
+    assert asyncio.run(run()) == [None] * 500
+    assert len(exchange.published) == 500
+    assert exchange.max_outstanding == 50
+
+
+def test_batch_reports_each_failed_message():
+    exchange = SlowExchange(delay=0)
+    calls = 0
+
+    async def publish(message, routing_key, timeout):
+        nonlocal calls
+        calls += 1
+        if calls % 2 == 0:
+            raise asyncio.TimeoutError
+
+    exchange.publish = publish
+
+    async def run():
+        return await make_publisher(exchange).publish_batch(messages(4), window=2)
+
+    errors = asyncio.run(run())
+    assert [error is None for error in errors] == [True, False, True, False]
+    assert all(isinstance(error, PublisherUnavailableError) for error in errors[1::2])
+
+
+def test_single_publishes_are_not_starved_by_a_running_batch():
+    exchange = SlowExchange(delay=0.01)
+
+    async def run():
+        publisher = make_publisher(exchange, publish_timeout=0.1)
+        batch = asyncio.create_task(publisher.publish_batch(messages(2000), 100))
+        await asyncio.sleep(0)
+        singles = [publisher.publish(*messages(1)[0]) for _ in range(4)]
+        await asyncio.gather(*singles)
+        finished_first = not batch.done()
+        return finished_first, await batch
+
+    finished_first, errors = asyncio.run(run())
+    assert finished_first
+    assert errors == [None] * 2000
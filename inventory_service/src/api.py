@@ -0,0 +1,288 @@
+"""
+This module contains the stock API for the Inventory Service.
+
+The inventory table holds one row per product, kept current by the
+consumer's upserts, so it is the per-product summary. This FastAPI
+application serves it from a ``StockCache`` that is warmed from the table
+and updated from the quantities the consumer announces with ``pg_notify``
+after each commit. Cached quantities expire after ``STOCK_CACHE_TTL``
+seconds, so a lost announcement is not served forever.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import asyncpg
+from fastapi import Depends, FastAPI, HTTPException, Response
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .config import (
+    API_LISTEN_RETRY_DELAY,
+    ASYNC_DATABASE_URL,
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    STOCK_BULK_MAX_IDS,
+    STOCK_CACHE_MAX_SIZE,
+    STOCK_CACHE_TTL,
+)
+from .crud import STOCK_CHANGES_CHANNEL, get_all_stock, get_stock
+from .logger import setup_logger
+from .metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from .schemas import BulkStockIn, BulkStockOut, StockOut
+from .stock_cache import StockCache
+
+logger = setup_logger(__name__)
+
+engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=DB_POOL_SIZE)
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+cache = StockCache(max_size=STOCK_CACHE_MAX_SIZE, ttl=STOCK_CACHE_TTL)
+
+
+def on_stock_changed(connection, pid, channel, payload: str):
+    """
+    Handle a stock change notification from the consumer.
+
+    Args:
+        connection: The listening connection.
+        pid (int): The PID of the notifying backend.
+        channel (str): The notification channel.
+        payload (str): Comma-separated ``product_id:quantity`` pairs.
+
+    Returns:
+        None
+    """
+    try:
+        quantities = {
+            int(product_id): int(quantity)
+            for product_id, quantity in (pair.split(":") for pair in payload.split(","))
+        }
+    except ValueError:
+        logger.warning("Unexpected stock change payload: %r", payload)
+        cache.clear()
+        return
+    cache.update(quantities)
+
+
+async def warm_cache():
+    """
+    Load the inventory table into the cache.
+
+    Returns:
+        None
+    """
+    async with SessionLocal() as db:
+        quantities = await get_all_stock(db, STOCK_CACHE_MAX_SIZE + 1)
+    cache.warm(quantities, complete=len(quantities) <= STOCK_CACHE_MAX_SIZE)
+    logger.info("Stock cache warmed: %s", cache.stats())
+
+
+async def listen(dsn: str):
+    """
+    Listen for stock change notifications on one connection until it is
+    lost.
+
+    Once the listener is registered, the cache is cleared and warmed again,
+    so no change is missed between the two. It is warmed again every
+    ``STOCK_CACHE_TTL`` seconds, before its entries expire, and cleared when
+    the connection is lost, since changes are missed until it is back.
+
+    Args:
+        dsn (str): The database to connect to.
+
+    Returns:
+        None
+    """
+    connection = await asyncpg.connect(dsn)
+    try:
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _connection: closed.set())
+        await connection.add_listener(STOCK_CHANGES_CHANNEL, on_stock_changed)
+        cache.clear()
+        logger.info("Listening for stock changes.")
+        while not closed.is_set():
+            await warm_cache()
+            try:
+                await asyncio.wait_for(closed.wait(), STOCK_CACHE_TTL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        cache.clear()
+        await connection.close()
+
+
+async def listen_for_changes():
+    """
+    Listen for stock change notifications until cancelled, reconnecting
+    whenever the connection is lost or cannot be set up.
+
+    Returns:
+        None
+    """
+    dsn = make_url(DATABASE_URL).set(drivername="postgresql")
+    while True:
+        try:
+            await listen(dsn.render_as_string(hide_password=False))
+            logger.warning("Change listener connection lost, reconnecting.")
+        except (
+            OSError,
+            asyncio.TimeoutError,
+            asyncpg.PostgresError,
+            asyncpg.InterfaceError,
+            SQLAlchemyError,
+        ) as e:
+            logger.warning(
+                "Change listener failed, retrying in %.1fs: %s",
+                API_LISTEN_RETRY_DELAY,
+                e,
+            )
+            await asyncio.sleep(API_LISTEN_RETRY_DELAY)
+        except Exception:
+            # The cache would otherwise go stale with nothing in the log.
+            logger.exception(
+                "Change listener failed unexpectedly, retrying in %.1fs.",
+                API_LISTEN_RETRY_DELAY,
+            )
+            await asyncio.sleep(API_LISTEN_RETRY_DELAY)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Start the change listener, which warms the cache, on startup and stop it
+    on shutdown.
+
+    Args:
+        _app (FastAPI): The application instance.
+
+    Yields:
+        None
+    """
+    listener = asyncio.create_task(listen_for_changes())
+    yield
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+    await engine.dispose()
+    logger.info("Stock API stopped, cache: %s", cache.stats())
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+
+async def get_db():
+    """
+    Get an async database session.
+
+    Yields:
+        AsyncSession: A session object for interacting with the database.
+    """
+    async with SessionLocal() as db:
+        yield db
+
+
+async def lookup_stock(
+    db: AsyncSession, product_ids: List[int]
+) -> Dict[int, Optional[int]]:
+    """
+    Return the quantity of each product, from the cache when possible and
+    from the database otherwise.
+
+    Args:
+        db (AsyncSession): The database session.
+        product_ids (List[int]): The product IDs.
+
+    Returns:
+        Dict[int, Optional[int]]: The quantity of each product ID, or None if
+        it has no inventory row.
+    """
+    found, missing = cache.lookup(product_ids)
+    if missing:
+        quantities = await get_stock(db, missing)
+        cache.fill(quantities)
+        for product_id in missing:
+            found[product_id] = quantities.get(product_id)
+    return found
+
+
+@app.get("/stock/{product_id}", response_model=StockOut)
+async def read_stock(product_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Retrieve the current stock of a product.
+
+    Args:
+        product_id (int): The product ID.
+        db (AsyncSession): The database session.
+
+    Returns:
+        StockOut: The product's quantity.
+
+    Raises:
+        HTTPException: If the product has no inventory row.
+    """
+    quantity = (await lookup_stock(db, [product_id]))[product_id]
+    if quantity is None:
+        raise HTTPException(status_code=404, detail="No stock for product")
+    return StockOut(product_id=product_id, quantity=quantity)
+
+
+@app.post("/stock/bulk", response_model=BulkStockOut)
+async def read_stock_bulk(request: BulkStockIn, db: AsyncSession = Depends(get_db)):
+    """
+    Retrieve the current stock of many products in one call.
+
+    Products that are not cached are read with a single query.
+
+    Args:
+        request (BulkStockIn): The product IDs.
+        db (AsyncSession): The database session.
+
+    Returns:
+        BulkStockOut: The quantities and the products without stock.
+
+    Raises:
+        HTTPException: If more than ``STOCK_BULK_MAX_IDS`` IDs are requested.
+    """
+    product_ids = list(dict.fromkeys(request.product_ids))
+    if len(product_ids) > STOCK_BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {STOCK_BULK_MAX_IDS} product IDs per request",
+        )
+
+    quantities = await lookup_stock(db, product_ids)
+    return BulkStockOut(
+        stock=[
+            StockOut(product_id=product_id, quantity=quantities[product_id])
+            for product_id in product_ids
+            if quantities[product_id] is not None
+        ],
+        missing=[
+            product_id for product_id in product_ids if quantities[product_id] is None
+        ],
+    )
+
+
+@app.get("/stock/cache/stats")
+async def read_cache_stats():
+    """
+    Return the stock cache counters.
+
+    Returns:
+        dict: The size, completeness, hits, misses, updates, evictions and
+        expirations.
+    """
+    return cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """
+    Return the service metrics in the Prometheus text format.
+
+    Returns:
+        Response: The metrics.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -1,129 +1,745 @@
 """
-This module sets up a RabbitMQ consumer and SQLAlchemy for the Inventory Service.
+This module contains the RabbitMQ consumer for the Inventory Service.
+
+Each ``InventoryConsumer`` is one worker with its own RabbitMQ connection and
+database connection pool; ``main`` runs several of them in separate
+processes.
+
+When inventory tasks are partitioned by product ID, each worker consumes only
+the partition queues it owns, so all updates for a product are coalesced by
+one worker and no two workers contend for the same rows.
 """
 
-import json
+import functools
 import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
-import pika
 import sqlalchemy
-from jose import JWTError, jwt
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from .config import (
+    BATCH_SIZE,
+    BATCH_TIMEOUT_MS,
+    CONSUMER_INSTANCE,
+    CONSUMER_INSTANCES,
+    CONSUMER_PREFETCH,
+    CONSUMER_REPORT_INTERVAL,
+    CONSUMER_WORKERS,
     DATABASE_URL,
-    JWT_ALGORITHM,
-    JWT_SECRET_KEY,
-    RABBITMQ_HOST,
-    RABBITMQ_PORT,
+    DB_POOL_SIZE,
+    DEDUP_CACHE_SIZE,
+    DEDUP_RETENTION,
+    INVENTORY_PARTITIONS,
+    METRICS_PORT,
+    TASK_EXCHANGE,
+)
+from .connection import ConnectionManager
+from .crud import (
+    apply_inventory_deltas,
+    claim_messages,
+    prune_processed_messages,
+)
+from .dedup import RecentMessages, get_message_id
+from .envelope import (
+    decode_body,
+    decode_legacy,
+    get_envelope_version,
+    get_header_token,
+    get_published_at,
+)
+from .failures import (
+    MALFORMED_ERRORS,
+    Delivery,
+    FailureHandler,
+    describe,
+    is_transient,
 )
 from .logger import setup_logger
-from .models import Base, Inventory
+from .metrics import SIZE_BUCKETS, registry, serve_worker_metrics
+from .migrations import upgrade_schema
+from .models import Base
+from .partitioning import (
+    PARTITION_QUEUE_ARGUMENTS,
+    partition_queue,
+    partition_routing_key,
+)
+from .tokens import token_verifier, verify_token
+
+logger = setup_logger(__name__)
 
-logger = setup_logger()
+QUEUE_NAME = "inventory_tasks"
+TASK_TYPE = "inventory"
+
+consumed_messages = registry.counter(
+    "consumer_messages_total",
+    "Messages consumed, by outcome.",
+    ["outcome"],
+)
+queue_lag_seconds = registry.histogram(
+    "consumer_queue_lag_seconds",
+    "Time from publishing a message to its delivery to a worker.",
+)
+commit_seconds = registry.histogram(
+    "consumer_commit_seconds",
+    "Time to write and commit a transaction.",
+)
+batch_messages = registry.histogram(
+    "consumer_batch_messages",
+    "Messages per flushed batch.",
+    buckets=SIZE_BUCKETS,
+)
 
 
-def create_rabbitmq_connection():
+def setup_database():
     """
-    Creates a RabbitMQ connection.
+    Create the database tables and apply pending schema upgrades.
 
-    This function attempts to establish a connection to a RabbitMQ server using the pika library.
-    It continuously retries the connection until it is successful.
+    Runs once in the parent process before the workers start; the engine is
+    disposed afterwards so no connection is shared across a fork.
 
     Returns:
-        pika.BlockingConnection: The established RabbitMQ connection.
+        None
+    """
+    engine = sqlalchemy.create_engine(DATABASE_URL)
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    engine.dispose()
+    logger.info("Database setup complete.")
 
-    Raises:
-        pika.exceptions.AMQPConnectionError: If the connection to the RabbitMQ server fails.
+
+def prune_dedup_records():
     """
+    Delete processed-message records older than ``DEDUP_RETENTION``.
 
-    while True:
-        try:
-            conn = pika.BlockingConnection(
-                pika.ConnectionParameters(host=RABBITMQ_HOST, port=RABBITMQ_PORT)
-            )
-            return conn
-        except pika.exceptions.AMQPConnectionError:
-            print("Connection failed, retrying...")
-            time.sleep(5)  # Wait before retrying
+    Runs periodically in the parent process. The engine does not pool
+    connections, so none is left open for workers forked later.
+
+    Returns:
+        None
+    """
+    engine = sqlalchemy.create_engine(DATABASE_URL, poolclass=NullPool)
+    db = sessionmaker(bind=engine)()
+    try:
+        deleted = prune_processed_messages(db, DEDUP_RETENTION)
+        db.commit()
+        logger.info("Pruned %d processed-message records.", deleted)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("Failed to prune processed-message records: %s", e)
+    finally:
+        db.close()
+        engine.dispose()
 
 
-def verify_token(token: str) -> dict:
+def owned_partitions(worker_id: int) -> List[int]:
     """
-    Verifies a JWT token.
+    Return the partitions a worker owns.
+
+    Partitions are dealt round-robin over every worker of every instance, so
+    adding workers reassigns whole partitions without rehashing products.
 
     Args:
-        token (str): The JWT token to be verified.
+        worker_id (int): The index of the worker in this instance.
 
     Returns:
-        dict: The decoded payload if the token is valid.
+        List[int]: The owned partitions, possibly none.
+    """
+    owners = CONSUMER_INSTANCES * CONSUMER_WORKERS
+    owner = CONSUMER_INSTANCE * CONSUMER_WORKERS + worker_id
+    return [
+        partition
+        for partition in range(INVENTORY_PARTITIONS)
+        if partition % owners == owner
+    ]
 
-    Raises:
-        ValueError: If the token is expired or invalid.
+
+def queue_bindings(worker_id: int) -> List[Tuple[str, str]]:
     """
-    try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
-    except JWTError as exc:
-        raise ValueError("Invalid token") from exc
+    Return the queues a worker consumes and their routing keys.
 
+    Without partitioning every worker shares the single inventory queue.
 
-# Setup SQLAlchemy
-engine = sqlalchemy.create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base.metadata.create_all(bind=engine)
-logger.info("Database setup complete.")
+    Args:
+        worker_id (int): The index of the worker in this instance.
 
-# Setup RabbitMQ
-connection = create_rabbitmq_connection()
-channel = connection.channel()
-channel.queue_declare(queue="inventory_tasks")
-logger.info("RabbitMQ setup complete and queue declared.")
+    Returns:
+        List[Tuple[str, str]]: The queue name and routing key of each queue.
+    """
+    if INVENTORY_PARTITIONS <= 1:
+        return [(QUEUE_NAME, TASK_TYPE)]
+    return [
+        (
+            partition_queue(QUEUE_NAME, partition),
+            partition_routing_key(TASK_TYPE, partition),
+        )
+        for partition in owned_partitions(worker_id)
+    ]
 
 
-def callback(ch, method, properties, body):
+def observe_queue_lag(properties):
     """
-    Callback function for processing incoming messages.
+    Record how long a message waited between publishing and delivery.
+
+    Messages that were retried include their time in the retry lanes.
 
     Args:
-        ch: The channel object.
-        method: The method object.
-        properties: The properties object.
-        body: The message body.
+        properties: The message properties.
 
     Returns:
         None
     """
-    task = body.decode()
+    published_at = get_published_at(properties)
+    if published_at is not None:
+        queue_lag_seconds.observe(max(0.0, time.time() - published_at))
 
-    # Extract and verify the token
-    try:
-        task_data = json.loads(task)
-        data = task_data.get("task")
-        token = task_data.get("token")
+
+def parse_integer(value, field: str) -> int:
+    """
+    Convert a task field to an integer.
+
+    Args:
+        value: The field value: an integer, an integral float or a decimal
+            string.
+        field (str): The field name, for the error message.
+
+    Returns:
+        int: The value.
+
+    Raises:
+        ValueError: If the value is not an integer, including booleans,
+            fractions, infinities and NaN.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"{field} must be an integer")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return int(value)
+    raise ValueError(f"{field} must be an integer")
+
+
+def parse_task(body: bytes, properties) -> Optional[Tuple[int, int]]:
+    """
+    Decode a message and verify its token.
+
+    Versioned messages are authenticated from their headers before the body
+    is decoded; legacy JSON messages carry the token in the body.
+
+    Args:
+        body (bytes): The message body.
+        properties: The message properties.
+
+    Returns:
+        Tuple[int, int] or None: The product ID and quantity delta, or None if
+        the message carries no token.
+
+    Raises:
+        ValueError: If the message cannot be decoded, is not an inventory task,
+            the token is invalid or a field is not an integer.
+        KeyError: If the task is missing a field.
+        TypeError: If the task is not an object.
+    """
+    if get_envelope_version(properties) >= 2:
+        task_type = getattr(properties, "type", None)
+        if task_type and task_type != TASK_TYPE:
+            raise ValueError(f"Unexpected task type: {task_type}")
+        token = get_header_token(properties)
+        if not token:
+            logger.warning("No token provided. Task cannot be processed.")
+            return None
+        verify_token(token)  # Validate the token before touching the body
+        data = decode_body(body, properties.content_type)
+    else:
+        data, token = decode_legacy(body)
+        if not token:
+            logger.warning("No token provided. Task cannot be processed.")
+            return None
+        verify_token(token)  # Validate the token
+
+    return (
+        parse_integer(data["product_id"], "product_id"),
+        parse_integer(data["quantity"], "quantity"),
+    )
+
+
+class FlushResult(NamedTuple):
+    """
+    The outcome of writing a batch, handed back to the I/O thread.
+
+    Attributes:
+        written (int): The number of applied updates.
+        duplicates (int): The number of messages already committed before.
+        committed (List[str]): The message IDs recorded as processed.
+        failed (List[Tuple[Delivery, Exception]]): The messages to retry or
+            dead-letter, with their errors.
+    """
+
+    written: int
+    duplicates: int
+    committed: List[str]
+    failed: List[Tuple[Delivery, Exception]]
+
+
+class InventoryBatcher:
+    """
+    Coalesce inventory updates and write them to the database in batches.
+
+    Quantity deltas are summed per product while a batch is open, so a hot
+    product receiving many updates costs one row in one upsert. A batch is
+    flushed when it holds ``batch_size`` messages or when ``batch_timeout``
+    seconds have passed since its first message, whichever comes first, and
+    its messages are acknowledged together only after the commit succeeds.
+
+    The transaction runs on the worker's single database thread, so the I/O
+    thread keeps answering heartbeats and filling the next batch meanwhile.
+    Batches commit in order and their results come back to the I/O thread
+    through ``ConnectionManager.call_threadsafe``, where the messages are
+    acknowledged. A batcher belongs to one connection; if the connection is
+    lost, its unacknowledged messages are redelivered on the next one.
+
+    A delta is not idempotent, so messages already committed are dropped:
+    recent ones from memory, older ones by claiming their IDs in the batch's
+    transaction before the deltas are summed.
+
+    Malformed messages are dead-lettered as they arrive. If the batch fails
+    transiently, every message goes to its retry lane; if the database
+    rejects it, the updates are applied one at a time so only the rejected
+    ones are dead-lettered.
+
+    Args:
+        manager (ConnectionManager): The manager of the connection.
+        connection (pika.BlockingConnection): The connection used for timers.
+        channel: The channel the messages are consumed from.
+        executor (ThreadPoolExecutor): The single-threaded database executor.
+        session_factory (sessionmaker): The factory for database sessions.
+        recent (RecentMessages): The IDs of recently committed messages.
+        failures (FailureHandler): The handler for failed messages.
+        batch_size (int): The maximum number of messages per batch.
+        batch_timeout (float): The maximum time to hold a batch, in seconds.
+    """
+
+    def __init__(
+        self,
+        manager: ConnectionManager,
+        connection,
+        channel,
+        executor: ThreadPoolExecutor,
+        session_factory: sessionmaker,
+        recent: RecentMessages,
+        failures: FailureHandler,
+        batch_size: int,
+        batch_timeout: float,
+    ):
+        self.manager = manager
+        self.connection = connection
+        self.channel = channel
+        self.executor = executor
+        self.session_factory = session_factory
+        self.recent = recent
+        self.failures = failures
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.updates: List[Tuple[Delivery, Optional[str], int, int]] = []
+        self.message_ids: Set[str] = set()
+        self.pending = 0
+        self.last_delivery_tag = None
+        self._timer = None
+
+    def callback(self, queue: str, method, properties, body):
+        """
+        Callback function for adding an incoming message to the batch.
+
+        Args:
+            queue (str): The queue the message was consumed from.
+            method: The method object.
+            properties: The properties object.
+            body: The message body.
+
+        Returns:
+            None
+        """
         logger.info("Received a new task.")
-        if token:
-            verify_token(token)  # Validate the token
+        observe_queue_lag(properties)
+        message_id = get_message_id(properties)
+        if message_id and (
+            message_id in self.message_ids or self.recent.seen(message_id)
+        ):
+            consumed_messages.inc(outcome="duplicate")
+            logger.info("Dropped duplicate message %s.", message_id)
         else:
-            logger.warning("No token provided. Task cannot be processed.")
+            delivery = Delivery(queue, properties, body)
+            try:
+                update = parse_task(body, properties)
+                if update is not None:
+                    self.updates.append((delivery, message_id, *update))
+                    if message_id:
+                        self.message_ids.add(message_id)
+            except MALFORMED_ERRORS as e:
+                self.failures.handle(delivery, e)
+            except Exception as e:
+                # An unexpected error would otherwise kill the worker, and the
+                # redelivered message would kill its replacement.
+                logger.exception("Unexpected error parsing a message.")
+                self.failures.handle(delivery, e)
+
+        self.pending += 1
+        self.last_delivery_tag = method.delivery_tag
+        if self.pending >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = self.connection.call_later(self.batch_timeout, self.flush)
+
+    def flush(self):
+        """
+        Hand the batched updates to the database thread.
+
+        Returns:
+            None
+        """
+        if self._timer is not None:
+            self.connection.remove_timeout(self._timer)
+            self._timer = None
+        if self.last_delivery_tag is None:
             return
 
-        # Proceed with processing if token is valid
-        inventory_item = Inventory(
-            product_id=data["product_id"], quantity=data["quantity"]
+        batch_messages.observe(self.pending)
+        updates = self.updates
+        message_ids = list(self.message_ids)
+        delivery_tag = self.last_delivery_tag
+        self.updates = []
+        self.message_ids = set()
+        self.pending = 0
+        self.last_delivery_tag = None
+
+        future = self.executor.submit(self._write, updates, message_ids)
+        future.add_done_callback(functools.partial(self._on_written, delivery_tag))
+
+    def _on_written(self, delivery_tag: int, future: Future):
+        # Runs on the database thread.
+        finish = functools.partial(self._finish, delivery_tag, future)
+        if not self.manager.call_threadsafe(self.connection, finish):
+            logger.warning(
+                "Connection closed before a batch was acknowledged; "
+                "it will be redelivered."
+            )
+
+    def _finish(self, delivery_tag: int, future: Future):
+        """
+        Retry or dead-letter the failed messages of a written batch and
+        acknowledge all of its messages. Runs on the I/O thread.
+
+        Args:
+            delivery_tag (int): The delivery tag of the batch's last message.
+            future (Future): The future of ``_write``.
+
+        Returns:
+            None
+        """
+        result: FlushResult = future.result()
+        for delivery, error in result.failed:
+            self.failures.handle(delivery, error)
+        self.recent.add(result.committed)
+        self.recent.stored_duplicates += result.duplicates
+        consumed_messages.inc(result.written, outcome="committed")
+        consumed_messages.inc(result.duplicates, outcome="duplicate")
+        self.channel.basic_ack(delivery_tag=delivery_tag, multiple=True)
+        logger.info("Applied %d inventory updates.", result.written)
+
+    def _write(
+        self,
+        updates: List[Tuple[Delivery, Optional[str], int, int]],
+        message_ids: List[str],
+    ) -> FlushResult:
+        """
+        Apply a batch. Runs on the database thread.
+
+        Updates whose message ID was already claimed are skipped.
+
+        Args:
+            updates (List[Tuple[Delivery, Optional[str], int, int]]): The
+                batched messages, with their message IDs, product IDs and
+                quantity deltas.
+            message_ids (List[str]): The message IDs of the batch.
+
+        Returns:
+            FlushResult: The outcome of the batch.
+        """
+        try:
+            applied = self._apply(updates, message_ids)
+            return FlushResult(applied, len(updates) - applied, message_ids, [])
+        except Exception as e:
+            if is_transient(e):
+                logger.error(
+                    "Failed to apply batch of %d inventory updates: %s",
+                    len(updates),
+                    describe(e),
+                )
+                return FlushResult(
+                    0, 0, [], [(delivery, e) for delivery, *_ in updates]
+                )
+            logger.warning(
+                "Batch of %d inventory updates rejected, applying them one "
+                "at a time: %s",
+                len(updates),
+                describe(e),
+            )
+            return self._apply_each(updates)
+
+    def _apply(
+        self,
+        updates: List[Tuple[Delivery, Optional[str], int, int]],
+        message_ids: List[str],
+    ) -> int:
+        """
+        Claim message IDs and apply the coalesced deltas of the updates not
+        committed before, in one transaction.
+
+        Args:
+            updates (List[Tuple[Delivery, Optional[str], int, int]]): The
+                batched messages, with their message IDs, product IDs and
+                quantity deltas.
+            message_ids (List[str]): The message IDs of the batch.
+
+        Returns:
+            int: The number of applied updates.
+
+        Raises:
+            Exception: If the transaction fails; it is rolled back.
+        """
+        deltas: Dict[int, int] = defaultdict(int)
+        applied = 0
+        start = time.perf_counter()
+        db = self.session_factory()
+        try:
+            claimed = claim_messages(db, message_ids)
+            for _, message_id, product_id, quantity in updates:
+                if message_id is None or message_id in claimed:
+                    deltas[product_id] += quantity
+                    applied += 1
+            apply_inventory_deltas(db, deltas)
+            db.commit()
+            commit_seconds.observe(time.perf_counter() - start)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return applied
+
+    def _apply_each(
+        self, updates: List[Tuple[Delivery, Optional[str], int, int]]
+    ) -> FlushResult:
+        """
+        Apply the updates of a rejected batch one at a time.
+
+        Args:
+            updates (List[Tuple[Delivery, Optional[str], int, int]]): The
+                batched messages, with their message IDs, product IDs and
+                quantity deltas.
+
+        Returns:
+            FlushResult: The outcome of the batch, with the updates that
+            failed on their own.
+        """
+        applied = 0
+        committed: List[str] = []
+        failed: List[Tuple[Delivery, Exception]] = []
+        for update in updates:
+            delivery, message_id, _, _ = update
+            message_ids = [message_id] if message_id else []
+            try:
+                applied += self._apply([update], message_ids)
+                committed.extend(message_ids)
+            except Exception as e:
+                failed.append((delivery, e))
+        return FlushResult(
+            applied, len(updates) - applied - len(failed), committed, failed
         )
 
-        db = SessionLocal()
-        db.add(inventory_item)
-        db.commit()
-        logger.info("Product '%s' added to the database.", inventory_item.product_id)
-        db.close()
-    except ValueError as e:
-        logger.error("Token validation failed: %s", e)
 
+class InventoryConsumer:
+    """
+    A single consumer worker.
 
-channel.basic_consume(
-    queue="inventory_tasks", on_message_callback=callback, auto_ack=True
-)
-logger.info("Waiting for messages. To exit press CTRL+C")
-channel.start_consuming()
+    The worker owns one RabbitMQ connection and one SQLAlchemy engine, so
+    several workers can run side by side in separate processes. The
+    connection is re-established whenever it is lost.
+
+    Args:
+        worker_id (int): The index of the worker, used in log messages.
+    """
+
+    def __init__(self, worker_id: int = 0):
+        self.worker_id = worker_id
+        self.engine = sqlalchemy.create_engine(DATABASE_URL, pool_size=DB_POOL_SIZE)
+        self.SessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine
+        )
+        self.manager = ConnectionManager(f"Worker {worker_id}")
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"inventory-db-{worker_id}"
+        )
+        self.connection = None
+        self.channel = None
+        self.batcher: Optional[InventoryBatcher] = None
+        self.failures = FailureHandler(None)
+        self.queues: Dict[str, str] = {}
+        self.recent = RecentMessages(DEDUP_CACHE_SIZE)
+        self.processed = 0
+        self._reported = 0
+        self._reported_at = time.monotonic()
+
+    def on_message(self, ch, method, properties, body):
+        """
+        Count the message and add it to the current batch.
+
+        Args:
+            ch: The channel object.
+            method: The method object.
+            properties: The properties object.
+            body: The message body.
+
+        Returns:
+            None
+        """
+        self.processed += 1
+        self.batcher.callback(
+            self.queues[method.consumer_tag], method, properties, body
+        )
+
+    def report(self, connection):
+        """
+        Log the worker's throughput since the previous report and schedule the
+        next one.
+
+        Args:
+            connection (pika.BlockingConnection): The connection the report
+                is scheduled on.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        elapsed = now - self._reported_at
+        count = self.processed - self._reported
+        logger.info(
+            "Worker %d processed %d messages in %.1fs (%.1f msg/s, total %d), "
+            "reconnects %d, token cache: %s, dedup: %s, failures: %s",
+            self.worker_id,
+            count,
+            elapsed,
+            count / elapsed if elapsed else 0.0,
+            self.processed,
+            self.manager.reconnects,
+            token_verifier.stats(),
+            self.recent.stats(),
+            self.failures.stats(),
+        )
+        self._reported = self.processed
+        self._reported_at = now
+        connection.call_later(
+            CONSUMER_REPORT_INTERVAL, functools.partial(self.report, connection)
+        )
+
+    def consume(self, connection):
+        """
+        Set up a new connection and consume from it until it is stopped or
+        lost.
+
+        Args:
+            connection (pika.BlockingConnection): The new connection.
+
+        Returns:
+            None
+        """
+        self.connection = connection
+        self.channel = connection.channel()
+        self.channel.exchange_declare(
+            exchange=TASK_EXCHANGE, exchange_type="direct", durable=True
+        )
+        self.failures.channel = self.channel
+        bindings = queue_bindings(self.worker_id)
+        for queue, routing_key in bindings:
+            self.channel.queue_declare(
+                queue=queue,
+                arguments=PARTITION_QUEUE_ARGUMENTS if queue != QUEUE_NAME else None,
+            )
+            self.channel.queue_bind(
+                queue=queue, exchange=TASK_EXCHANGE, routing_key=routing_key
+            )
+            self.failures.declare(queue)
+        self.channel.basic_qos(prefetch_count=CONSUMER_PREFETCH)
+        logger.info(
+            "Worker %d: RabbitMQ setup complete, consuming %s.",
+            self.worker_id,
+            ", ".join(queue for queue, _ in bindings),
+        )
+
+        self.batcher = InventoryBatcher(
+            self.manager,
+            connection,
+            self.channel,
+            self.executor,
+            self.SessionLocal,
+            self.recent,
+            self.failures,
+            BATCH_SIZE,
+            BATCH_TIMEOUT_MS / 1000,
+        )
+        self.queues = {}
+        for queue, _ in bindings:
+            consumer_tag = self.channel.basic_consume(
+                queue=queue, on_message_callback=self.on_message
+            )
+            self.queues[consumer_tag] = queue
+        connection.call_later(
+            CONSUMER_REPORT_INTERVAL, functools.partial(self.report, connection)
+        )
+
+        if not self.manager.stopping:
+            logger.info("Worker %d waiting for messages.", self.worker_id)
+            self.channel.start_consuming()
+
+        if self.manager.stopping:
+            # Drain: commit and ack whatever is still batched, then let the
+            # broker requeue any prefetched messages that were not delivered.
+            self.batcher.flush()
+            self.executor.shutdown(wait=True)
+            connection.process_data_events(time_limit=0)
+
+    def run(self):
+        """
+        Consume messages, reconnecting as needed, until ``stop`` is called.
+
+        The worker's metrics are served on ``METRICS_PORT + worker_id``,
+        unless ``METRICS_PORT`` is zero or less.
+
+        Returns:
+            None
+        """
+        serve_worker_metrics(METRICS_PORT, self.worker_id)
+        self.manager.run(self.consume)
+        self.executor.shutdown(wait=True)
+        self.engine.dispose()
+        logger.info(
+            "Worker %d stopped after %d messages.", self.worker_id, self.processed
+        )
+
+    def stop(self):
+        """
+        Ask the worker to stop consuming. Safe to call from a signal handler.
+
+        Returns:
+            None
+        """
+        self.manager.stop(self._stop_consuming)
+
+    def _stop_consuming(self):
+        if self.channel is not None and self.channel.is_open:
+            self.channel.stop_consuming()
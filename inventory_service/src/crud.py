@@ -0,0 +1,173 @@
+"""
+This module contains the database operations for the Inventory model.
+"""
+
+from datetime import timedelta
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import Inventory, ProcessedMessage
+
+# Postgres channel on which new quantities are announced to the stock API.
+STOCK_CHANGES_CHANNEL = "stock_changes"
+# NOTIFY payloads must be shorter than 8000 bytes.
+MAX_NOTIFY_PAYLOAD = 7900
+
+_notify = text("SELECT pg_notify(:channel, :payload)")
+
+
+def notify_stock_changes(db: Session, quantities: Dict[int, int]):
+    """
+    Announce new quantities on ``STOCK_CHANGES_CHANNEL``.
+
+    Quantities are sent as ``product_id:quantity`` pairs separated by
+    commas, split over as many notifications as the payload limit requires.
+    Postgres delivers them only when the transaction commits, in commit
+    order.
+
+    Args:
+        db (Session): The database session.
+        quantities (Dict[int, int]): The new quantity of each product ID.
+
+    Returns:
+        None
+    """
+    payloads: List[str] = []
+    payload = ""
+    for product_id, quantity in quantities.items():
+        pair = f"{product_id}:{quantity}"
+        if payload and len(payload) + len(pair) + 1 > MAX_NOTIFY_PAYLOAD:
+            payloads.append(payload)
+            payload = ""
+        payload = f"{payload},{pair}" if payload else pair
+    if payload:
+        payloads.append(payload)
+    for payload in payloads:
+        db.execute(_notify, {"channel": STOCK_CHANGES_CHANNEL, "payload": payload})
+
+
+def apply_inventory_deltas(db: Session, deltas: Dict[int, int]) -> Dict[int, int]:
+    """
+    Add quantity deltas to the inventory rows of many products at once.
+
+    All deltas are applied with one ``INSERT ... ON CONFLICT DO UPDATE``
+    statement. Rows are written in ``product_id`` order so concurrent
+    writers lock them in the same order and cannot deadlock. The resulting
+    quantities are announced with ``notify_stock_changes``.
+
+    The caller owns the transaction and is responsible for committing.
+
+    Args:
+        db (Session): The database session.
+        deltas (Dict[int, int]): The quantity change for each product ID.
+
+    Returns:
+        Dict[int, int]: The new quantity of each product ID.
+    """
+    if not deltas:
+        return {}
+
+    stmt = insert(Inventory).values(
+        [
+            {"product_id": product_id, "quantity": deltas[product_id]}
+            for product_id in sorted(deltas)
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Inventory.product_id],
+        set_={"quantity": Inventory.quantity + stmt.excluded.quantity},
+    )
+    quantities = dict(
+        db.execute(stmt.returning(Inventory.product_id, Inventory.quantity)).all()
+    )
+    notify_stock_changes(db, quantities)
+    return quantities
+
+
+def _claim_statement(message_ids: List[str]):
+    stmt = insert(ProcessedMessage).values(
+        [{"message_id": message_id} for message_id in sorted(set(message_ids))]
+    )
+    return stmt.on_conflict_do_nothing(
+        index_elements=[ProcessedMessage.message_id]
+    ).returning(ProcessedMessage.message_id)
+
+
+def claim_messages(db: Session, message_ids: List[str]) -> Set[str]:
+    """
+    Record message IDs as processed and return the ones not seen before.
+
+    Must run in the same transaction as the messages' effect, so the record
+    and the effect commit or roll back together. A concurrent transaction
+    claiming the same ID waits for this one to finish.
+
+    Args:
+        db (Session): The database session.
+        message_ids (List[str]): The message IDs.
+
+    Returns:
+        Set[str]: The IDs claimed by this call; the others are duplicates.
+    """
+    if not message_ids:
+        return set()
+    return set(db.scalars(_claim_statement(message_ids)))
+
+
+def prune_processed_messages(db: Session, retention: float) -> int:
+    """
+    Delete processed-message records older than the retention period.
+
+    Args:
+        db (Session): The database session.
+        retention (float): How long to keep records, in seconds.
+
+    Returns:
+        int: The number of deleted records.
+    """
+    result = db.execute(
+        delete(ProcessedMessage).where(
+            ProcessedMessage.processed_at < func.now() - timedelta(seconds=retention)
+        )
+    )
+    return result.rowcount
+
+
+async def get_stock(db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Retrieve the current quantity of many products.
+
+    Args:
+        db (AsyncSession): The async database session.
+        product_ids (Iterable[int]): The product IDs.
+
+    Returns:
+        Dict[int, int]: The quantity of each product ID that has an
+        inventory row.
+    """
+    result = await db.execute(
+        select(Inventory.product_id, Inventory.quantity).where(
+            Inventory.product_id.in_(list(product_ids))
+        )
+    )
+    return dict(result.all())
+
+
+async def get_all_stock(db: AsyncSession, limit: int) -> Dict[int, int]:
+    """
+    Retrieve the quantity of up to ``limit`` products, for cache warming.
+
+    Args:
+        db (AsyncSession): The async database session.
+        limit (int): The maximum number of rows.
+
+    Returns:
+        Dict[int, int]: The quantity of each product ID.
+    """
+    result = await db.stream(
+        select(Inventory.product_id, Inventory.quantity).limit(limit)
+    )
+    return {product_id: quantity async for product_id, quantity in result}
@@ -0,0 +1,317 @@
+"""
+This module routes messages that fail processing.
+
+A failed message is never requeued in place, where it would be redelivered
+at once and could stall the queue:
+
+- Malformed messages (undecodable bodies, missing fields, invalid tokens,
+  rows the database rejects) can never succeed. They, and messages that
+  raise an unexpected error, are published to the ``DEAD_LETTER_EXCHANGE``,
+  which routes them to ``<queue>.dead`` for inspection.
+- Transient failures (a lost database connection, an exhausted pool) are
+  published to the retry lane ``<queue>.retry.<n>``, a queue without
+  consumers whose messages expire after ``RETRY_BASE_DELAY_MS * 2**n``. On
+  expiry RabbitMQ dead-letters them back to ``<queue>`` through the default
+  exchange. After ``RETRY_MAX_ATTEMPTS`` retries the message is
+  dead-lettered instead.
+
+In both cases the original message is acknowledged, so one bad message
+costs one extra publish instead of a consumer crash.
+"""
+
+import copy
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from .config import DEAD_LETTER_EXCHANGE, RETRY_BASE_DELAY_MS, RETRY_MAX_ATTEMPTS
+from .logger import setup_logger
+from .metrics import registry
+
+logger = setup_logger(__name__)
+failed_messages = registry.counter(
+    "consumer_failed_messages_total",
+    "Messages that failed processing, by cause and outcome.",
+    ["cause", "outcome"],
+)
+
+RETRY_HEADER = "x-retry-count"
+REASON_HEADER = "x-failure-reason"
+MAX_REASON_LENGTH = 1000
+PERSISTENT_DELIVERY_MODE = 2
+
+# Errors raised by ``parse_task`` for a message that can never be processed.
+MALFORMED_ERRORS = (ValueError, KeyError, TypeError)
+
+
+class Delivery(NamedTuple):
+    """
+    A consumed message, kept so it can be retried or dead-lettered later.
+
+    Attributes:
+        queue (str): The queue the message was consumed from.
+        properties: The message properties.
+        body (bytes): The message body.
+    """
+
+    queue: str
+    properties: object
+    body: bytes
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Check whether a failure may succeed if the message is processed later.
+
+    Args:
+        error (Exception): The error raised while processing the message.
+
+    Returns:
+        bool: True for connection and pool errors.
+    """
+    if isinstance(error, (OperationalError, InterfaceError, PoolTimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def dead_letter_queue(queue: str) -> str:
+    """
+    Return the name of a queue's dead-letter queue.
+
+    Args:
+        queue (str): The task queue.
+
+    Returns:
+        str: The dead-letter queue name.
+    """
+    return f"{queue}.dead"
+
+
+def retry_queue(queue: str, attempt: int) -> str:
+    """
+    Return the name of a queue's retry lane.
+
+    Args:
+        queue (str): The task queue.
+        attempt (int): The number of retries before this one.
+
+    Returns:
+        str: The retry queue name.
+    """
+    return f"{queue}.retry.{attempt}"
+
+
+def retry_delay_ms(attempt: int) -> int:
+    """
+    Return how long a message waits in a retry lane.
+
+    Args:
+        attempt (int): The number of retries before this one.
+
+    Returns:
+        int: The delay in milliseconds.
+    """
+    return RETRY_BASE_DELAY_MS * 2**attempt
+
+
+def retry_queue_arguments(queue: str, attempt: int) -> dict:
+    """
+    Return the arguments of a retry lane.
+
+    Every message in a lane waits the same time, so a queue-level TTL
+    expires them in order and none is held behind a longer delay.
+
+    Args:
+        queue (str): The task queue the lane returns messages to.
+        attempt (int): The number of retries before this one.
+
+    Returns:
+        dict: The queue arguments.
+    """
+    return {
+        "x-message-ttl": retry_delay_ms(attempt),
+        "x-dead-letter-exchange": "",
+        "x-dead-letter-routing-key": queue,
+    }
+
+
+def get_retry_count(properties) -> int:
+    """
+    Return how many times a message has been retried.
+
+    Args:
+        properties: The message properties.
+
+    Returns:
+        int: The retry count, zero for a first delivery.
+    """
+    headers = getattr(properties, "headers", None) or {}
+    try:
+        return int(headers.get(RETRY_HEADER, 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def next_retry(properties, error: Exception) -> Optional[int]:
+    """
+    Choose the retry lane for a failed message.
+
+    Args:
+        properties: The message properties.
+        error (Exception): The error raised while processing the message.
+
+    Returns:
+        int or None: The retry lane, or None if the message must be
+        dead-lettered.
+    """
+    if not is_transient(error):
+        return None
+    attempt = get_retry_count(properties)
+    return attempt if attempt < RETRY_MAX_ATTEMPTS else None
+
+
+def describe(error: Exception) -> str:
+    """
+    Return the failure reason recorded on a dead-lettered message.
+
+    Args:
+        error (Exception): The error raised while processing the message.
+
+    Returns:
+        str: The error type and message, truncated.
+    """
+    return f"{type(error).__name__}: {error}"[:MAX_REASON_LENGTH]
+
+
+class FailureCounters:
+    """
+    Count failed messages by cause and outcome.
+    """
+
+    def __init__(self):
+        self.malformed = 0
+        self.transient = 0
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def record(self, error: Exception, attempt: Optional[int]):
+        """
+        Count a failed message.
+
+        Args:
+            error (Exception): The error raised while processing the message.
+            attempt (int or None): The retry lane, or None if the message was
+                dead-lettered.
+
+        Returns:
+            None
+        """
+        if is_transient(error):
+            self.transient += 1
+            cause = "transient"
+        else:
+            self.malformed += 1
+            cause = "malformed"
+        if attempt is None:
+            self.dead_lettered += 1
+            outcome = "dead_lettered"
+        else:
+            self.retried += 1
+            outcome = "retried"
+        failed_messages.inc(cause=cause, outcome=outcome)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the failure counters.
+
+        Returns:
+            Dict[str, int]: The malformed and transient failures, and the
+            messages retried and dead-lettered.
+        """
+        return {
+            "malformed": self.malformed,
+            "transient": self.transient,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+        }
+
+
+class FailureHandler(FailureCounters):
+    """
+    Retry or dead-letter failed messages on a pika channel.
+
+    The caller still acknowledges the original message.
+
+    Args:
+        channel: The channel the messages are consumed from.
+    """
+
+    def __init__(self, channel):
+        super().__init__()
+        self.channel = channel
+
+    def declare(self, queue: str):
+        """
+        Declare the dead-letter exchange and a queue's retry lanes and
+        dead-letter queue.
+
+        Args:
+            queue (str): The task queue.
+
+        Returns:
+            None
+        """
+        self.channel.exchange_declare(
+            exchange=DEAD_LETTER_EXCHANGE, exchange_type="direct", durable=True
+        )
+        dead = dead_letter_queue(queue)
+        self.channel.queue_declare(queue=dead, durable=True)
+        self.channel.queue_bind(
+            queue=dead, exchange=DEAD_LETTER_EXCHANGE, routing_key=queue
+        )
+        for attempt in range(RETRY_MAX_ATTEMPTS):
+            self.channel.queue_declare(
+                queue=retry_queue(queue, attempt),
+                durable=True,
+                arguments=retry_queue_arguments(queue, attempt),
+            )
+
+    def handle(self, delivery: Delivery, error: Exception):
+        """
+        Publish a failed message to its retry lane or dead-letter queue.
+
+        Args:
+            delivery (Delivery): The failed message.
+            error (Exception): The error raised while processing it.
+
+        Returns:
+            None
+        """
+        attempt = next_retry(delivery.properties, error)
+        self.record(error, attempt)
+        properties = copy.copy(delivery.properties)
+        headers = dict(properties.headers or {})
+        if attempt is None:
+            headers[REASON_HEADER] = describe(error)
+            properties.delivery_mode = PERSISTENT_DELIVERY_MODE
+            exchange, routing_key = DEAD_LETTER_EXCHANGE, delivery.queue
+            logger.error(
+                "Dead-lettered a message from %s: %s", delivery.queue, describe(error)
+            )
+        else:
+            headers[RETRY_HEADER] = attempt + 1
+            exchange, routing_key = "", retry_queue(delivery.queue, attempt)
+            logger.warning(
+                "Retrying a message from %s in %d ms: %s",
+                delivery.queue,
+                retry_delay_ms(attempt),
+                describe(error),
+            )
+        properties.headers = headers
+        self.channel.basic_publish(
+            exchange=exchange,
+            routing_key=routing_key,
+            body=delivery.body,
+            properties=properties,
+        )
@@ -0,0 +1,59 @@
+"""
+This module contains the schema upgrades that ``Base.metadata.create_all``
+cannot apply to an existing database.
+"""
+
+from sqlalchemy import Engine, text
+
+
+def upgrade_schema(engine: Engine):
+    """
+    Collapse the append-only inventory history into one row per product and
+    add the unique index the upsert path relies on.
+
+    Existing rows for a product are summed into its oldest row and the rest
+    are deleted. Safe to run on every startup; it returns immediately once
+    the unique index exists.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine to run the DDL on.
+
+    Returns:
+        None
+    """
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass('uq_inventory_product_id')")).scalar():
+            return
+
+        conn.execute(text("LOCK TABLE inventory IN SHARE ROW EXCLUSIVE MODE"))
+        conn.execute(
+            text(
+                """
+                UPDATE inventory AS i
+                SET quantity = t.total
+                FROM (
+                    SELECT product_id, SUM(quantity) AS total, MIN(id) AS keep_id
+                    FROM inventory
+                    GROUP BY product_id
+                    HAVING COUNT(*) > 1
+                ) AS t
+                WHERE i.id = t.keep_id
+            """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                DELETE FROM inventory AS i
+                USING inventory AS k
+                WHERE i.product_id = k.product_id AND i.id > k.id
+            """
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_inventory_product_id "
+                "ON inventory (product_id)"
+            )
+        )
+        conn.execute(text("DROP INDEX IF EXISTS ix_inventory_product_id"))
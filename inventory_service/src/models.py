@@ -2,7 +2,7 @@
 This module contains the SQLAlchemy model for the inventory item.
 """
 
-from sqlalchemy import Column, Integer
+from sqlalchemy import Column, DateTime, Index, Integer, String, func
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -10,7 +10,10 @@ Base = declarative_base()
 
 class Inventory(Base):
     """
-    Represents an inventory item.
+    Represents the current stock of a product.
+
+    There is exactly one row per product; quantity updates are applied to it
+    as deltas.
 
     Attributes:
         id (int): The unique identifier of the inventory item.
@@ -19,7 +22,29 @@ class Inventory(Base):
     """
 
     __tablename__ = "inventory"
+    __table_args__ = (Index("uq_inventory_product_id", "product_id", unique=True),)
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, index=True)
-    quantity = Column(Integer)
+    product_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False, default=0)
+
+
+class ProcessedMessage(Base):
+    """
+    Records a task message whose effect has been committed.
+
+    Rows are written in the same transaction as the task's effect, so a
+    redelivered message finds its ID here and is skipped. Old rows are
+    pruned once redelivery is no longer possible.
+
+    Attributes:
+        message_id (str): The ID the coordinator stamped on the message.
+        processed_at (datetime): When the message was processed.
+    """
+
+    __tablename__ = "processed_messages"
+
+    message_id = Column(String(64), primary_key=True)
+    processed_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), index=True
+    )
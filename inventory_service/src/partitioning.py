@@ -0,0 +1,113 @@
+"""
+This module partitions tasks across queues by a key.
+
+Inventory tasks are hashed on their product ID with jump consistent hashing,
+so every update for a product lands on the same partition queue and is
+handled by the single worker that owns it. Changing the number of partitions
+moves only the keys that must move.
+
+Partition ``p`` of a task type is routed with the key ``<type>.<p>`` to the
+queue ``<queue>.<p>``. Partition queues are declared with single active
+consumer, so while partitions are being reassigned between workers a queue
+is still only consumed by one of them.
+"""
+
+import hashlib
+from typing import Dict
+
+PARTITION_QUEUE_ARGUMENTS = {"x-single-active-consumer": True}
+
+
+def jump_consistent_hash(key: int, buckets: int) -> int:
+    """
+    Map a 64-bit key to one of ``buckets`` buckets (Lamping and Veach).
+
+    Args:
+        key (int): The key to hash.
+        buckets (int): The number of buckets.
+
+    Returns:
+        int: The bucket, between 0 and ``buckets - 1``.
+    """
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def partition_of(value, partitions: int) -> int:
+    """
+    Return the partition of an integer key such as a product ID.
+
+    Args:
+        value: The key, as an int or a numeric string.
+        partitions (int): The number of partitions.
+
+    Returns:
+        int: The partition, between 0 and ``partitions - 1``.
+
+    Raises:
+        ValueError: If the key is not an integer.
+    """
+    try:
+        key = int(value)
+    except (OverflowError, TypeError, ValueError) as exc:
+        raise ValueError(f"Invalid partition key: {value!r}") from exc
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return jump_consistent_hash(int.from_bytes(digest, "big"), partitions)
+
+
+def partition_routing_key(task_type: str, partition: int) -> str:
+    """
+    Return the routing key of a partition.
+
+    Args:
+        task_type (str): The task type.
+        partition (int): The partition.
+
+    Returns:
+        str: The routing key.
+    """
+    return f"{task_type}.{partition}"
+
+
+def partition_queue(queue: str, partition: int) -> str:
+    """
+    Return the queue name of a partition.
+
+    Args:
+        queue (str): The unpartitioned queue name.
+        partition (int): The partition.
+
+    Returns:
+        str: The queue name.
+    """
+    return f"{queue}.{partition}"
+
+
+def partition_routes(
+    routes: Dict[str, str], task_type: str, partitions: int
+) -> Dict[str, str]:
+    """
+    Replace the route of a task type with one route per partition.
+
+    Args:
+        routes (Dict[str, str]): The queue for each routing key.
+        task_type (str): The task type to partition.
+        partitions (int): The number of partitions. With one partition the
+            routes are returned unchanged.
+
+    Returns:
+        Dict[str, str]: The queue for each routing key.
+    """
+    routes = dict(routes)
+    if partitions <= 1 or task_type not in routes:
+        return routes
+    queue = routes.pop(task_type)
+    for partition in range(partitions):
+        routes[partition_routing_key(task_type, partition)] = partition_queue(
+            queue, partition
+        )
+    return routes
@@ -0,0 +1,45 @@
+"""
+This module contains the schema classes for the stock API.
+"""
+
+from typing import List
+
+from pydantic import BaseModel
+
+
+class StockOut(BaseModel):
+    """
+    StockOut schema class.
+
+    Attributes:
+        product_id (int): The product ID.
+        quantity (int): The current quantity in stock.
+    """
+
+    product_id: int
+    quantity: int
+
+
+class BulkStockIn(BaseModel):
+    """
+    BulkStockIn schema class.
+
+    Attributes:
+        product_ids (List[int]): The product IDs to look up.
+    """
+
+    product_ids: List[int]
+
+
+class BulkStockOut(BaseModel):
+    """
+    BulkStockOut schema class.
+
+    Attributes:
+        stock (List[StockOut]): The quantity of each product that has an
+            inventory row.
+        missing (List[int]): The product IDs without an inventory row.
+    """
+
+    stock: List[StockOut]
+    missing: List[int]
@@ -0,0 +1,182 @@
+"""
+This module contains the in-memory stock cache used by the stock API.
+
+The cache is warmed from the inventory table at startup and then kept
+current by the quantities the consumer announces after each commit. When the
+whole table fits, the cache is complete and answers every lookup, including
+"no inventory row", without touching the database. Otherwise it is an LRU
+over the hottest products and misses fall back to the database.
+
+Entries and completeness expire after a TTL, which bounds how stale the cache
+can get if announcements are lost without the listener noticing.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class StockCache:
+    """
+    LRU map from product ID to current quantity.
+
+    Announced quantities are absolute and arrive in commit order, so they
+    always overwrite. Values read from the database are only stored for
+    products not already cached, so a read that raced an announcement cannot
+    overwrite the newer quantity.
+
+    Args:
+        max_size (int): The maximum number of cached products.
+        ttl (float): How long an entry, and the completeness established by
+            ``warm``, stay valid, in seconds.
+    """
+
+    def __init__(self, max_size: int, ttl: float = float("inf")):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._complete_until = 0.0
+        # Per product: the quantity and the time it expires.
+        self._quantities: "OrderedDict[int, Tuple[int, float]]" = OrderedDict()
+
+    @property
+    def complete(self) -> bool:
+        """
+        bool: Whether the cache holds every inventory row, so a product it
+        does not hold has none.
+        """
+        return time.monotonic() < self._complete_until
+
+    def _store(self, product_id: int, quantity: int, now: float):
+        self._quantities[product_id] = (quantity, now + self.ttl)
+        self._quantities.move_to_end(product_id)
+        while len(self._quantities) > self.max_size:
+            self._quantities.popitem(last=False)
+            self.evictions += 1
+            self._complete_until = 0.0
+
+    def _get(self, product_id: int, now: float) -> Optional[int]:
+        entry = self._quantities.get(product_id)
+        if entry is None:
+            return None
+        quantity, expires_at = entry
+        if now >= expires_at:
+            del self._quantities[product_id]
+            self.expirations += 1
+            return None
+        return quantity
+
+    def fill(self, quantities: Dict[int, int]):
+        """
+        Store quantities read from the database for products not cached or
+        whose entry expired.
+
+        Args:
+            quantities (Dict[int, int]): The quantity of each product ID.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        for product_id, quantity in quantities.items():
+            if self._get(product_id, now) is None:
+                self._store(product_id, quantity, now)
+
+    def warm(self, quantities: Dict[int, int], complete: bool):
+        """
+        Load the inventory table, read at startup and again before the
+        entries expire.
+
+        Args:
+            quantities (Dict[int, int]): The quantity of each product ID.
+            complete (bool): Whether these are all the inventory rows.
+
+        Returns:
+            None
+        """
+        start = time.monotonic()
+        evictions = self.evictions
+        self.fill(quantities)
+        if complete and self.evictions == evictions:
+            self._complete_until = start + self.ttl
+
+    def update(self, quantities: Dict[int, int]):
+        """
+        Apply quantities announced by the consumer.
+
+        Args:
+            quantities (Dict[int, int]): The new quantity of each product ID.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        for product_id, quantity in quantities.items():
+            self._store(product_id, quantity, now)
+        self.updates += len(quantities)
+
+    def lookup(
+        self, product_ids: Iterable[int]
+    ) -> Tuple[Dict[int, Optional[int]], List[int]]:
+        """
+        Look products up in the cache.
+
+        Args:
+            product_ids (Iterable[int]): The product IDs.
+
+        Returns:
+            Tuple[Dict[int, Optional[int]], List[int]]: The known quantities,
+            with None for products known to have no inventory row, and the
+            IDs that must be read from the database, including those whose
+            entry expired.
+        """
+        found: Dict[int, Optional[int]] = {}
+        missing: List[int] = []
+        now = time.monotonic()
+        complete = now < self._complete_until
+        for product_id in product_ids:
+            cached = product_id in self._quantities
+            quantity = self._get(product_id, now)
+            if quantity is not None:
+                self._quantities.move_to_end(product_id)
+                found[product_id] = quantity
+                self.hits += 1
+            elif complete and not cached:
+                found[product_id] = None
+                self.hits += 1
+            else:
+                missing.append(product_id)
+                self.misses += 1
+        return found, missing
+
+    def clear(self):
+        """
+        Remove every entry.
+
+        Returns:
+            None
+        """
+        self._quantities.clear()
+        self._complete_until = 0.0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the cache counters.
+
+        Returns:
+            Dict[str, int]: The size, completeness, hits, misses, updates,
+            evictions and expirations.
+        """
+        return {
+            "size": len(self._quantities),
+            "complete": int(self.complete),
+            "hits": self.hits,
+            "misses": self.misses,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
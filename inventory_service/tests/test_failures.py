@@ -0,0 +1,145 @@
+import pika
+import pytest
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src import failures
+
+
+class RecordingChannel:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((exchange, routing_key, body, properties))
+
+
+def properties(retries=None):
+    headers = {"x-token": "token"}
+    if retries is not None:
+        headers[failures.RETRY_HEADER] = retries
+    return pika.BasicProperties(message_id="m-1", headers=headers)
+
+
+TRANSIENT_ERRORS = [
+    OperationalError("SELECT 1", {}, Exception("server closed the connection")),
+    InterfaceError("SELECT 1", {}, Exception("connection already closed")),
+    PoolTimeoutError("QueuePool limit reached"),
+    DBAPIError("SELECT 1", {}, Exception("reset"), connection_invalidated=True),
+]
+MALFORMED_ERRORS = [
+    ValueError("Invalid token"),
+    KeyError("task"),
+    TypeError("unhashable type"),
+    IntegrityError("INSERT", {}, Exception("null value in column")),
+    DBAPIError("INSERT", {}, Exception("invalid input syntax")),
+]
+
+
+@pytest.mark.parametrize("error", TRANSIENT_ERRORS)
+def test_connection_and_pool_errors_are_transient(error):
+    assert failures.is_transient(error)
+
+
+@pytest.mark.parametrize("error", MALFORMED_ERRORS)
+def test_parse_and_data_errors_are_not_transient(error):
+    assert not failures.is_transient(error)
+
+
+def test_parse_errors_are_malformed():
+    for error in MALFORMED_ERRORS[:3]:
+        assert isinstance(error, failures.MALFORMED_ERRORS)
+
+
+@pytest.mark.parametrize(
+    "retries, expected", [(None, 0), (0, 0), (1, 1), (4, 4), (5, None), (9, None)]
+)
+def test_next_retry_picks_the_lane_until_attempts_run_out(
+    monkeypatch, retries, expected
+):
+    monkeypatch.setattr(failures, "RETRY_MAX_ATTEMPTS", 5)
+    error = OperationalError("SELECT 1", {}, Exception("gone"))
+    assert failures.next_retry(properties(retries), error) == expected
+
+
+def test_next_retry_dead_letters_malformed_messages_at_once():
+    assert failures.next_retry(properties(), ValueError("bad body")) is None
+
+
+@pytest.mark.parametrize("header", ["two", None, [1]])
+def test_unreadable_retry_count_counts_as_a_first_delivery(header):
+    message_properties = pika.BasicProperties(headers={failures.RETRY_HEADER: header})
+    assert failures.get_retry_count(message_properties) == 0
+    assert failures.get_retry_count(pika.BasicProperties()) == 0
+
+
+def test_retry_queue_arguments_expire_back_to_the_task_queue(monkeypatch):
+    monkeypatch.setattr(failures, "RETRY_BASE_DELAY_MS", 250)
+    assert [
+        failures.retry_queue_arguments("tasks", attempt)["x-message-ttl"]
+        for attempt in range(4)
+    ] == [250, 500, 1000, 2000]
+    assert failures.retry_queue_arguments("tasks", 2) == {
+        "x-message-ttl": 1000,
+        "x-dead-letter-exchange": "",
+        "x-dead-letter-routing-key": "tasks",
+    }
+    assert failures.retry_queue("tasks", 2) == "tasks.retry.2"
+    assert failures.dead_letter_queue("tasks") == "tasks.dead"
+
+
+def test_handle_publishes_transient_failures_to_the_next_lane(monkeypatch):
+    monkeypatch.setattr(failures, "RETRY_MAX_ATTEMPTS", 5)
+    channel = RecordingChannel()
+    handler = failures.FailureHandler(channel)
+    delivery = failures.Delivery("tasks", properties(retries=1), b"body")
+    handler.handle(delivery, OperationalError("SELECT 1", {}, Exception("gone")))
+
+    [(exchange, routing_key, body, published)] = channel.published
+    assert (exchange, routing_key, body) == ("", "tasks.retry.1", b"body")
+    assert published.headers[failures.RETRY_HEADER] == 2
+    assert published.headers["x-token"] == "token"
+    assert published.message_id == "m-1"
+    # The consumed message's properties are left untouched.
+    assert delivery.properties.headers[failures.RETRY_HEADER] == 1
+    assert handler.stats() == {
+        "malformed": 0,
+        "transient": 1,
+        "retried": 1,
+        "dead_lettered": 0,
+    }
+
+
+def test_handle_dead_letters_malformed_messages_with_the_reason():
+    channel = RecordingChannel()
+    handler = failures.FailureHandler(channel)
+    delivery = failures.Delivery("tasks", properties(), b"not json")
+    handler.handle(delivery, ValueError("x" * 2000))
+
+    [(exchange, routing_key, body, published)] = channel.published
+    assert exchange == failures.DEAD_LETTER_EXCHANGE
+    assert (routing_key, body) == ("tasks", b"not json")
+    reason = published.headers[failures.REASON_HEADER]
+    assert reason.startswith("ValueError: xxx")
+    assert len(reason) == failures.MAX_REASON_LENGTH
+    assert published.delivery_mode == failures.PERSISTENT_DELIVERY_MODE
+    assert failures.RETRY_HEADER not in published.headers
+    assert handler.stats() == {
+        "malformed": 1,
+        "transient": 0,
+        "retried": 0,
+        "dead_lettered": 1,
+    }
+
+
+def test_handle_dead_letters_transient_failures_after_the_last_retry(monkeypatch):
+    monkeypatch.setattr(failures, "RETRY_MAX_ATTEMPTS", 2)
+    channel = RecordingChannel()
+    handler = failures.FailureHandler(channel)
+    delivery = failures.Delivery("tasks", properties(retries=2), b"body")
+    handler.handle(delivery, PoolTimeoutError("QueuePool limit reached"))
+
+    [(exchange, routing_key, _, _)] = channel.published
+    assert (exchange, routing_key) == (failures.DEAD_LETTER_EXCHANGE, "tasks")
+    assert handler.stats()["transient"] == 1
+    assert handler.stats()["dead_lettered"] == 1
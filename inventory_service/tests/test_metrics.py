@@ -0,0 +1,79 @@
+import socket
+import urllib.request
+
+from src import metrics
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("", 0))
+        return sock.getsockname()[1]
+
+
+def test_disabled_base_port_binds_nothing_for_any_worker(monkeypatch):
+    bound = []
+
+    def record_bind(address, handler):
+        bound.append(address)
+        raise AssertionError("no listener should be created")
+
+    monkeypatch.setattr(metrics, "ThreadingHTTPServer", record_bind)
+    assert metrics.serve_worker_metrics(0, 3) is None
+    assert metrics.serve_worker_metrics(-5, 7) is None
+    assert bound == []
+
+
+def test_worker_metrics_are_served_on_the_base_port_plus_the_worker_id():
+    port = free_port()
+    server = metrics.serve_worker_metrics(port - 2, 2)
+    try:
+        assert server.server_address[1] == port
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+            assert response.read().decode() == metrics.registry.render()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_counter_renders_one_sample_per_label_set():
+    registry = metrics.Registry()
+    counter = registry.counter("tasks_total", "Tasks by outcome.", ["outcome"])
+    counter.inc(outcome="ok")
+    counter.inc(2, outcome="ok")
+    counter.inc(outcome='bad "quote"')
+    assert registry.render() == (
+        "# HELP tasks_total Tasks by outcome.\n"
+        "# TYPE tasks_total counter\n"
+        'tasks_total{outcome="ok"} 3.0\n'
+        'tasks_total{outcome="bad \\"quote\\""} 1.0\n'
+    )
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = metrics.Registry()
+    histogram = registry.histogram(
+        "batch_size", "Messages per batch.", ["queue"], buckets=(10, 1, 5)
+    )
+    for value in (0.5, 1, 3, 7, 50):
+        histogram.observe(value, queue="q")
+    assert registry.render().splitlines() == [
+        "# HELP batch_size Messages per batch.",
+        "# TYPE batch_size histogram",
+        'batch_size_bucket{queue="q",le="1.0"} 2',
+        'batch_size_bucket{queue="q",le="5.0"} 3',
+        'batch_size_bucket{queue="q",le="10.0"} 4',
+        'batch_size_bucket{queue="q",le="+Inf"} 5',
+        'batch_size_sum{queue="q"} 61.5',
+        'batch_size_count{queue="q"} 5',
+    ]
+
+
+def test_histogram_time_observes_with_the_labels_set_in_the_block():
+    registry = metrics.Registry()
+    histogram = registry.histogram("step_seconds", "Step time.", ["outcome"])
+    with histogram.time(outcome="ok") as labels:
+        labels["outcome"] = "failed"
+    rendered = registry.render()
+    assert 'step_seconds_count{outcome="failed"} 1' in rendered
+    assert 'outcome="ok"' not in rendered
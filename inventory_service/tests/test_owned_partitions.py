@@ -0,0 +1,37 @@
+import pytest
+
+from src import consumer
+
+
+@pytest.mark.parametrize(
+    "partitions, instances, workers",
+    [(16, 1, 1), (16, 1, 4), (16, 3, 2), (5, 2, 4), (64, 4, 3)],
+)
+def test_owned_partitions_cover_every_partition_once(
+    monkeypatch, partitions, instances, workers
+):
+    monkeypatch.setattr(consumer, "INVENTORY_PARTITIONS", partitions)
+    monkeypatch.setattr(consumer, "CONSUMER_INSTANCES", instances)
+    monkeypatch.setattr(consumer, "CONSUMER_WORKERS", workers)
+    owned = []
+    for instance in range(instances):
+        monkeypatch.setattr(consumer, "CONSUMER_INSTANCE", instance)
+        for worker_id in range(workers):
+            owned.extend(consumer.owned_partitions(worker_id))
+    assert sorted(owned) == list(range(partitions))
+
+
+def test_queue_bindings_follow_owned_partitions(monkeypatch):
+    monkeypatch.setattr(consumer, "INVENTORY_PARTITIONS", 4)
+    monkeypatch.setattr(consumer, "CONSUMER_INSTANCES", 1)
+    monkeypatch.setattr(consumer, "CONSUMER_INSTANCE", 0)
+    monkeypatch.setattr(consumer, "CONSUMER_WORKERS", 2)
+    assert consumer.queue_bindings(1) == [
+        ("inventory_tasks.1", "inventory.1"),
+        ("inventory_tasks.3", "inventory.3"),
+    ]
+
+
+def test_unpartitioned_workers_share_the_queue(monkeypatch):
+    monkeypatch.setattr(consumer, "INVENTORY_PARTITIONS", 1)
+    assert consumer.queue_bindings(0) == [("inventory_tasks", "inventory")]
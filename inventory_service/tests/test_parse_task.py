@@ -0,0 +1,145 @@
+import json
+import time
+from types import SimpleNamespace
+
+import msgpack
+import pika
+import pytest
+from jose import jwt
+
+from src import consumer
+from src.config import JWT_ALGORITHM, JWT_SECRET_KEY
+from src.dedup import RecentMessages
+from src.envelope import CONTENT_TYPE_MSGPACK, TOKEN_HEADER, VERSION_HEADER
+from src.failures import DEAD_LETTER_EXCHANGE, FailureHandler
+
+TOKEN = jwt.encode(
+    {"sub": "tester", "exp": int(time.time()) + 3600},
+    JWT_SECRET_KEY,
+    algorithm=JWT_ALGORITHM,
+)
+QUEUE = "inventory_tasks.0"
+# A legacy body whose quantity is the non-standard JSON literal Infinity.
+INFINITE_QUANTITY = json.dumps(
+    {"task": {"product_id": 1, "quantity": float("inf")}, "token": TOKEN}
+).encode()
+
+
+class RecordingChannel:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((exchange, routing_key, body, properties))
+
+
+class TimerConnection:
+    def call_later(self, delay, callback):
+        return object()
+
+
+def versioned(token=TOKEN, **headers):
+    return pika.BasicProperties(
+        headers={VERSION_HEADER: 2, TOKEN_HEADER: token, **headers},
+        content_type=CONTENT_TYPE_MSGPACK,
+        type=consumer.TASK_TYPE,
+    )
+
+
+def legacy(document) -> bytes:
+    return json.dumps(document).encode()
+
+
+def make_batcher():
+    return consumer.InventoryBatcher(
+        manager=None,
+        connection=TimerConnection(),
+        channel=None,
+        executor=None,
+        session_factory=None,
+        recent=RecentMessages(10),
+        failures=FailureHandler(RecordingChannel()),
+        batch_size=100,
+        batch_timeout=1.0,
+    )
+
+
+@pytest.mark.parametrize(
+    "task, expected",
+    [
+        ({"product_id": 1, "quantity": -2}, (1, -2)),
+        ({"product_id": "7", "quantity": 3.0}, (7, 3)),
+    ],
+)
+def test_valid_messages_are_parsed(task, expected):
+    body = legacy({"task": task, "token": TOKEN})
+    assert consumer.parse_task(body, pika.BasicProperties()) == expected
+    assert consumer.parse_task(msgpack.packb(task), versioned()) == expected
+
+
+@pytest.mark.parametrize(
+    "body, properties",
+    [
+        (b"[1, 2]", pika.BasicProperties()),
+        (b'"x"', pika.BasicProperties()),
+        (legacy({"task": {}, "token": 5}), pika.BasicProperties()),
+        (msgpack.packb({"product_id": 1, "quantity": 1}), versioned(token=5)),
+        (INFINITE_QUANTITY, None),
+        (msgpack.packb({"product_id": 1, "quantity": float("inf")}), versioned()),
+        (msgpack.packb({"product_id": float("nan"), "quantity": 1}), versioned()),
+        (msgpack.packb({"product_id": 1, "quantity": 2.5}), versioned()),
+        (msgpack.packb({"product_id": True, "quantity": 1}), versioned()),
+        (msgpack.packb({"product_id": 1, "quantity": "lots"}), versioned()),
+        (msgpack.packb({"product_id": [1], "quantity": 1}), versioned()),
+    ],
+)
+def test_malformed_messages_raise_value_error(body, properties):
+    with pytest.raises(ValueError):
+        consumer.parse_task(body, properties)
+
+
+def test_batcher_dead_letters_malformed_messages_and_keeps_going():
+    batcher = make_batcher()
+    bodies = [
+        b"[1, 2]",
+        legacy({"task": {"product_id": 1, "quantity": 1}, "token": 5}),
+        msgpack.packb({"product_id": 1, "quantity": float("inf")}),
+    ]
+    for tag, body in enumerate(bodies):
+        properties = versioned() if tag == 2 else pika.BasicProperties()
+        batcher.callback(QUEUE, SimpleNamespace(delivery_tag=tag), properties, body)
+
+    published = batcher.failures.channel.published
+    assert [exchange for exchange, *_ in published] == [DEAD_LETTER_EXCHANGE] * 3
+    assert batcher.pending == 3
+    assert batcher.updates == []
+
+
+def test_batcher_dead_letters_unexpected_errors(monkeypatch):
+    def fail(body, properties):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(consumer, "parse_task", fail)
+    batcher = make_batcher()
+    batcher.callback(
+        QUEUE, SimpleNamespace(delivery_tag=1), pika.BasicProperties(), b"{}"
+    )
+
+    [(exchange, routing_key, body, _)] = batcher.failures.channel.published
+    assert (exchange, routing_key, body) == (DEAD_LETTER_EXCHANGE, QUEUE, b"{}")
+    assert batcher.failures.stats()["dead_lettered"] == 1
+    assert batcher.pending == 1
+
+
+def test_unexpected_write_errors_fail_the_messages_instead_of_raising():
+    batcher = make_batcher()
+    error = RuntimeError("bug")
+
+    def fail(updates, message_ids):
+        raise error
+
+    batcher._apply = fail
+    delivery = consumer.Delivery(QUEUE, pika.BasicProperties(), b"{}")
+    result = batcher._write([(delivery, None, 1, 1)], [])
+    assert result.failed == [(delivery, error)]
+    assert result.written == 0
@@ -0,0 +1,64 @@
+import pytest
+
+from src.partitioning import (
+    jump_consistent_hash,
+    partition_of,
+    partition_queue,
+    partition_routes,
+    partition_routing_key,
+)
+
+
+@pytest.mark.parametrize(
+    "key, buckets, expected",
+    [
+        # Reference vectors of the Lamping and Veach algorithm.
+        (1, 1, 0),
+        (42, 57, 43),
+        (0xDEAD10CC, 1, 0),
+        (0xDEAD10CC, 666, 361),
+        (256, 1024, 520),
+    ],
+)
+def test_jump_consistent_hash_reference_vectors(key, buckets, expected):
+    assert jump_consistent_hash(key, buckets) == expected
+
+
+def test_jump_consistent_hash_only_moves_keys_to_new_bucket():
+    for key in range(2000):
+        for buckets in range(1, 20):
+            before = jump_consistent_hash(key, buckets)
+            after = jump_consistent_hash(key, buckets + 1)
+            assert after in (before, buckets)
+
+
+# The coordinator and the inventory consumers each have a copy of this
+# module; both test suites pin the same values so the copies agree.
+@pytest.mark.parametrize(
+    "value, expected",
+    [(1, 3), (2, 9), (3, 10), (42, 7), (1000, 0), (123456, 11), ("7", 14)],
+)
+def test_partition_of_pinned_values(value, expected):
+    assert partition_of(value, 16) == expected
+
+
+def test_partition_of_accepts_numeric_strings():
+    assert partition_of("123456", 16) == partition_of(123456, 16)
+
+
+@pytest.mark.parametrize("value", [None, "abc", float("inf"), float("nan"), [1]])
+def test_partition_of_rejects_invalid_keys(value):
+    with pytest.raises(ValueError):
+        partition_of(value, 16)
+
+
+def test_partition_routes_replaces_partitioned_route():
+    routes = {"product": "product_tasks", "inventory": "inventory_tasks"}
+    assert partition_routes(routes, "inventory", 2) == {
+        "product": "product_tasks",
+        "inventory.0": "inventory_tasks.0",
+        "inventory.1": "inventory_tasks.1",
+    }
+    assert partition_routes(routes, "inventory", 1) == routes
+    assert partition_routing_key("inventory", 3) == "inventory.3"
+    assert partition_queue("inventory_tasks", 3) == "inventory_tasks.3"
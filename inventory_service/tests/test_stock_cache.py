@@ -0,0 +1,137 @@
+import asyncio
+
+import asyncpg
+import pytest
+
+from src import api, stock_cache
+from src.stock_cache import StockCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(stock_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_complete_cache_answers_unknown_products_until_the_ttl(clock):
+    cache = StockCache(max_size=10, ttl=60)
+    cache.warm({1: 5, 2: 0}, complete=True)
+    assert cache.lookup([1, 2, 3]) == ({1: 5, 2: 0, 3: None}, [])
+
+    clock.now += 61
+    assert not cache.complete
+    assert cache.lookup([1, 2, 3]) == ({}, [1, 2, 3])
+    assert cache.stats()["expirations"] == 2
+
+
+def test_announced_quantities_stay_fresh_for_a_ttl(clock):
+    cache = StockCache(max_size=10, ttl=60)
+    cache.warm({1: 5}, complete=False)
+    clock.now += 50
+    cache.update({1: 4})
+    clock.now += 50
+    assert cache.lookup([1]) == ({1: 4}, [])
+    clock.now += 11
+    assert cache.lookup([1]) == ({}, [1])
+
+
+def test_fill_replaces_expired_entries_but_not_fresh_ones(clock):
+    cache = StockCache(max_size=10, ttl=60)
+    cache.update({1: 5, 2: 7})
+    clock.now += 61
+    cache.update({2: 8})
+    cache.fill({1: 6, 2: 1})
+    assert cache.lookup([1, 2]) == ({1: 6, 2: 8}, [])
+
+
+def test_rewarming_renews_completeness(clock):
+    cache = StockCache(max_size=10, ttl=60)
+    cache.warm({1: 5}, complete=True)
+    clock.now += 59
+    cache.warm({1: 5}, complete=True)
+    clock.now += 59
+    assert cache.complete
+    # The entry itself expired: it is read again, not reported missing.
+    assert cache.lookup([1, 2]) == ({2: None}, [1])
+
+
+def test_eviction_ends_completeness(clock):
+    cache = StockCache(max_size=2, ttl=60)
+    cache.warm({1: 1, 2: 2}, complete=True)
+    cache.update({3: 3})
+    assert not cache.complete
+    assert cache.lookup([1]) == ({}, [1])
+
+
+class FakeConnection:
+    def __init__(self):
+        self.on_close = None
+        self.closed = False
+
+    def add_termination_listener(self, callback):
+        self.on_close = callback
+
+    async def add_listener(self, channel, callback):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+
+def test_listen_rewarms_every_ttl_and_clears_the_cache_when_lost(monkeypatch):
+    connection = FakeConnection()
+    warms = 0
+
+    async def connect(dsn):
+        return connection
+
+    async def warm_cache():
+        nonlocal warms
+        warms += 1
+        api.cache.update({1: 1})
+        if warms == 3:
+            connection.on_close(connection)
+
+    monkeypatch.setattr(api.asyncpg, "connect", connect)
+    monkeypatch.setattr(api, "warm_cache", warm_cache)
+    monkeypatch.setattr(api, "STOCK_CACHE_TTL", 0.01)
+    asyncio.run(api.listen("postgresql://test"))
+
+    assert warms == 3
+    assert connection.closed
+    assert api.cache.stats()["size"] == 0
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        asyncpg.InterfaceError("connection is closed"),
+        asyncio.TimeoutError(),
+        ConnectionRefusedError(),
+        RuntimeError("unexpected"),
+    ],
+)
+def test_listener_keeps_reconnecting_after_errors(monkeypatch, error):
+    attempts = 0
+
+    async def listen(dsn):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise error
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(api, "listen", listen)
+    monkeypatch.setattr(api, "API_LISTEN_RETRY_DELAY", 0)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(api.listen_for_changes())
+    assert attempts == 2
@@ -0,0 +1,254 @@
+"""
+Benchmark product consumer throughput across the consumer engines.
+
+- ``single``: the blocking engine, one commit per message.
+- ``batch``: the blocking engine, one commit per batch.
+- ``async``: the asyncio engine (``CONSUMER_ENGINE=async``), one commit per
+  message with up to ``ASYNC_CONCURRENCY`` transactions in flight.
+
+For each mode the script publishes ``--messages`` product tasks to
+``product_tasks``, starts one consumer worker and reports how many messages
+per second it commits until the products table holds all of them. With
+``--no-broker`` only the write path is timed: the same claims and inserts
+the worker runs, committed as that mode commits them.
+
+The products and processed-message tables of ``DATABASE_URL`` are emptied,
+and the queue should have no other consumers, so use a scratch deployment:
+
+    python -m benchmarks.consume --reset --messages 20000 --modes single batch async
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pika
+import sqlalchemy
+from jose import jwt
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src import async_consumer as async_consumer_module
+from src import consumer as consumer_module
+from src.config import (
+    ASYNC_CONCURRENCY,
+    ASYNC_DATABASE_URL,
+    BATCH_SIZE,
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    JWT_ALGORITHM,
+    JWT_SECRET_KEY,
+    RABBITMQ_HOST,
+    RABBITMQ_PORT,
+    TASK_EXCHANGE,
+)
+from src.crud import (
+    claim_messages,
+    claim_messages_async,
+    insert_products,
+    insert_products_async,
+)
+
+POLL_INTERVAL = 0.05
+
+
+def make_token() -> str:
+    expires = datetime.now(timezone.utc) + timedelta(hours=1)
+    return jwt.encode(
+        {"sub": "benchmark", "exp": expires}, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM
+    )
+
+
+def product(index: int) -> dict:
+    return {
+        "name": f"Benchmark product {index}",
+        "description": "consumer benchmark",
+        "price": 9.99,
+    }
+
+
+def reset_tables(engine):
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE products, processed_messages"))
+
+
+def count_products(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM products")).scalar_one()
+
+
+def publish(messages: int):
+    """
+    Publish product tasks in the legacy JSON envelope, each with a message ID.
+    """
+    token = make_token()
+    connection = pika.BlockingConnection(
+        pika.ConnectionParameters(host=RABBITMQ_HOST, port=RABBITMQ_PORT)
+    )
+    channel = connection.channel()
+    channel.exchange_declare(
+        exchange=TASK_EXCHANGE, exchange_type="direct", durable=True
+    )
+    channel.queue_declare(queue=consumer_module.QUEUE_NAME)
+    channel.queue_bind(
+        queue=consumer_module.QUEUE_NAME,
+        exchange=TASK_EXCHANGE,
+        routing_key=consumer_module.TASK_TYPE,
+    )
+    for index in range(messages):
+        channel.basic_publish(
+            exchange=TASK_EXCHANGE,
+            routing_key=consumer_module.TASK_TYPE,
+            body=json.dumps({"task": product(index), "token": token}),
+            properties=pika.BasicProperties(message_id=uuid.uuid4().hex),
+        )
+    connection.close()
+
+
+def consume(engine, mode: str, messages: int) -> float:
+    """
+    Drain the queue with one worker in ``mode``.
+
+    Returns:
+        float: The seconds until every message was committed.
+    """
+    consumer_module.CONSUMER_MODE = mode
+    consumer_module.METRICS_PORT = 0
+    worker = consumer_module.ProductConsumer()
+    thread = threading.Thread(target=worker.run, daemon=True)
+    start = time.perf_counter()
+    thread.start()
+    while count_products(engine) < messages:
+        time.sleep(POLL_INTERVAL)
+    elapsed = time.perf_counter() - start
+    worker.stop()
+    thread.join()
+    return elapsed
+
+
+async def consume_async(engine, messages: int) -> float:
+    """
+    Drain the queue with one asyncio worker.
+
+    The worker runs on this thread's event loop, where it can install its
+    signal handlers, and is stopped once every message was committed.
+
+    Returns:
+        float: The seconds until every message was committed.
+    """
+    async_consumer_module.METRICS_PORT = 0
+    worker = async_consumer_module.AsyncProductConsumer()
+    start = time.perf_counter()
+    running = asyncio.create_task(worker.run())
+    while await asyncio.to_thread(count_products, engine) < messages:
+        await asyncio.sleep(POLL_INTERVAL)
+    elapsed = time.perf_counter() - start
+    worker.stop()
+    await running
+    return elapsed
+
+
+async def write_async(messages: int) -> float:
+    """
+    Claim and insert ``messages`` products one transaction each, with up to
+    ``ASYNC_CONCURRENCY`` transactions in flight.
+
+    Returns:
+        float: The elapsed seconds.
+    """
+    engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=DB_POOL_SIZE)
+    SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    semaphore = asyncio.Semaphore(ASYNC_CONCURRENCY)
+
+    async def write_one(index: int):
+        async with semaphore, SessionLocal() as db:
+            await claim_messages_async(db, [uuid.uuid4().hex])
+            await insert_products_async(db, [product(index)])
+            await db.commit()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(write_one(index) for index in range(messages)))
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return elapsed
+
+
+def write(engine, batch_size: int, messages: int) -> float:
+    """
+    Claim and insert ``messages`` products, committing every ``batch_size``.
+
+    Returns:
+        float: The elapsed seconds.
+    """
+    SessionLocal = sessionmaker(bind=engine)
+    start = time.perf_counter()
+    for batch_start in range(0, messages, batch_size):
+        indexes = range(batch_start, min(messages, batch_start + batch_size))
+        with SessionLocal() as db:
+            claim_messages(db, [uuid.uuid4().hex for _ in indexes])
+            insert_products(db, [product(index) for index in indexes])
+            db.commit()
+    return time.perf_counter() - start
+
+
+def run(modes: List[str], messages: int, broker: bool):
+    consumer_module.setup_database()
+    engine = sqlalchemy.create_engine(DATABASE_URL)
+    print(
+        f"{'mode':<8} {'engine':<9} {'batch':>6} {'messages':>9} "
+        f"{'seconds':>9} {'msg/s':>9}"
+    )
+    for mode in modes:
+        engine_name = "async" if mode == "async" else "blocking"
+        batch_size = BATCH_SIZE if mode == "batch" else 1
+        reset_tables(engine)
+        if broker:
+            publish(messages)
+            if mode == "async":
+                elapsed = asyncio.run(consume_async(engine, messages))
+            else:
+                elapsed = consume(engine, mode, messages)
+        elif mode == "async":
+            elapsed = asyncio.run(write_async(messages))
+        else:
+            elapsed = write(engine, batch_size, messages)
+        print(
+            f"{mode:<8} {engine_name:<9} {batch_size:>6} {messages:>9} "
+            f"{elapsed:>9.2f} {messages / elapsed:>9.0f}"
+        )
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark consumer throughput.")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["single", "batch", "async"],
+        default=["single", "batch", "async"],
+    )
+    parser.add_argument(
+        "--no-broker",
+        action="store_true",
+        help="time the database writes alone, without RabbitMQ",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="required: empty the products and processed_messages tables",
+    )
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("this empties the products table of DATABASE_URL; pass --reset")
+    run(args.modes, args.messages, not args.no_broker)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark the latency logging adds to each message, before and after New
+Relic log events were shipped from a background thread.
+
+Every simulated message logs ``--records`` INFO records, as the consumer
+does per message, with one of these New Relic handlers installed next to a
+console handler writing to ``os.devnull``:
+
+- ``off``: no New Relic handler.
+- ``inline``: the previous handler, which sent each record as a custom event
+  on the logging thread.
+- ``buffered``: ``NewRelicHandler``, which buffers the record for its
+  listener thread.
+
+The New Relic agent runs in developer mode, so events take the agent's real
+code path but nothing is sent:
+
+    python -m benchmarks.logging_latency --messages 20000 --records 2
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import time
+from typing import List
+
+from src.logger import NewRelicHandler, telemetry
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class InlineNewRelicHandler(logging.Handler):
+    """
+    The handler before the background listener: ships every record on the
+    thread that logged it.
+    """
+
+    def emit(self, record):
+        log_entry = self.format(record)
+        telemetry.agent.record_custom_event(
+            "LogEvent",
+            {"level": record.levelname, "message": log_entry},
+            application=telemetry.application,
+        )
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def register_developer_mode():
+    os.environ["NEW_RELIC_ENABLED"] = "true"
+    os.environ["NEW_RELIC_DEVELOPER_MODE"] = "true"
+    os.environ.setdefault("NEW_RELIC_LICENSE_KEY", "developer-mode")
+    telemetry.start()
+    if not telemetry.wait(30) or telemetry.application is None:
+        raise SystemExit("New Relic registration failed")
+
+
+def measure(mode: str, messages: int, records: int, stream) -> List[float]:
+    """
+    Log ``records`` records per message with the handlers of ``mode``.
+
+    Returns:
+        List[float]: The logging time of each message, in seconds.
+    """
+    formatter = logging.Formatter(FORMAT)
+    console_handler = logging.StreamHandler(stream)
+    handlers: List[logging.Handler] = [console_handler]
+    if mode == "inline":
+        handlers.append(InlineNewRelicHandler())
+    elif mode == "buffered":
+        handlers.append(NewRelicHandler(capacity=max(10000, messages * records)))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.handlers = handlers
+    root.setLevel(logging.INFO)
+    logger = logging.getLogger("src.consumer")
+    samples = []
+    for index in range(messages):
+        start = time.perf_counter()
+        for record in range(records):
+            logger.info("Worker %d processed message %d (%d).", 0, index, record)
+        samples.append(time.perf_counter() - start)
+
+    for handler in handlers:
+        handler.close()
+    root.handlers = []
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark logging latency.")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--records", type=int, default=2, help="records per message")
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["off", "inline", "buffered"],
+        default=["off", "inline", "buffered"],
+    )
+    args = parser.parse_args()
+
+    register_developer_mode()
+    print(f"{'mode':<9} {'messages':>9} {'mean us':>9} {'p50 us':>9} {'p99 us':>9}")
+    with open(os.devnull, "w") as stream:
+        for mode in args.modes:
+            samples = measure(mode, args.messages, args.records, stream)
+            print(
+                f"{mode:<9} {args.messages:>9} "
+                f"{statistics.mean(samples) * 1e6:>9.1f} "
+                f"{percentile(samples, 0.5) * 1e6:>9.1f} "
+                f"{percentile(samples, 0.99) * 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Benchmark the read API under read load, optionally with concurrent inserts.
+
+The products table is filled with ``--products`` products, then
+``--concurrency`` clients send a mix of product, page and search requests to
+the read API in-process for ``--duration`` seconds. Most product reads go to
+the ``--hot-products`` lowest IDs, as popular products would. With
+``--write-rate`` a writer inserts batches of products meanwhile, as the
+consumer does, and their change notifications invalidate the cache.
+
+The products table of ``DATABASE_URL`` is emptied and refilled, so point it
+at a scratch database:
+
+    python -m benchmarks.read_load --reset --products 100000 --write-rate 20
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import sqlalchemy
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from src import api
+from src.config import API_PAGE_SIZE, DATABASE_URL
+from src.consumer import setup_database
+from src.crud import insert_products
+
+INSERT_BATCH_SIZE = 10000
+ADJECTIVES = ["red", "blue", "green", "steel", "wooden", "compact", "deluxe", "eco"]
+NOUNS = ["widget", "gadget", "lamp", "chair", "kettle", "drill", "backpack", "mug"]
+SEARCHES = [
+    "blue widget",
+    "steel kettle",
+    "wooden chair",
+    "compact drill",
+    "eco mug",
+    "lamp",
+    "deluxe backpack",
+    "green gadget",
+]
+
+
+def product(index: int) -> dict:
+    adjective = ADJECTIVES[index % len(ADJECTIVES)]
+    noun = NOUNS[index // len(ADJECTIVES) % len(NOUNS)]
+    return {
+        "name": f"{adjective.title()} {noun} {index}",
+        "description": f"A {adjective} {noun} for everyday use.",
+        "price": round(1 + index % 500 * 0.37, 2),
+    }
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def fill_products(engine, products: int):
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE products RESTART IDENTITY"))
+    SessionLocal = sessionmaker(bind=engine)
+    for start in range(0, products, INSERT_BATCH_SIZE):
+        with SessionLocal() as db:
+            insert_products(
+                db,
+                [
+                    product(index)
+                    for index in range(start, min(products, start + INSERT_BATCH_SIZE))
+                ],
+            )
+            db.commit()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE products"))
+
+
+async def write(engine, rate: float, batch: int, stop: asyncio.Event) -> int:
+    """
+    Insert ``batch`` products ``rate`` times per second until stopped.
+
+    Returns:
+        int: The number of inserted products.
+    """
+    SessionLocal = sessionmaker(bind=engine)
+    inserted = 0
+
+    def insert_batch():
+        with SessionLocal() as db:
+            insert_products(db, [product(inserted + index) for index in range(batch)])
+            db.commit()
+
+    while not stop.is_set():
+        await asyncio.to_thread(insert_batch)
+        inserted += batch
+        try:
+            await asyncio.wait_for(stop.wait(), 1 / rate)
+        except asyncio.TimeoutError:
+            pass
+    return inserted
+
+
+async def read(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    deadline: float,
+    latencies: Dict[str, List[float]],
+):
+    kinds = ["product", "page", "search"]
+    weights = [args.product_weight, args.page_weight, args.search_weight]
+    pages = max(1, args.products // API_PAGE_SIZE)
+    while time.perf_counter() < deadline:
+        kind = random.choices(kinds, weights)[0]
+        if kind == "product":
+            url = f"/products/{random.randint(1, args.hot_products)}"
+        elif kind == "page":
+            url = f"/products?after={random.randrange(pages) * API_PAGE_SIZE}"
+        else:
+            url = f"/products/search?q={random.choice(SEARCHES)}"
+        start = time.perf_counter()
+        response = await client.get(url)
+        latencies[kind].append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def run(args: argparse.Namespace):
+    # The client would otherwise log every request it sends.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    engine = sqlalchemy.create_engine(DATABASE_URL)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.app.router.lifespan_context(api.app), httpx.AsyncClient(
+        transport=transport, base_url="http://product"
+    ) as client:
+        # Let the listener connect before measuring.
+        await asyncio.sleep(1)
+        writer = None
+        if args.write_rate > 0:
+            writer = asyncio.create_task(
+                write(engine, args.write_rate, args.write_batch, stop)
+            )
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            *(read(client, args, deadline, latencies) for _ in range(args.concurrency))
+        )
+        stop.set()
+        inserted = await writer if writer else 0
+        stats = api.cache.stats()
+    engine.dispose()
+
+    print(f"{'request':<8} {'count':>8} {'req/s':>8} {'mean ms':>9}", end=" ")
+    print(f"{'p50 ms':>9} {'p99 ms':>9}")
+    for kind, samples in sorted(latencies.items()):
+        print(
+            f"{kind:<8} {len(samples):>8} {len(samples) / args.duration:>8.0f} "
+            f"{statistics.mean(samples) * 1000:>9.2f} "
+            f"{percentile(samples, 0.5) * 1000:>9.2f} "
+            f"{percentile(samples, 0.99) * 1000:>9.2f}"
+        )
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"total {total / args.duration:.0f} req/s, {inserted} products inserted")
+    lookups = stats["hits"] + stats["misses"]
+    print(f"cache hit ratio {stats['hits'] / max(1, lookups):.1%}: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the read API.")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--hot-products", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--product-weight", type=float, default=70)
+    parser.add_argument("--page-weight", type=float, default=20)
+    parser.add_argument("--search-weight", type=float, default=10)
+    parser.add_argument(
+        "--write-rate",
+        type=float,
+        default=0,
+        help="inserted batches per second during the run; 0 disables writes",
+    )
+    parser.add_argument("--write-batch", type=int, default=100)
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="required: empty and refill the products table",
+    )
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("this empties the products table of DATABASE_URL; pass --reset")
+
+    setup_database()
+    engine = sqlalchemy.create_engine(DATABASE_URL)
+    fill_products(engine, args.products)
+    engine.dispose()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark product search on a generated catalog.
+
+The products table is dropped and refilled with ``--products`` generated
+products (one million by default), the search indexes are rebuilt, and each
+sample query is run through ``search_products`` for the first page and for
+a deep page. Works on Postgres and on the SQLite fallback.
+
+The products table of ``DATABASE_URL`` and ``ASYNC_DATABASE_URL`` is
+dropped, so point them at a scratch database:
+
+    python -m benchmarks.search --reset --products 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+import sqlalchemy
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.config import (
+    API_PAGE_SIZE,
+    API_SEARCH_MAX_OFFSET,
+    ASYNC_DATABASE_URL,
+    DATABASE_URL,
+)
+from src.crud import search_products
+from src.migrations import upgrade_schema
+from src.models import Base, Product
+
+INSERT_BATCH_SIZE = 10000
+BRANDS = [f"brand{index}" for index in range(200)]
+ADJECTIVES = [
+    "red",
+    "blue",
+    "green",
+    "steel",
+    "wooden",
+    "compact",
+    "deluxe",
+    "eco",
+    "portable",
+    "wireless",
+    "vintage",
+    "heavy",
+]
+NOUNS = [
+    "widget",
+    "gadget",
+    "lamp",
+    "chair",
+    "kettle",
+    "drill",
+    "backpack",
+    "mug",
+    "speaker",
+    "blender",
+    "tent",
+    "charger",
+]
+WORDS = ADJECTIVES + NOUNS + [f"word{index}" for index in range(5000)]
+
+# A few query shapes: frequent and rare terms, several terms, and a
+# misspelled name, which only the trigram match finds.
+QUERIES = {
+    "common word": "widget",
+    "two words": "wireless speaker",
+    "three words": "vintage wooden chair",
+    "rare word": "word4321",
+    "brand": "brand42",
+    "misspelled": "blendr",
+}
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def generate(count: int, rng: random.Random) -> List[dict]:
+    return [
+        {
+            "name": f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} "
+            f"{rng.choice(NOUNS)}",
+            "description": " ".join(rng.choices(WORDS, k=12)),
+            "price": round(rng.uniform(1, 500), 2),
+        }
+        for _ in range(count)
+    ]
+
+
+def build_catalog(products: int, seed: int) -> float:
+    """
+    Drop and refill the products table, then build the search indexes.
+
+    Returns:
+        float: The elapsed seconds.
+    """
+    engine = sqlalchemy.create_engine(DATABASE_URL)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("DROP TABLE IF EXISTS products_fts"))
+        conn.execute(text("DROP TABLE IF EXISTS products"))
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        for batch_start in range(0, products, INSERT_BATCH_SIZE):
+            count = min(INSERT_BATCH_SIZE, products - batch_start)
+            conn.execute(insert(Product), generate(count, rng))
+    # The indexes are built once over the full table rather than row by row.
+    upgrade_schema(engine)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE products"))
+    engine.dispose()
+    return time.perf_counter() - start
+
+
+async def time_queries(repeat: int):
+    engine = create_async_engine(ASYNC_DATABASE_URL)
+    SessionLocal = async_sessionmaker(engine)
+    print(f"{'query':<14} {'offset':>6} {'hits':>5} {'mean ms':>9}", end=" ")
+    print(f"{'p50 ms':>9} {'p99 ms':>9}")
+    for label, query in QUERIES.items():
+        for offset in (0, API_SEARCH_MAX_OFFSET):
+            samples = []
+            async with SessionLocal() as db:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    hits = await search_products(db, query, API_PAGE_SIZE, offset)
+                    samples.append(time.perf_counter() - start)
+            print(
+                f"{label:<14} {offset:>6} {len(hits):>5} "
+                f"{statistics.mean(samples) * 1000:>9.2f} "
+                f"{percentile(samples, 0.5) * 1000:>9.2f} "
+                f"{percentile(samples, 0.99) * 1000:>9.2f}"
+            )
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark product search.")
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20, help="runs per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--skip-build",
+        action="store_true",
+        help="query the catalog built by a previous run",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="required unless --skip-build: drop and refill the products table",
+    )
+    args = parser.parse_args()
+    if not args.skip_build:
+        if not args.reset:
+            parser.error("this drops the products table of DATABASE_URL; pass --reset")
+        elapsed = build_catalog(args.products, args.seed)
+        print(f"Built a catalog of {args.products} products in {elapsed:.1f}s")
+    asyncio.run(time_queries(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
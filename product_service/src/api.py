@@ -0,0 +1,400 @@
+"""
+This module contains the read API for the Product Service.
+
+Products are written by the consumer workers; this FastAPI application serves
+them back by ID, as keyset-paginated lists optionally filtered by a name
+prefix, and as ranked keyword search results. Reads go through an in-process
+``ReadThroughCache``. The consumer announces the ID range of every committed
+insert with ``pg_notify``, and a background listener invalidates the cached
+entries that range could change. Notifications are merged over
+``API_INVALIDATION_INTERVAL``, so under a steady write load the cache is
+invalidated a few times per second rather than once per insert.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import asyncpg
+from fastapi import Depends, FastAPI, HTTPException, Query, Response
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from .cache import ReadThroughCache
+from .config import (
+    API_CACHE_MAX_SIZE,
+    API_CACHE_TTL,
+    API_INVALIDATION_INTERVAL,
+    API_LISTEN_RETRY_DELAY,
+    API_MAX_PAGE_SIZE,
+    API_PAGE_SIZE,
+    API_SEARCH_MAX_OFFSET,
+    ASYNC_DATABASE_URL,
+    DATABASE_URL,
+    DB_POOL_SIZE,
+)
+from .crud import (
+    PRODUCT_CHANGES_CHANNEL,
+    get_product,
+    list_products,
+    search_products,
+)
+from .logger import setup_logger
+from .metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from .schemas import ProductOut, ProductPage, SearchHit, SearchPage
+
+logger = setup_logger(__name__)
+
+engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=DB_POOL_SIZE)
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+cache = ReadThroughCache(max_size=API_CACHE_MAX_SIZE, ttl=API_CACHE_TTL)
+
+
+def invalidate_range(first_id: int, last_id: int):
+    """
+    Drop the cached entries that products with IDs in a range could change.
+
+    Products are never updated, so a cached product stays valid; only a
+    cached miss for an ID in the range is dropped. A page covers the IDs
+    after its cursor up to its last item, or without bound if it is the last
+    page, and is dropped if that span overlaps the range. Any insert can
+    change search results, so cached searches are always dropped.
+
+    Args:
+        first_id (int): The smallest inserted ID.
+        last_id (int): The largest inserted ID.
+
+    Returns:
+        None
+    """
+
+    def is_missing(key, value) -> bool:
+        return value is None and first_id <= key[1] <= last_id
+
+    def is_stale_page(key, value) -> bool:
+        _, after, _, _ = key
+        return last_id > after and (
+            value.next_cursor is None or first_id <= value.next_cursor
+        )
+
+    # Look up the product IDs of the range rather than visiting every cached
+    # product, unless the range is larger than the cache.
+    product_keys = None
+    if last_id - first_id < API_CACHE_MAX_SIZE:
+        product_keys = [
+            ("product", product_id) for product_id in range(first_id, last_id + 1)
+        ]
+    cache.invalidate("product", is_missing, keys=product_keys)
+    cache.invalidate("page", is_stale_page)
+    cache.invalidate("search")
+
+
+class PendingChanges:
+    """
+    Merge the ID ranges of product change notifications and invalidate the
+    cache for them at most once per interval.
+
+    The merged range spans every announced range, so entries for IDs in a
+    gap between two ranges may be dropped too.
+
+    Args:
+        interval (float): Seconds to collect notifications before
+            invalidating. Zero invalidates on every notification.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.first_id: Optional[int] = None
+        self.last_id: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+
+    def add(self, first_id: int, last_id: int):
+        """
+        Record an inserted ID range, scheduling an invalidation if none is.
+
+        Args:
+            first_id (int): The smallest inserted ID.
+            last_id (int): The largest inserted ID.
+
+        Returns:
+            None
+        """
+        if self.first_id is None:
+            self.first_id, self.last_id = first_id, last_id
+        else:
+            self.first_id = min(self.first_id, first_id)
+            self.last_id = max(self.last_id, last_id)
+        if self.interval <= 0:
+            self.flush()
+        elif self._handle is None:
+            self._handle = asyncio.get_running_loop().call_later(
+                self.interval, self.flush
+            )
+
+    def flush(self):
+        """
+        Invalidate the cache for the recorded range.
+
+        Returns:
+            None
+        """
+        first_id, last_id = self.first_id, self.last_id
+        self.discard()
+        if first_id is not None:
+            invalidate_range(first_id, last_id)
+
+    def discard(self):
+        """
+        Forget the recorded range, when the whole cache is cleared instead.
+
+        Returns:
+            None
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self.first_id = self.last_id = None
+
+
+pending_changes = PendingChanges(API_INVALIDATION_INTERVAL)
+
+
+def clear_cache():
+    """
+    Drop every cached entry and any pending invalidation.
+
+    Returns:
+        None
+    """
+    pending_changes.discard()
+    cache.clear()
+
+
+def on_products_changed(connection, pid, channel, payload: str):
+    """
+    Handle a product change notification from the consumer.
+
+    Args:
+        connection: The listening connection.
+        pid (int): The PID of the notifying backend.
+        channel (str): The notification channel.
+        payload (str): The inserted ID range, as ``"first,last"``.
+
+    Returns:
+        None
+    """
+    try:
+        first_id, last_id = (int(part) for part in payload.split(","))
+    except ValueError:
+        logger.warning("Unexpected product change payload: %r", payload)
+        clear_cache()
+        return
+    pending_changes.add(first_id, last_id)
+
+
+async def listen(dsn: str):
+    """
+    Listen for product change notifications on one connection until it is
+    lost.
+
+    The cache is cleared once the listener is registered, because changes
+    made while it was not listening were missed.
+
+    Args:
+        dsn (str): The database to connect to.
+
+    Returns:
+        None
+    """
+    connection = await asyncpg.connect(dsn)
+    try:
+        closed = asyncio.Event()
+        connection.add_termination_listener(lambda _connection: closed.set())
+        await connection.add_listener(PRODUCT_CHANGES_CHANNEL, on_products_changed)
+        clear_cache()
+        logger.info("Listening for product changes.")
+        await closed.wait()
+    finally:
+        await connection.close()
+
+
+async def listen_for_changes():
+    """
+    Listen for product change notifications until cancelled, reconnecting
+    whenever the connection is lost or cannot be set up.
+
+    Returns:
+        None
+    """
+    dsn = make_url(DATABASE_URL).set(drivername="postgresql")
+    while True:
+        try:
+            await listen(dsn.render_as_string(hide_password=False))
+            logger.warning("Change listener connection lost, reconnecting.")
+        except (
+            OSError,
+            asyncio.TimeoutError,
+            asyncpg.PostgresError,
+            asyncpg.InterfaceError,
+        ) as e:
+            logger.warning(
+                "Change listener failed, retrying in %.1fs: %s",
+                API_LISTEN_RETRY_DELAY,
+                e,
+            )
+            await asyncio.sleep(API_LISTEN_RETRY_DELAY)
+        except Exception:
+            # The cache would otherwise go stale with nothing in the log.
+            logger.exception(
+                "Change listener failed unexpectedly, retrying in %.1fs.",
+                API_LISTEN_RETRY_DELAY,
+            )
+            await asyncio.sleep(API_LISTEN_RETRY_DELAY)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    Start the change listener on startup and stop it on shutdown.
+
+    Args:
+        _app (FastAPI): The application instance.
+
+    Yields:
+        None
+    """
+    listener = asyncio.create_task(listen_for_changes())
+    yield
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+    pending_changes.discard()
+    await engine.dispose()
+    logger.info("Read API stopped, cache: %s", cache.stats())
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+
+async def get_db():
+    """
+    Get an async database session.
+
+    Yields:
+        AsyncSession: A session object for interacting with the database.
+    """
+    async with SessionLocal() as db:
+        yield db
+
+
+@app.get("/products/search", response_model=SearchPage)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(API_PAGE_SIZE, ge=1, le=API_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=API_SEARCH_MAX_OFFSET),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Search products by keywords in their name and description, with fuzzy
+    matching on the name, best matches first.
+
+    Args:
+        q (str): The search text.
+        limit (int): The maximum number of results per page.
+        offset (int): The number of results to skip.
+        db (AsyncSession): The database session.
+
+    Returns:
+        SearchPage: The matches and the offset of the next page.
+    """
+
+    async def load() -> SearchPage:
+        hits = await search_products(db, q, limit, offset)
+        return SearchPage(
+            items=[SearchHit(**hit) for hit in hits],
+            next_offset=offset + limit if len(hits) == limit else None,
+        )
+
+    return await cache.get_or_load(("search", q, limit, offset), load)
+
+
+@app.get("/products/{product_id}", response_model=ProductOut)
+async def read_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Retrieve a product by its ID.
+
+    Args:
+        product_id (int): The product ID.
+        db (AsyncSession): The database session.
+
+    Returns:
+        ProductOut: The product.
+
+    Raises:
+        HTTPException: If the product does not exist.
+    """
+
+    async def load() -> Optional[ProductOut]:
+        product = await get_product(db, product_id)
+        return ProductOut.model_validate(product) if product else None
+
+    product = await cache.get_or_load(("product", product_id), load)
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+
+@app.get("/products", response_model=ProductPage)
+async def read_products(
+    after: int = Query(0, ge=0),
+    limit: int = Query(API_PAGE_SIZE, ge=1, le=API_MAX_PAGE_SIZE),
+    name_prefix: Optional[str] = Query(None, min_length=1),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List products in ID order with keyset pagination.
+
+    Pass the ``next_cursor`` of a page as ``after`` to read the next one.
+
+    Args:
+        after (int): Only products with a greater ID are returned.
+        limit (int): The maximum number of products per page.
+        name_prefix (str, optional): Only products whose name starts with
+            this prefix are returned.
+        db (AsyncSession): The database session.
+
+    Returns:
+        ProductPage: The products and the cursor of the next page.
+    """
+
+    async def load() -> ProductPage:
+        products = await list_products(db, after, limit, name_prefix)
+        items = [ProductOut.model_validate(product) for product in products]
+        return ProductPage(
+            items=items, next_cursor=items[-1].id if len(items) == limit else None
+        )
+
+    return await cache.get_or_load(("page", after, limit, name_prefix), load)
+
+
+@app.get("/cache/stats")
+async def read_cache_stats():
+    """
+    Return the read cache counters.
+
+    Returns:
+        dict: The size, hits, misses, coalesced loads, evictions and
+        invalidations.
+    """
+    return cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """
+    Return the service metrics in the Prometheus text format.
+
+    Returns:
+        Response: The metrics.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,349 @@
+"""
+This module contains the asyncio consumer engine for the Product Service.
+
+Unlike ``ProductConsumer``, which blocks on each Postgres commit before the
+next message is delivered, ``AsyncProductConsumer`` processes many messages
+concurrently in one process. Concurrency is bounded by the channel prefetch
+and by ``ASYNC_CONCURRENCY`` simultaneous database transactions.
+
+The first connection is retried with the same jittered backoff as the
+blocking consumer; after that aio-pika's robust connection reconnects and
+restores the consumer by itself.
+
+Failed messages are retried or dead-lettered through the same queues as the
+blocking consumer; see ``failures``.
+"""
+
+import asyncio
+import signal
+import time
+from typing import Optional
+
+import aio_pika
+from aio_pika.abc import (
+    AbstractChannel,
+    AbstractExchange,
+    AbstractIncomingMessage,
+    AbstractRobustConnection,
+)
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from .config import (
+    ASYNC_CONCURRENCY,
+    ASYNC_DATABASE_URL,
+    CONSUMER_PREFETCH,
+    CONSUMER_REPORT_INTERVAL,
+    DB_POOL_SIZE,
+    DEAD_LETTER_EXCHANGE,
+    DEDUP_CACHE_SIZE,
+    METRICS_PORT,
+    RABBITMQ_HEARTBEAT,
+    RABBITMQ_HOST,
+    RABBITMQ_PORT,
+    RECONNECT_BASE_DELAY,
+    RETRY_MAX_ATTEMPTS,
+    TASK_EXCHANGE,
+)
+from .connection import backoff_delay
+from .consumer import (
+    QUEUE_NAME,
+    TASK_TYPE,
+    commit_seconds,
+    consumed_messages,
+    observe_queue_lag,
+    parse_task,
+)
+from .crud import claim_messages_async, insert_products_async
+from .dedup import RecentMessages, get_message_id
+from .failures import (
+    MALFORMED_ERRORS,
+    REASON_HEADER,
+    RETRY_HEADER,
+    FailureCounters,
+    dead_letter_queue,
+    describe,
+    next_retry,
+    retry_delay_ms,
+    retry_queue,
+    retry_queue_arguments,
+)
+from .logger import setup_logger
+from .metrics import serve_worker_metrics
+from .tokens import token_verifier
+
+logger = setup_logger(__name__)
+
+
+class AsyncProductConsumer:
+    """
+    A single asyncio consumer worker.
+
+    Args:
+        worker_id (int): The index of the worker, used in log messages.
+    """
+
+    def __init__(self, worker_id: int = 0):
+        self.worker_id = worker_id
+        self.engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=DB_POOL_SIZE)
+        self.SessionLocal = async_sessionmaker(
+            self.engine, autoflush=False, expire_on_commit=False
+        )
+        self.recent = RecentMessages(DEDUP_CACHE_SIZE)
+        self.failures = FailureCounters()
+        self.processed = 0
+        self._reported = 0
+        self._reported_at = time.monotonic()
+        self._in_flight = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._channel: Optional[AbstractChannel] = None
+        self._dead_letter_exchange: Optional[AbstractExchange] = None
+
+    async def callback(self, message: AbstractIncomingMessage):
+        """
+        Callback function for processing an incoming message.
+
+        Each delivery runs in its own task; the semaphore caps how many of
+        them hold a database connection at once.
+
+        Args:
+            message (AbstractIncomingMessage): The incoming message.
+
+        Returns:
+            None
+        """
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            async with self._semaphore:
+                await self._process(message)
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    async def _process(self, message: AbstractIncomingMessage):
+        self.processed += 1
+        observe_queue_lag(message)
+        message_id = get_message_id(message)
+        if message_id and self.recent.seen(message_id):
+            consumed_messages.inc(outcome="duplicate")
+            logger.info("Dropped duplicate message %s.", message_id)
+            await message.ack()
+            return
+
+        try:
+            product = parse_task(message.body, message)
+            if product is not None:
+                start = time.perf_counter()
+                async with self.SessionLocal() as db:
+                    if not message_id or await claim_messages_async(db, [message_id]):
+                        await insert_products_async(db, [product])
+                        outcome = "committed"
+                        logger.info(
+                            "Product '%s' added to the database.", product["name"]
+                        )
+                    else:
+                        self.recent.stored_duplicates += 1
+                        outcome = "duplicate"
+                    await db.commit()
+                commit_seconds.observe(time.perf_counter() - start)
+                consumed_messages.inc(outcome=outcome)
+                if message_id:
+                    self.recent.add([message_id])
+        except (*MALFORMED_ERRORS, SQLAlchemyError) as e:
+            await self._handle_failure(message, e)
+        except Exception as e:
+            # Left unacknowledged, the message would be redelivered forever.
+            logger.exception("Unexpected error processing a message.")
+            await self._handle_failure(message, e)
+
+        await message.ack()
+
+    async def _handle_failure(self, message: AbstractIncomingMessage, error: Exception):
+        """
+        Publish a failed message to its retry lane or dead-letter queue.
+
+        Args:
+            message (AbstractIncomingMessage): The failed message.
+            error (Exception): The error raised while processing it.
+
+        Returns:
+            None
+        """
+        attempt = next_retry(message, error)
+        self.failures.record(error, attempt)
+        headers = dict(message.headers or {})
+        delivery_mode = message.delivery_mode
+        if attempt is None:
+            headers[REASON_HEADER] = describe(error)
+            delivery_mode = aio_pika.DeliveryMode.PERSISTENT
+            exchange, routing_key = self._dead_letter_exchange, QUEUE_NAME
+            logger.error(
+                "Dead-lettered a message from %s: %s", QUEUE_NAME, describe(error)
+            )
+        else:
+            headers[RETRY_HEADER] = attempt + 1
+            exchange = self._channel.default_exchange
+            routing_key = retry_queue(QUEUE_NAME, attempt)
+            logger.warning(
+                "Retrying a message from %s in %d ms: %s",
+                QUEUE_NAME,
+                retry_delay_ms(attempt),
+                describe(error),
+            )
+        await exchange.publish(
+            aio_pika.Message(
+                body=message.body,
+                headers=headers,
+                content_type=message.content_type,
+                content_encoding=message.content_encoding,
+                delivery_mode=delivery_mode,
+                message_id=message.message_id,
+                type=message.type,
+            ),
+            routing_key=routing_key,
+        )
+
+    async def _declare_failure_queues(self):
+        """
+        Declare the dead-letter exchange and the queue's retry lanes and
+        dead-letter queue.
+
+        Returns:
+            None
+        """
+        self._dead_letter_exchange = await self._channel.declare_exchange(
+            DEAD_LETTER_EXCHANGE, aio_pika.ExchangeType.DIRECT, durable=True
+        )
+        dead = await self._channel.declare_queue(
+            dead_letter_queue(QUEUE_NAME), durable=True
+        )
+        await dead.bind(self._dead_letter_exchange, routing_key=QUEUE_NAME)
+        for attempt in range(RETRY_MAX_ATTEMPTS):
+            await self._channel.declare_queue(
+                retry_queue(QUEUE_NAME, attempt),
+                durable=True,
+                arguments=retry_queue_arguments(QUEUE_NAME, attempt),
+            )
+
+    async def report(self):
+        """
+        Log the worker's throughput every ``CONSUMER_REPORT_INTERVAL`` seconds.
+
+        Returns:
+            None
+        """
+        while True:
+            await asyncio.sleep(CONSUMER_REPORT_INTERVAL)
+            now = time.monotonic()
+            elapsed = now - self._reported_at
+            count = self.processed - self._reported
+            logger.info(
+                "Worker %d processed %d messages in %.1fs (%.1f msg/s, total %d), "
+                "in flight %d, token cache: %s, dedup: %s, failures: %s",
+                self.worker_id,
+                count,
+                elapsed,
+                count / elapsed if elapsed else 0.0,
+                self.processed,
+                self._in_flight,
+                token_verifier.stats(),
+                self.recent.stats(),
+                self.failures.stats(),
+            )
+            self._reported = self.processed
+            self._reported_at = now
+
+    async def _connect(self) -> Optional[AbstractRobustConnection]:
+        """
+        Connect to RabbitMQ, retrying with backoff until it succeeds.
+
+        Returns:
+            AbstractRobustConnection or None: The connection, or None if the
+            worker was stopped first.
+        """
+        attempt = 0
+        while not self._stop_event.is_set():
+            try:
+                return await aio_pika.connect_robust(
+                    host=RABBITMQ_HOST,
+                    port=RABBITMQ_PORT,
+                    heartbeat=RABBITMQ_HEARTBEAT,
+                    reconnect_interval=RECONNECT_BASE_DELAY,
+                )
+            except (OSError, aio_pika.exceptions.AMQPConnectionError) as e:
+                delay = backoff_delay(attempt)
+                logger.warning(
+                    "Worker %d: RabbitMQ connection failed, retrying in %.1fs: %r",
+                    self.worker_id,
+                    delay,
+                    e,
+                )
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                attempt += 1
+        return None
+
+    async def run(self):
+        """
+        Consume messages until SIGTERM or SIGINT, then drain in-flight work.
+
+        The worker's metrics are served on ``METRICS_PORT + worker_id``,
+        unless ``METRICS_PORT`` is zero or less.
+
+        Returns:
+            None
+        """
+        serve_worker_metrics(METRICS_PORT, self.worker_id)
+        self._semaphore = asyncio.Semaphore(ASYNC_CONCURRENCY)
+        self._stop_event = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, self.stop)
+        loop.add_signal_handler(signal.SIGINT, self.stop)
+
+        connection = await self._connect()
+        if connection is None:
+            await self.engine.dispose()
+            return
+        async with connection:
+            self._channel = await connection.channel()
+            await self._channel.set_qos(prefetch_count=CONSUMER_PREFETCH)
+            exchange = await self._channel.declare_exchange(
+                TASK_EXCHANGE, aio_pika.ExchangeType.DIRECT, durable=True
+            )
+            queue = await self._channel.declare_queue(QUEUE_NAME)
+            await queue.bind(exchange, routing_key=TASK_TYPE)
+            await self._declare_failure_queues()
+            consumer_tag = await queue.consume(self.callback)
+            reporter = asyncio.create_task(self.report())
+            logger.info("Worker %d waiting for messages (async).", self.worker_id)
+
+            await self._stop_event.wait()
+
+            # Drain: stop deliveries, then let in-flight messages commit and ack
+            # before the connection closes and the broker requeues the rest.
+            await queue.cancel(consumer_tag)
+            await self._idle.wait()
+            reporter.cancel()
+
+        await self.engine.dispose()
+        logger.info(
+            "Worker %d stopped after %d messages.", self.worker_id, self.processed
+        )
+
+    def stop(self):
+        """
+        Ask the worker to stop consuming.
+
+        Returns:
+            None
+        """
+        self._stop_event.set()
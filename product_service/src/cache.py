@@ -0,0 +1,204 @@
+"""
+This module contains the in-process read-through cache used by the read API.
+
+Entries expire after a TTL and the least recently used entry is evicted when
+the cache is full. Concurrent misses for the same key share one load, so a
+burst of requests for a cold key costs a single database query.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+)
+
+
+class _LoadAbandoned(Exception):
+    """
+    Raised to the waiters of a load whose caller was cancelled.
+    """
+
+
+class ReadThroughCache:
+    """
+    TTL + LRU cache that loads missing entries on demand.
+
+    Keys are tuples whose first item names their namespace, for example
+    ``("product", 42)``. Entries are indexed by namespace, so invalidating
+    one namespace does not visit the entries of the others.
+
+    Invalidating a namespace bumps its generation, so a load of that
+    namespace that started before the invalidation is returned to its
+    callers but not stored. Loads of other namespaces are unaffected.
+
+    Args:
+        max_size (int): The maximum number of cached entries. Zero disables
+            the cache.
+        ttl (float): Seconds an entry stays fresh.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._generation = 0
+        self._generations: Dict[Hashable, int] = {}
+        self._entries: "OrderedDict[Tuple, Tuple[Any, float]]" = OrderedDict()
+        self._namespaces: Dict[Hashable, Set[Tuple]] = {}
+        self._loading: Dict[Tuple, asyncio.Future] = {}
+
+    async def get_or_load(
+        self, key: Tuple, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return the cached value for a key, loading and caching it on a miss.
+
+        If the caller that started a shared load is cancelled, one of the
+        callers waiting for it starts the load again with its own loader.
+
+        Args:
+            key (Tuple): The cache key.
+            loader (Callable[[], Awaitable[Any]]): Loads the value on a miss.
+
+        Returns:
+            Any: The cached or loaded value.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+
+        self.misses += 1
+        while True:
+            loading = self._loading.get(key)
+            if loading is None:
+                return await self._load(key, loader)
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(loading)
+            except _LoadAbandoned:
+                continue
+
+    async def _load(self, key: Tuple, loader: Callable[[], Awaitable[Any]]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        generation = self._generation_of(key)
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            # The loader may depend on the cancelled caller, for example on
+            # its database session, so a waiter loads again instead.
+            future.set_exception(_LoadAbandoned())
+            future.exception()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # Waiters re-raise it; nothing else retrieves it
+            raise
+        finally:
+            del self._loading[key]
+
+        if generation == self._generation_of(key):
+            self._put(key, value)
+        future.set_result(value)
+        return value
+
+    def _generation_of(self, key: Tuple) -> Tuple[int, int]:
+        return self._generation, self._generations.get(key[0], 0)
+
+    def _put(self, key: Tuple, value: Any):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        self._namespaces.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Tuple):
+        del self._entries[key]
+        keys = self._namespaces[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._namespaces[key[0]]
+
+    def invalidate(
+        self,
+        namespace: Hashable,
+        predicate: Optional[Callable[[Tuple, Any], bool]] = None,
+        keys: Optional[Iterable[Tuple]] = None,
+    ):
+        """
+        Remove entries of a namespace.
+
+        Args:
+            namespace (Hashable): The namespace.
+            predicate (Callable[[Tuple, Any], bool], optional): Called with
+                each key and value; only the entries for which it is true
+                are removed. By default every entry is removed.
+            keys (Iterable[Tuple], optional): The keys of the namespace to
+                consider. By default every entry of the namespace is.
+
+        Returns:
+            None
+        """
+        self._generations[namespace] = self._generations.get(namespace, 0) + 1
+        if keys is None:
+            candidates = list(self._namespaces.get(namespace, ()))
+        else:
+            candidates = [key for key in keys if key in self._entries]
+        stale = [
+            key
+            for key in candidates
+            if predicate is None or predicate(key, self._entries[key][0])
+        ]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+
+    def clear(self):
+        """
+        Remove every entry.
+
+        Returns:
+            None
+        """
+        self._generation += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._namespaces.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the cache counters.
+
+        Returns:
+            Dict[str, int]: The size, hits, misses, coalesced loads, evictions
+            and invalidations.
+        """
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
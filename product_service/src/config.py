@@ -6,12 +6,70 @@ from decouple import config
 
 # Define PostgreSQL settings
 DATABASE_URL = config("DATABASE_URL")
+ASYNC_DATABASE_URL = config(
+    "ASYNC_DATABASE_URL",
+    default=DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+)
 
 # Define RabbitMQ settings
 RABBITMQ_HOST = config("RABBITMQ_HOST")
-RABBITMQ_PORT = config("RABBITMQ_PORT")
+RABBITMQ_PORT = config("RABBITMQ_PORT", cast=int)
+# Heartbeats let both sides detect a dead connection; failed connection
+# attempts are retried after a random delay of up to
+# RECONNECT_BASE_DELAY * 2**attempt, capped at RECONNECT_MAX_DELAY seconds.
+RABBITMQ_HEARTBEAT = config("RABBITMQ_HEARTBEAT", default=60, cast=int)
+RABBITMQ_BLOCKED_CONNECTION_TIMEOUT = config(
+    "RABBITMQ_BLOCKED_CONNECTION_TIMEOUT", default=300.0, cast=float
+)
+RECONNECT_BASE_DELAY = config("RECONNECT_BASE_DELAY", default=0.5, cast=float)
+RECONNECT_MAX_DELAY = config("RECONNECT_MAX_DELAY", default=30.0, cast=float)
+TASK_EXCHANGE = config("TASK_EXCHANGE", default="tasks")
 
 # Define JWT settings
 JWT_SECRET_KEY = config("JWT_SECRET_KEY")
 JWT_ALGORITHM = config("JWT_ALGORITHM")
 JWT_ACCESS_TOKEN_EXPIRE_MINUTES = config("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", cast=int)
+TOKEN_CACHE_MAX_SIZE = config("TOKEN_CACHE_MAX_SIZE", default=1024, cast=int)
+
+# Define consumer settings
+# "blocking" runs the pika consumer, "async" runs the asyncio consumer that
+# overlaps many in-flight messages in one process.
+CONSUMER_ENGINE = config("CONSUMER_ENGINE", default="blocking")
+ASYNC_CONCURRENCY = config("ASYNC_CONCURRENCY", default=50, cast=int)
+# "single" commits every message on its own, "batch" groups messages into one
+# multi-row INSERT per transaction.
+CONSUMER_MODE = config("CONSUMER_MODE", default="single")
+CONSUMER_PREFETCH = config("CONSUMER_PREFETCH", default=200, cast=int)
+BATCH_SIZE = config("BATCH_SIZE", default=100, cast=int)
+BATCH_TIMEOUT_MS = config("BATCH_TIMEOUT_MS", default=50, cast=int)
+CONSUMER_WORKERS = config("CONSUMER_WORKERS", default=1, cast=int)
+CONSUMER_REPORT_INTERVAL = config("CONSUMER_REPORT_INTERVAL", default=30.0, cast=float)
+DB_POOL_SIZE = config("DB_POOL_SIZE", default=5, cast=int)
+
+# Define deduplication settings
+DEDUP_CACHE_SIZE = config("DEDUP_CACHE_SIZE", default=100000, cast=int)
+DEDUP_RETENTION = config("DEDUP_RETENTION", default=86400.0, cast=float)
+DEDUP_PRUNE_INTERVAL = config("DEDUP_PRUNE_INTERVAL", default=600.0, cast=float)
+
+# Define failure handling settings
+# Transient failures wait RETRY_BASE_DELAY_MS * 2**n in retry lane n before
+# redelivery; after RETRY_MAX_ATTEMPTS retries a message is dead-lettered.
+DEAD_LETTER_EXCHANGE = config("DEAD_LETTER_EXCHANGE", default="tasks.dead")
+RETRY_MAX_ATTEMPTS = config("RETRY_MAX_ATTEMPTS", default=5, cast=int)
+RETRY_BASE_DELAY_MS = config("RETRY_BASE_DELAY_MS", default=1000, cast=int)
+
+# Define metrics settings
+# Consumer worker n serves /metrics on METRICS_PORT + n; 0 disables it.
+METRICS_PORT = config("METRICS_PORT", default=9100, cast=int)
+
+# Define read API settings
+API_CACHE_MAX_SIZE = config("API_CACHE_MAX_SIZE", default=10000, cast=int)
+API_CACHE_TTL = config("API_CACHE_TTL", default=60.0, cast=float)
+API_PAGE_SIZE = config("API_PAGE_SIZE", default=50, cast=int)
+API_MAX_PAGE_SIZE = config("API_MAX_PAGE_SIZE", default=500, cast=int)
+API_LISTEN_RETRY_DELAY = config("API_LISTEN_RETRY_DELAY", default=5.0, cast=float)
+# Product change notifications are merged and applied to the cache at most
+# every API_INVALIDATION_INTERVAL seconds, so cached reads may lag inserts by
+# that long; 0 applies every notification at once.
+API_INVALIDATION_INTERVAL = config("API_INVALIDATION_INTERVAL", default=0.5, cast=float)
+API_SEARCH_MAX_OFFSET = config("API_SEARCH_MAX_OFFSET", default=1000, cast=int)
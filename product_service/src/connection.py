@@ -0,0 +1,187 @@
+"""
+This module manages the RabbitMQ connection of a blocking consumer worker.
+
+``ConnectionManager`` connects with heartbeats enabled and retries failed
+attempts after a jittered, exponentially growing delay, so workers that lose
+the broker together do not reconnect in lockstep. When an established
+connection is lost it connects again and resumes consuming without
+restarting the process.
+
+pika's ``BlockingConnection`` only answers heartbeats while its I/O loop
+runs, so workers do their database work on another thread and hand results
+back to the I/O thread with ``call_threadsafe``.
+"""
+
+import random
+import threading
+from typing import Callable, Optional
+
+import pika
+
+from .config import (
+    RABBITMQ_BLOCKED_CONNECTION_TIMEOUT,
+    RABBITMQ_HEARTBEAT,
+    RABBITMQ_HOST,
+    RABBITMQ_PORT,
+    RECONNECT_BASE_DELAY,
+    RECONNECT_MAX_DELAY,
+)
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Errors after which the worker reconnects instead of exiting.
+RECOVERABLE_ERRORS = (
+    pika.exceptions.AMQPConnectionError,
+    pika.exceptions.AMQPChannelError,
+)
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    Return the delay before a reconnection attempt.
+
+    The delay is drawn uniformly between zero and the exponential bound
+    ("full jitter").
+
+    Args:
+        attempt (int): The number of failed attempts so far.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    bound = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** min(attempt, 32))
+    return random.uniform(0, bound)
+
+
+class ConnectionManager:
+    """
+    Own the RabbitMQ connection of one worker across reconnects.
+
+    Args:
+        name (str): The name of the worker, used in log messages.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.parameters = pika.ConnectionParameters(
+            host=RABBITMQ_HOST,
+            port=RABBITMQ_PORT,
+            heartbeat=RABBITMQ_HEARTBEAT,
+            blocked_connection_timeout=RABBITMQ_BLOCKED_CONNECTION_TIMEOUT,
+        )
+        self.connection: Optional[pika.BlockingConnection] = None
+        self.reconnects = 0
+        self._stopping = threading.Event()
+
+    @property
+    def stopping(self) -> bool:
+        """
+        bool: Whether ``stop`` has been called.
+        """
+        return self._stopping.is_set()
+
+    def connect(self) -> Optional[pika.BlockingConnection]:
+        """
+        Connect to RabbitMQ, retrying with backoff until it succeeds.
+
+        Returns:
+            pika.BlockingConnection or None: The connection, or None if
+            ``stop`` was called first.
+        """
+        attempt = 0
+        while not self.stopping:
+            try:
+                self.connection = pika.BlockingConnection(self.parameters)
+                return self.connection
+            except pika.exceptions.AMQPConnectionError as e:
+                delay = backoff_delay(attempt)
+                logger.warning(
+                    "%s: RabbitMQ connection failed, retrying in %.1fs: %r",
+                    self.name,
+                    delay,
+                    e,
+                )
+                self._stopping.wait(delay)
+                attempt += 1
+        return None
+
+    def run(self, consume: Callable[[pika.BlockingConnection], None]):
+        """
+        Call ``consume`` with a new connection until ``stop`` is called.
+
+        ``consume`` sets up its channel and blocks while consuming. If the
+        connection or channel fails, the connection is closed and, after a
+        short jittered pause, ``consume`` is called again with a new one.
+
+        Args:
+            consume (Callable[[pika.BlockingConnection], None]): The function
+                that consumes from a connection.
+
+        Returns:
+            None
+        """
+        while True:
+            connection = self.connect()
+            if connection is None:
+                return
+            try:
+                consume(connection)
+                if self.stopping:
+                    return
+                logger.warning("%s: Consuming stopped, reconnecting.", self.name)
+            except RECOVERABLE_ERRORS as e:
+                if self.stopping:
+                    return
+                logger.error("%s: RabbitMQ connection lost: %r", self.name, e)
+            finally:
+                self._close(connection)
+            self.reconnects += 1
+            self._stopping.wait(backoff_delay(0))
+
+    def call_threadsafe(
+        self, connection: pika.BlockingConnection, callback: Callable[[], None]
+    ) -> bool:
+        """
+        Run a callback on a connection's I/O thread.
+
+        Args:
+            connection (pika.BlockingConnection): The connection the callback
+                belongs to.
+            callback (Callable[[], None]): The callback.
+
+        Returns:
+            bool: False if the connection is already closed and the callback
+            was dropped; its messages will be redelivered.
+        """
+        try:
+            connection.add_callback_threadsafe(callback)
+            return True
+        except pika.exceptions.ConnectionWrongStateError:
+            return False
+
+    def stop(self, callback: Optional[Callable[[], None]] = None):
+        """
+        Stop reconnecting. Safe to call from a signal handler.
+
+        Args:
+            callback (Callable[[], None], optional): A callback to run on the
+                I/O thread of the current connection, such as
+                ``channel.stop_consuming``.
+
+        Returns:
+            None
+        """
+        self._stopping.set()
+        connection = self.connection
+        if callback is not None and connection is not None and connection.is_open:
+            self.call_threadsafe(connection, callback)
+
+    def _close(self, connection: pika.BlockingConnection):
+        if connection.is_open:
+            try:
+                connection.close()
+            except RECOVERABLE_ERRORS as e:
+                logger.warning("%s: Error closing connection: %r", self.name, e)
+        if self.connection is connection:
+            self.connection = None
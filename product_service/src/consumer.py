@@ -1,131 +1,633 @@
 """
-This module initializes the RabbitMQ consumer and starts consuming messages.
+This module contains the RabbitMQ consumer for the Product Service.
+
+Each ``ProductConsumer`` is one worker with its own RabbitMQ connection and
+database connection pool; ``main`` runs several of them in separate
+processes.
 """
 
-import json
+import functools
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Set, Tuple
 
-import pika
 import sqlalchemy
-from jose import JWTError, jwt
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from .config import (
+    BATCH_SIZE,
+    BATCH_TIMEOUT_MS,
+    CONSUMER_MODE,
+    CONSUMER_PREFETCH,
+    CONSUMER_REPORT_INTERVAL,
     DATABASE_URL,
-    JWT_ALGORITHM,
-    JWT_SECRET_KEY,
-    RABBITMQ_HOST,
-    RABBITMQ_PORT,
+    DB_POOL_SIZE,
+    DEDUP_CACHE_SIZE,
+    DEDUP_RETENTION,
+    METRICS_PORT,
+    TASK_EXCHANGE,
+)
+from .connection import ConnectionManager
+from .crud import claim_messages, insert_products, prune_processed_messages
+from .dedup import RecentMessages, get_message_id
+from .envelope import (
+    decode_body,
+    decode_legacy,
+    get_envelope_version,
+    get_header_token,
+    get_published_at,
+)
+from .failures import (
+    MALFORMED_ERRORS,
+    Delivery,
+    FailureHandler,
+    describe,
+    is_transient,
 )
 from .logger import setup_logger
-from .models import Base, Product
+from .metrics import SIZE_BUCKETS, registry, serve_worker_metrics
+from .migrations import upgrade_schema
+from .models import Base
+from .tokens import token_verifier, verify_token
+
+logger = setup_logger(__name__)
 
-logger = setup_logger()
+QUEUE_NAME = "product_tasks"
+TASK_TYPE = "product"
+
+consumed_messages = registry.counter(
+    "consumer_messages_total",
+    "Messages consumed, by outcome.",
+    ["outcome"],
+)
+queue_lag_seconds = registry.histogram(
+    "consumer_queue_lag_seconds",
+    "Time from publishing a message to its delivery to a worker.",
+)
+commit_seconds = registry.histogram(
+    "consumer_commit_seconds",
+    "Time to write and commit a transaction.",
+)
+batch_messages = registry.histogram(
+    "consumer_batch_messages",
+    "Messages per flushed batch.",
+    buckets=SIZE_BUCKETS,
+)
 
 
-def create_rabbitmq_connection():
+def setup_database():
     """
-    Creates a RabbitMQ connection.
+    Create the database tables and apply pending schema upgrades.
 
-    This function attempts to establish a connection to a RabbitMQ server using the pika library.
-    It continuously retries the connection until it is successful.
+    Runs once in the parent process before the workers start; the engine is
+    disposed afterwards so no connection is shared across a fork.
 
     Returns:
-        pika.BlockingConnection: The established RabbitMQ connection.
+        None
+    """
+    engine = sqlalchemy.create_engine(DATABASE_URL)
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    engine.dispose()
+    logger.info("Database setup complete.")
 
-    Raises:
-        pika.exceptions.AMQPConnectionError: If the connection to the RabbitMQ server fails.
+
+def prune_dedup_records():
     """
+    Delete processed-message records older than ``DEDUP_RETENTION``.
 
-    while True:
-        try:
-            conn = pika.BlockingConnection(
-                pika.ConnectionParameters(host=RABBITMQ_HOST, port=RABBITMQ_PORT)
-            )
-            return conn
-        except pika.exceptions.AMQPConnectionError:
-            print("Connection failed, retrying...")
-            time.sleep(5)  # Wait before retrying
+    Runs periodically in the parent process. The engine does not pool
+    connections, so none is left open for workers forked later.
+
+    Returns:
+        None
+    """
+    engine = sqlalchemy.create_engine(DATABASE_URL, poolclass=NullPool)
+    db = sessionmaker(bind=engine)()
+    try:
+        deleted = prune_processed_messages(db, DEDUP_RETENTION)
+        db.commit()
+        logger.info("Pruned %d processed-message records.", deleted)
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error("Failed to prune processed-message records: %s", e)
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def observe_queue_lag(properties):
+    """
+    Record how long a message waited between publishing and delivery.
+
+    Messages that were retried include their time in the retry lanes.
+
+    Args:
+        properties: The message properties.
+
+    Returns:
+        None
+    """
+    published_at = get_published_at(properties)
+    if published_at is not None:
+        queue_lag_seconds.observe(max(0.0, time.time() - published_at))
 
 
-def verify_token(token: str) -> dict:
+def parse_task(body: bytes, properties) -> Optional[dict]:
     """
-    Verifies a JWT token.
+    Decode a message and verify its token.
+
+    Versioned messages are authenticated from their headers before the body
+    is decoded; legacy JSON messages carry the token in the body.
 
     Args:
-        token (str): The JWT token to be verified.
+        body (bytes): The message body.
+        properties: The message properties.
 
     Returns:
-        dict: The decoded payload if the token is valid.
+        dict or None: The product row to insert, or None if the message
+        carries no token.
 
     Raises:
-        ValueError: If the token is expired or invalid.
+        ValueError: If the message cannot be decoded, is not a product task,
+            or the token is invalid.
+        KeyError: If the task is missing a field.
+        TypeError: If the task is not an object.
     """
-    try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
-    except JWTError as exc:
-        raise ValueError("Invalid token") from exc
+    if get_envelope_version(properties) >= 2:
+        task_type = getattr(properties, "type", None)
+        if task_type and task_type != TASK_TYPE:
+            raise ValueError(f"Unexpected task type: {task_type}")
+        token = get_header_token(properties)
+        if not token:
+            logger.warning("No token provided. Task cannot be processed.")
+            return None
+        verify_token(token)  # Validate the token before touching the body
+        data = decode_body(body, properties.content_type)
+    else:
+        data, token = decode_legacy(body)
+        if not token:
+            logger.warning("No token provided. Task cannot be processed.")
+            return None
+        verify_token(token)  # Validate the token
+
+    return {
+        "name": data["name"],
+        "description": data["description"],
+        "price": data["price"],
+    }
 
 
-# Setup SQLAlchemy
-engine = sqlalchemy.create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base.metadata.create_all(bind=engine)
-logger.info("Database setup complete.")
+class FlushResult(NamedTuple):
+    """
+    The outcome of writing a batch, handed back to the I/O thread.
 
-# Setup RabbitMQ
-connection = create_rabbitmq_connection()
-channel = connection.channel()
-channel.queue_declare(queue="product_tasks")
-logger.info("RabbitMQ setup complete and queue declared.")
+    Attributes:
+        written (int): The number of inserted products.
+        duplicates (int): The number of messages already committed before.
+        committed (List[str]): The message IDs recorded as processed.
+        failed (List[Tuple[Delivery, Exception]]): The messages to retry or
+            dead-letter, with their errors.
+    """
 
+    written: int
+    duplicates: int
+    committed: List[str]
+    failed: List[Tuple[Delivery, Exception]]
 
-def callback(ch, method, properties, body):
+
+class ProductBatcher:
     """
-    Callback function for processing incoming messages.
+    Collect messages and write them to the database in batches.
 
-    Args:
-        ch: The channel object.
-        method: The method object.
-        properties: The properties object.
-        body: The message body.
+    A batch is flushed when it holds ``batch_size`` messages or when
+    ``batch_timeout`` seconds have passed since its first message, whichever
+    comes first. All products in a batch are inserted in one transaction and
+    the messages are acknowledged together only after the commit succeeds.
 
-    Returns:
-        None
+    The transaction runs on the worker's single database thread, so the I/O
+    thread keeps answering heartbeats and filling the next batch meanwhile.
+    Batches commit in order and their results come back to the I/O thread
+    through ``ConnectionManager.call_threadsafe``, where the messages are
+    acknowledged. A batcher belongs to one connection; if the connection is
+    lost, its unacknowledged messages are redelivered on the next one.
+
+    Messages already committed are dropped: recent ones from memory, older
+    ones by claiming their IDs in the batch's transaction.
+
+    Malformed messages are dead-lettered as they arrive. If the batch fails
+    transiently, every message goes to its retry lane; if the database
+    rejects it, the products are inserted one at a time so only the rejected
+    ones are dead-lettered.
+
+    Args:
+        manager (ConnectionManager): The manager of the connection.
+        connection (pika.BlockingConnection): The connection used for timers.
+        channel: The channel the messages are consumed from.
+        executor (ThreadPoolExecutor): The single-threaded database executor.
+        session_factory (sessionmaker): The factory for database sessions.
+        recent (RecentMessages): The IDs of recently committed messages.
+        failures (FailureHandler): The handler for failed messages.
+        batch_size (int): The maximum number of messages per batch.
+        batch_timeout (float): The maximum time to hold a batch, in seconds.
     """
-    task = body.decode()
-    logger.info("Received a new task.")
 
-    # Extract and verify the token
-    try:
-        task_data = json.loads(task)
-        data = task_data.get("task")
-        token = task_data.get("token")
-        if token:
-            verify_token(token)  # Validate the token
+    def __init__(
+        self,
+        manager: ConnectionManager,
+        connection,
+        channel,
+        executor: ThreadPoolExecutor,
+        session_factory: sessionmaker,
+        recent: RecentMessages,
+        failures: FailureHandler,
+        batch_size: int,
+        batch_timeout: float,
+    ):
+        self.manager = manager
+        self.connection = connection
+        self.channel = channel
+        self.executor = executor
+        self.session_factory = session_factory
+        self.recent = recent
+        self.failures = failures
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.products: List[Tuple[Delivery, Optional[str], dict]] = []
+        self.message_ids: Set[str] = set()
+        self.pending = 0
+        self.last_delivery_tag = None
+        self._timer = None
+
+    def callback(self, ch, method, properties, body):
+        """
+        Callback function for adding an incoming message to the batch.
+
+        Args:
+            ch: The channel object.
+            method: The method object.
+            properties: The properties object.
+            body: The message body.
+
+        Returns:
+            None
+        """
+        observe_queue_lag(properties)
+        message_id = get_message_id(properties)
+        if message_id and (
+            message_id in self.message_ids or self.recent.seen(message_id)
+        ):
+            consumed_messages.inc(outcome="duplicate")
+            logger.info("Dropped duplicate message %s.", message_id)
         else:
-            logger.warning("No token provided. Task cannot be processed.")
+            delivery = Delivery(QUEUE_NAME, properties, body)
+            try:
+                product = parse_task(body, properties)
+                if product is not None:
+                    self.products.append((delivery, message_id, product))
+                    if message_id:
+                        self.message_ids.add(message_id)
+            except MALFORMED_ERRORS as e:
+                self.failures.handle(delivery, e)
+            except Exception as e:
+                # An unexpected error would otherwise kill the worker, and the
+                # redelivered message would kill its replacement.
+                logger.exception("Unexpected error parsing a message.")
+                self.failures.handle(delivery, e)
+
+        self.pending += 1
+        self.last_delivery_tag = method.delivery_tag
+        if self.pending >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = self.connection.call_later(self.batch_timeout, self.flush)
+
+    def flush(self):
+        """
+        Hand the batched products to the database thread.
+
+        Returns:
+            None
+        """
+        if self._timer is not None:
+            self.connection.remove_timeout(self._timer)
+            self._timer = None
+        if self.last_delivery_tag is None:
             return
 
-        # Proceed with processing if token is valid
-        product_item = Product(
-            name=data["name"],
-            description=data["description"],
-            price=data["price"],
+        batch_messages.observe(self.pending)
+        batch = self.products
+        message_ids = list(self.message_ids)
+        delivery_tag = self.last_delivery_tag
+        self.products = []
+        self.message_ids = set()
+        self.pending = 0
+        self.last_delivery_tag = None
+
+        future = self.executor.submit(self._write, batch, message_ids)
+        future.add_done_callback(functools.partial(self._on_written, delivery_tag))
+
+    def _on_written(self, delivery_tag: int, future: Future):
+        # Runs on the database thread.
+        finish = functools.partial(self._finish, delivery_tag, future)
+        if not self.manager.call_threadsafe(self.connection, finish):
+            logger.warning(
+                "Connection closed before a batch was acknowledged; "
+                "it will be redelivered."
+            )
+
+    def _finish(self, delivery_tag: int, future: Future):
+        """
+        Retry or dead-letter the failed messages of a written batch and
+        acknowledge all of its messages. Runs on the I/O thread.
+
+        Args:
+            delivery_tag (int): The delivery tag of the batch's last message.
+            future (Future): The future of ``_write``.
+
+        Returns:
+            None
+        """
+        result: FlushResult = future.result()
+        for delivery, error in result.failed:
+            self.failures.handle(delivery, error)
+        self.recent.add(result.committed)
+        self.recent.stored_duplicates += result.duplicates
+        consumed_messages.inc(result.written, outcome="committed")
+        consumed_messages.inc(result.duplicates, outcome="duplicate")
+        self.channel.basic_ack(delivery_tag=delivery_tag, multiple=True)
+        logger.info("Added %d products to the database.", result.written)
+
+    def _write(
+        self, batch: List[Tuple[Delivery, Optional[str], dict]], message_ids: List[str]
+    ) -> FlushResult:
+        """
+        Insert a batch. Runs on the database thread.
+
+        Products whose message ID was already claimed are skipped.
+
+        Args:
+            batch (List[Tuple[Delivery, Optional[str], dict]]): The batched
+                messages, with their message IDs and products.
+            message_ids (List[str]): The message IDs of the batch.
+
+        Returns:
+            FlushResult: The outcome of the batch.
+        """
+        try:
+            inserted = self._insert(batch, message_ids)
+            return FlushResult(inserted, len(batch) - inserted, message_ids, [])
+        except Exception as e:
+            if is_transient(e):
+                logger.error(
+                    "Failed to insert batch of %d products: %s",
+                    len(batch),
+                    describe(e),
+                )
+                return FlushResult(
+                    0, 0, [], [(delivery, e) for delivery, _, _ in batch]
+                )
+            logger.warning(
+                "Batch of %d products rejected, inserting them one at a time: %s",
+                len(batch),
+                describe(e),
+            )
+            return self._insert_each(batch)
+
+    def _insert(
+        self, batch: List[Tuple[Delivery, Optional[str], dict]], message_ids: List[str]
+    ) -> int:
+        """
+        Claim message IDs and insert the products not committed before, in
+        one transaction.
+
+        Args:
+            batch (List[Tuple[Delivery, Optional[str], dict]]): The batched
+                messages, with their message IDs and products.
+            message_ids (List[str]): The message IDs of the batch.
+
+        Returns:
+            int: The number of inserted products.
+
+        Raises:
+            Exception: If the transaction fails; it is rolled back.
+        """
+        start = time.perf_counter()
+        db = self.session_factory()
+        try:
+            claimed = claim_messages(db, message_ids)
+            products = [
+                product
+                for _, message_id, product in batch
+                if message_id is None or message_id in claimed
+            ]
+            insert_products(db, products)
+            db.commit()
+            commit_seconds.observe(time.perf_counter() - start)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return len(products)
+
+    def _insert_each(
+        self, batch: List[Tuple[Delivery, Optional[str], dict]]
+    ) -> FlushResult:
+        """
+        Insert the products of a rejected batch one at a time.
+
+        Args:
+            batch (List[Tuple[Delivery, Optional[str], dict]]): The batched
+                messages, with their message IDs and products.
+
+        Returns:
+            FlushResult: The outcome of the batch, with the products that
+            failed on their own.
+        """
+        inserted = 0
+        committed: List[str] = []
+        failed: List[Tuple[Delivery, Exception]] = []
+        for entry in batch:
+            delivery, message_id, _ = entry
+            message_ids = [message_id] if message_id else []
+            try:
+                inserted += self._insert([entry], message_ids)
+                committed.extend(message_ids)
+            except Exception as e:
+                failed.append((delivery, e))
+        return FlushResult(
+            inserted, len(batch) - inserted - len(failed), committed, failed
         )
 
-        db = SessionLocal()
-        db.add(product_item)
-        db.commit()
-        logger.info("Product '%s' added to the database.", product_item.name)
-        db.close()
-    except ValueError as e:
-        logger.error("Token validation failed: %s", e)
 
+class ProductConsumer:
+    """
+    A single consumer worker.
 
-channel.basic_consume(
-    queue="product_tasks", on_message_callback=callback, auto_ack=True
-)
-logger.info("Waiting for messages. To exit press CTRL+C")
-channel.start_consuming()
+    The worker owns one RabbitMQ connection and one SQLAlchemy engine, so
+    several workers can run side by side in separate processes. The
+    connection is re-established whenever it is lost. In "single" mode every
+    message is its own batch.
+
+    Args:
+        worker_id (int): The index of the worker, used in log messages.
+    """
+
+    def __init__(self, worker_id: int = 0):
+        self.worker_id = worker_id
+        self.engine = sqlalchemy.create_engine(DATABASE_URL, pool_size=DB_POOL_SIZE)
+        self.SessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine
+        )
+        self.manager = ConnectionManager(f"Worker {worker_id}")
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"product-db-{worker_id}"
+        )
+        self.connection = None
+        self.channel = None
+        self.batcher: Optional[ProductBatcher] = None
+        self.failures = FailureHandler(None)
+        self.recent = RecentMessages(DEDUP_CACHE_SIZE)
+        self.processed = 0
+        self._reported = 0
+        self._reported_at = time.monotonic()
+
+    def on_message(self, ch, method, properties, body):
+        """
+        Count the message and add it to the current batch.
+
+        Args:
+            ch: The channel object.
+            method: The method object.
+            properties: The properties object.
+            body: The message body.
+
+        Returns:
+            None
+        """
+        self.processed += 1
+        self.batcher.callback(ch, method, properties, body)
+
+    def report(self, connection):
+        """
+        Log the worker's throughput since the previous report and schedule the
+        next one.
+
+        Args:
+            connection (pika.BlockingConnection): The connection the report
+                is scheduled on.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        elapsed = now - self._reported_at
+        count = self.processed - self._reported
+        logger.info(
+            "Worker %d processed %d messages in %.1fs (%.1f msg/s, total %d), "
+            "reconnects %d, token cache: %s, dedup: %s, failures: %s",
+            self.worker_id,
+            count,
+            elapsed,
+            count / elapsed if elapsed else 0.0,
+            self.processed,
+            self.manager.reconnects,
+            token_verifier.stats(),
+            self.recent.stats(),
+            self.failures.stats(),
+        )
+        self._reported = self.processed
+        self._reported_at = now
+        connection.call_later(
+            CONSUMER_REPORT_INTERVAL, functools.partial(self.report, connection)
+        )
+
+    def consume(self, connection):
+        """
+        Set up a new connection and consume from it until it is stopped or
+        lost.
+
+        Args:
+            connection (pika.BlockingConnection): The new connection.
+
+        Returns:
+            None
+        """
+        self.connection = connection
+        self.channel = connection.channel()
+        self.channel.exchange_declare(
+            exchange=TASK_EXCHANGE, exchange_type="direct", durable=True
+        )
+        self.channel.queue_declare(queue=QUEUE_NAME)
+        self.channel.queue_bind(
+            queue=QUEUE_NAME, exchange=TASK_EXCHANGE, routing_key=TASK_TYPE
+        )
+        self.failures.channel = self.channel
+        self.failures.declare(QUEUE_NAME)
+        self.channel.basic_qos(prefetch_count=CONSUMER_PREFETCH)
+        logger.info(
+            "Worker %d: RabbitMQ setup complete and queue bound.", self.worker_id
+        )
+
+        self.batcher = ProductBatcher(
+            self.manager,
+            connection,
+            self.channel,
+            self.executor,
+            self.SessionLocal,
+            self.recent,
+            self.failures,
+            BATCH_SIZE if CONSUMER_MODE == "batch" else 1,
+            BATCH_TIMEOUT_MS / 1000,
+        )
+        self.channel.basic_consume(
+            queue=QUEUE_NAME, on_message_callback=self.on_message
+        )
+        connection.call_later(
+            CONSUMER_REPORT_INTERVAL, functools.partial(self.report, connection)
+        )
+
+        if not self.manager.stopping:
+            logger.info("Worker %d waiting for messages.", self.worker_id)
+            self.channel.start_consuming()
+
+        if self.manager.stopping:
+            # Drain: commit and ack whatever is still batched, then let the
+            # broker requeue any prefetched messages that were not delivered.
+            self.batcher.flush()
+            self.executor.shutdown(wait=True)
+            connection.process_data_events(time_limit=0)
+
+    def run(self):
+        """
+        Consume messages, reconnecting as needed, until ``stop`` is called.
+
+        The worker's metrics are served on ``METRICS_PORT + worker_id``,
+        unless ``METRICS_PORT`` is zero or less.
+
+        Returns:
+            None
+        """
+        serve_worker_metrics(METRICS_PORT, self.worker_id)
+        self.manager.run(self.consume)
+        self.executor.shutdown(wait=True)
+        self.engine.dispose()
+        logger.info(
+            "Worker %d stopped after %d messages.", self.worker_id, self.processed
+        )
+
+    def stop(self):
+        """
+        Ask the worker to stop consuming. Safe to call from a signal handler.
+
+        Returns:
+            None
+        """
+        self.manager.stop(self._stop_consuming)
+
+    def _stop_consuming(self):
+        if self.channel is not None and self.channel.is_open:
+            self.channel.stop_consuming()
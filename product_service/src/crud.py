@@ -0,0 +1,240 @@
+"""
+This module contains the database operations for the Product model.
+"""
+
+import re
+from datetime import timedelta
+from typing import List, Optional, Set
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import ProcessedMessage, Product
+
+# Postgres channel on which inserts are announced to the read API.
+PRODUCT_CHANGES_CHANNEL = "product_changes"
+
+_notify = text("SELECT pg_notify(:channel, :payload)")
+
+# Matches and ranks on the weighted tsvector, or on trigram similarity of the
+# name so misspelled names still match. Both predicates use a GIN index.
+_search_postgres = text(
+    """
+    SELECT id, name, description, price,
+           ts_rank(search_vector, query) + similarity(name, :q) AS rank
+    FROM products, websearch_to_tsquery('english', :q) AS query
+    WHERE search_vector @@ query OR name % :q
+    ORDER BY rank DESC, id
+    LIMIT :limit OFFSET :offset
+"""
+)
+
+# bm25() is lower for better matches; it is negated so higher ranks better
+# on both backends.
+_search_sqlite = text(
+    """
+    SELECT p.id, p.name, p.description, p.price,
+           -bm25(products_fts, 10.0, 1.0) AS rank
+    FROM products_fts JOIN products AS p ON p.id = products_fts.rowid
+    WHERE products_fts MATCH :q
+    ORDER BY rank DESC, p.id
+    LIMIT :limit OFFSET :offset
+"""
+)
+
+
+def _notify_params(ids: List[int]) -> dict:
+    return {"channel": PRODUCT_CHANGES_CHANNEL, "payload": f"{min(ids)},{max(ids)}"}
+
+
+def insert_products(db: Session, products: List[dict]) -> List[int]:
+    """
+    Insert many products with a single multi-row INSERT.
+
+    The range of new IDs is announced on ``PRODUCT_CHANGES_CHANNEL``; Postgres
+    delivers the notification only when the transaction commits. The caller
+    owns the transaction and is responsible for committing.
+
+    Args:
+        db (Session): The database session.
+        products (List[dict]): The product rows, each with ``name``,
+            ``description`` and ``price``.
+
+    Returns:
+        List[int]: The IDs of the inserted products.
+    """
+    if not products:
+        return []
+    ids = list(db.scalars(insert(Product).returning(Product.id), products))
+    db.execute(_notify, _notify_params(ids))
+    return ids
+
+
+async def insert_products_async(db: AsyncSession, products: List[dict]) -> List[int]:
+    """
+    Insert many products with a single multi-row INSERT on an async session.
+
+    The range of new IDs is announced on ``PRODUCT_CHANGES_CHANNEL`` when the
+    transaction commits. The caller owns the transaction and is responsible
+    for committing.
+
+    Args:
+        db (AsyncSession): The async database session.
+        products (List[dict]): The product rows, each with ``name``,
+            ``description`` and ``price``.
+
+    Returns:
+        List[int]: The IDs of the inserted products.
+    """
+    if not products:
+        return []
+    ids = list(await db.scalars(insert(Product).returning(Product.id), products))
+    await db.execute(_notify, _notify_params(ids))
+    return ids
+
+
+def _claim_statement(message_ids: List[str]):
+    stmt = pg_insert(ProcessedMessage).values(
+        [{"message_id": message_id} for message_id in sorted(set(message_ids))]
+    )
+    return stmt.on_conflict_do_nothing(
+        index_elements=[ProcessedMessage.message_id]
+    ).returning(ProcessedMessage.message_id)
+
+
+def claim_messages(db: Session, message_ids: List[str]) -> Set[str]:
+    """
+    Record message IDs as processed and return the ones not seen before.
+
+    Must run in the same transaction as the messages' effect, so the record
+    and the effect commit or roll back together. A concurrent transaction
+    claiming the same ID waits for this one to finish.
+
+    Args:
+        db (Session): The database session.
+        message_ids (List[str]): The message IDs.
+
+    Returns:
+        Set[str]: The IDs claimed by this call; the others are duplicates.
+    """
+    if not message_ids:
+        return set()
+    return set(db.scalars(_claim_statement(message_ids)))
+
+
+async def claim_messages_async(db: AsyncSession, message_ids: List[str]) -> Set[str]:
+    """
+    Record message IDs as processed on an async session and return the ones
+    not seen before.
+
+    Must run in the same transaction as the messages' effect.
+
+    Args:
+        db (AsyncSession): The async database session.
+        message_ids (List[str]): The message IDs.
+
+    Returns:
+        Set[str]: The IDs claimed by this call; the others are duplicates.
+    """
+    if not message_ids:
+        return set()
+    return set(await db.scalars(_claim_statement(message_ids)))
+
+
+def prune_processed_messages(db: Session, retention: float) -> int:
+    """
+    Delete processed-message records older than the retention period.
+
+    Args:
+        db (Session): The database session.
+        retention (float): How long to keep records, in seconds.
+
+    Returns:
+        int: The number of deleted records.
+    """
+    result = db.execute(
+        delete(ProcessedMessage).where(
+            ProcessedMessage.processed_at < func.now() - timedelta(seconds=retention)
+        )
+    )
+    return result.rowcount
+
+
+async def get_product(db: AsyncSession, product_id: int) -> Optional[Product]:
+    """
+    Retrieve a product by its ID.
+
+    Args:
+        db (AsyncSession): The async database session.
+        product_id (int): The product ID.
+
+    Returns:
+        Product or None: The product, or None if it does not exist.
+    """
+    return await db.get(Product, product_id)
+
+
+async def list_products(
+    db: AsyncSession,
+    after: int,
+    limit: int,
+    name_prefix: Optional[str] = None,
+) -> List[Product]:
+    """
+    Retrieve a page of products in ID order using keyset pagination.
+
+    The page starts after the last ID of the previous page, so reading deep
+    into the catalog costs the same as reading its first page.
+
+    Args:
+        db (AsyncSession): The async database session.
+        after (int): Only products with a greater ID are returned.
+        limit (int): The maximum number of products.
+        name_prefix (str, optional): Only products whose name starts with
+            this prefix are returned.
+
+    Returns:
+        List[Product]: The products, ordered by ID.
+    """
+    query = select(Product).where(Product.id > after)
+    if name_prefix:
+        pattern = (
+            name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+        query = query.where(Product.name.like(pattern + "%", escape="\\"))
+    result = await db.scalars(query.order_by(Product.id).limit(limit))
+    return list(result)
+
+
+async def search_products(
+    db: AsyncSession, query: str, limit: int, offset: int
+) -> List[dict]:
+    """
+    Search products by keyword, ranked by relevance.
+
+    On Postgres, names and descriptions are matched with full-text search
+    and names also by trigram similarity. On SQLite the FTS5 table is
+    searched instead, with every word of the query matched as a prefix.
+
+    Args:
+        db (AsyncSession): The async database session.
+        query (str): The search text.
+        limit (int): The maximum number of results.
+        offset (int): The number of results to skip.
+
+    Returns:
+        List[dict]: The ``id``, ``name``, ``description``, ``price`` and
+        ``rank`` of each match, best first.
+    """
+    params = {"q": query, "limit": limit, "offset": offset}
+    if db.bind.dialect.name == "sqlite":
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        params["q"] = " ".join(f'"{word}"*' for word in words)
+        result = await db.execute(_search_sqlite, params)
+    else:
+        result = await db.execute(_search_postgres, params)
+    return [dict(row._mapping) for row in result]
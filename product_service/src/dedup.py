@@ -0,0 +1,89 @@
+"""
+This module contains the in-memory layer of task deduplication.
+
+The coordinator stamps every task with a unique ``message_id``. A worker
+remembers the IDs it has recently committed, so a redelivered message is
+dropped without a database round-trip. The ``processed_messages`` table,
+written in the same transaction as the task's effect, is the authoritative
+record for IDs this cache has not seen.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+def get_message_id(properties) -> Optional[str]:
+    """
+    Return the message ID of a message, if the publisher set one.
+
+    Args:
+        properties: The message properties.
+
+    Returns:
+        str or None: The message ID.
+    """
+    return getattr(properties, "message_id", None) or None
+
+
+class RecentMessages:
+    """
+    Bounded LRU set of message IDs that have been committed.
+
+    Args:
+        max_size (int): The maximum number of remembered IDs. Zero disables
+            the cache.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.stored_duplicates = 0
+        self._ids: "OrderedDict[str, None]" = OrderedDict()
+
+    def seen(self, message_id: str) -> bool:
+        """
+        Check whether a message ID was recently committed.
+
+        Args:
+            message_id (str): The message ID.
+
+        Returns:
+            bool: True if the message is a known duplicate.
+        """
+        if message_id in self._ids:
+            self._ids.move_to_end(message_id)
+            self.hits += 1
+            return True
+        return False
+
+    def add(self, message_ids: Iterable[str]):
+        """
+        Remember committed message IDs.
+
+        Args:
+            message_ids (Iterable[str]): The message IDs.
+
+        Returns:
+            None
+        """
+        if self.max_size <= 0:
+            return
+        for message_id in message_ids:
+            self._ids[message_id] = None
+            self._ids.move_to_end(message_id)
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the deduplication counters.
+
+        Returns:
+            Dict[str, int]: The number of remembered IDs, the duplicates
+            dropped from memory and the duplicates caught by the database.
+        """
+        return {
+            "size": len(self._ids),
+            "hits": self.hits,
+            "stored_duplicates": self.stored_duplicates,
+        }
@@ -0,0 +1,143 @@
+"""
+This module decodes tasks from RabbitMQ messages.
+
+Two envelope formats are accepted:
+
+- Version 1: a JSON body ``{"task": ..., "token": ...}``.
+- Version 2: the body is only the task, encoded with orjson or msgpack as
+  named by the ``content_type`` property. The JWT travels in the ``x-token``
+  header and the task type in the ``type`` property, so a message can be
+  authenticated and routed before its body is decoded.
+
+The coordinator also sets ``x-published-at``, the publish time in
+milliseconds since the epoch, from which consumers measure queue lag.
+
+``properties`` may be a pika ``BasicProperties`` or an aio-pika message;
+both expose ``headers``, ``content_type`` and ``type``.
+"""
+
+import json
+from typing import Optional, Tuple
+
+import msgpack
+import orjson
+
+VERSION_HEADER = "x-envelope-version"
+TOKEN_HEADER = "x-token"
+PUBLISHED_AT_HEADER = "x-published-at"
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+
+
+def get_envelope_version(properties) -> int:
+    """
+    Return the envelope version of a message.
+
+    Args:
+        properties: The message properties.
+
+    Returns:
+        int: 2 for messages with the versioned envelope, 1 otherwise.
+
+    Raises:
+        ValueError: If the version header is not an integer.
+    """
+    headers = getattr(properties, "headers", None) or {}
+    version = headers.get(VERSION_HEADER, 1)
+    if isinstance(version, bytes):
+        version = version.decode("utf-8")
+    if isinstance(version, bool) or not isinstance(version, (int, str)):
+        raise ValueError(f"Invalid envelope version: {version!r}")
+    return int(version)
+
+
+def get_header_token(properties) -> Optional[str]:
+    """
+    Return the JWT carried in the message headers.
+
+    Args:
+        properties: The message properties.
+
+    Returns:
+        str or None: The token, or None if the header is missing.
+
+    Raises:
+        ValueError: If the header is not a string.
+    """
+    headers = getattr(properties, "headers", None) or {}
+    token = headers.get(TOKEN_HEADER)
+    if isinstance(token, bytes):
+        token = token.decode("utf-8")
+    if token is not None and not isinstance(token, str):
+        raise ValueError("Token must be a string")
+    return token or None
+
+
+def get_published_at(properties) -> Optional[float]:
+    """
+    Return the time a message was published.
+
+    Args:
+        properties: The message properties.
+
+    Returns:
+        float or None: The publish time in seconds since the epoch, or None
+        if the publisher did not record it.
+    """
+    headers = getattr(properties, "headers", None) or {}
+    published_at = headers.get(PUBLISHED_AT_HEADER)
+    if not isinstance(published_at, (int, float)):
+        return None
+    return published_at / 1000
+
+
+def decode_body(body: bytes, content_type: Optional[str]) -> dict:
+    """
+    Decode the body of a version 2 message.
+
+    Args:
+        body (bytes): The message body.
+        content_type (str): The ``content_type`` property of the message.
+
+    Returns:
+        dict: The task.
+
+    Raises:
+        ValueError: If the content type is unsupported or the body cannot be
+            decoded into an object.
+    """
+    try:
+        if content_type == CONTENT_TYPE_MSGPACK:
+            task = msgpack.unpackb(body)
+        elif content_type == CONTENT_TYPE_JSON:
+            task = orjson.loads(body)
+        else:
+            raise ValueError(f"Unsupported content type: {content_type}")
+    except msgpack.UnpackException as exc:
+        raise ValueError("Malformed message body") from exc
+    if not isinstance(task, dict):
+        raise ValueError("Task must be an object")
+    return task
+
+
+def decode_legacy(body: bytes) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Decode a version 1 message.
+
+    Args:
+        body (bytes): The message body.
+
+    Returns:
+        Tuple[dict, str]: The task and the token, either of which may be None.
+
+    Raises:
+        ValueError: If the body is not a JSON object or the token is not a
+            string.
+    """
+    task_data = json.loads(body.decode())
+    if not isinstance(task_data, dict):
+        raise ValueError("Message must be an object")
+    token = task_data.get("token")
+    if token is not None and not isinstance(token, str):
+        raise ValueError("Token must be a string")
+    return task_data.get("task"), token
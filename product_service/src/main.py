@@ -1,11 +1,118 @@
 """
-This module initializes the RabbitMQ consumer and starts consuming messages.
+This module runs the Product Service consumer workers.
+
+``CONSUMER_WORKERS`` worker processes are started, each with its own
+RabbitMQ connection and database pool. ``CONSUMER_ENGINE`` selects the
+blocking pika consumer or the asyncio consumer for every worker. SIGTERM or
+SIGINT makes every worker stop consuming, finish its in-flight work and exit;
+a worker that dies unexpectedly is restarted. The parent also prunes old
+deduplication records every ``DEDUP_PRUNE_INTERVAL`` seconds.
 """
 
-from .consumer import channel
+import asyncio
+import multiprocessing
+import signal
+import time
+from multiprocessing.connection import wait
+
+from .async_consumer import AsyncProductConsumer
+from .config import CONSUMER_ENGINE, CONSUMER_WORKERS, DEDUP_PRUNE_INTERVAL
+from .consumer import ProductConsumer, prune_dedup_records, setup_database
 from .logger import setup_logger
 
+logger = setup_logger(__name__)
+
+
+def run_worker(worker_id: int):
+    """
+    Run a single consumer worker until it is asked to stop.
+
+    Args:
+        worker_id (int): The index of the worker.
+
+    Returns:
+        None
+    """
+    if CONSUMER_ENGINE == "async":
+        asyncio.run(AsyncProductConsumer(worker_id).run())
+        return
+
+    consumer = ProductConsumer(worker_id)
+
+    def handle_signal(signum, frame):
+        consumer.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    consumer.run()
+
+
+def start_worker(worker_id: int) -> multiprocessing.Process:
+    """
+    Start a worker process.
+
+    Args:
+        worker_id (int): The index of the worker.
+
+    Returns:
+        multiprocessing.Process: The started process.
+    """
+    process = multiprocessing.Process(
+        target=run_worker, args=(worker_id,), name=f"product-consumer-{worker_id}"
+    )
+    process.start()
+    return process
+
+
+def main():
+    """
+    Start the workers and supervise them until shutdown.
+
+    Returns:
+        None
+    """
+    setup_database()
+    pruned_at = time.monotonic()
+    workers = {
+        worker_id: start_worker(worker_id) for worker_id in range(CONSUMER_WORKERS)
+    }
+    shutting_down = False
+
+    def handle_signal(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for process in workers.values():
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    logger.info("Started %d %s consumer workers.", CONSUMER_WORKERS, CONSUMER_ENGINE)
+
+    while workers:
+        wait([process.sentinel for process in workers.values()], timeout=1)
+        for worker_id, process in list(workers.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            if shutting_down:
+                del workers[worker_id]
+            else:
+                logger.error(
+                    "Worker %d exited with code %s, restarting.",
+                    worker_id,
+                    process.exitcode,
+                )
+                time.sleep(1)
+                workers[worker_id] = start_worker(worker_id)
+
+        if not shutting_down and time.monotonic() - pruned_at >= DEDUP_PRUNE_INTERVAL:
+            prune_dedup_records()
+            pruned_at = time.monotonic()
+
+    logger.info("All consumer workers stopped.")
+
+
 if __name__ == "__main__":
-    logger = setup_logger()
     logger.info("Starting RabbitMQ consumer...")
-    channel.start_consuming()
+    main()
@@ -0,0 +1,115 @@
+"""
+This module contains the schema upgrades that ``Base.metadata.create_all``
+cannot apply to an existing database.
+"""
+
+from sqlalchemy import Engine, text
+
+
+def upgrade_schema(engine: Engine):
+    """
+    Add the indexes the read API uses for name prefix filters and search.
+
+    On Postgres this adds:
+
+    - a ``text_pattern_ops`` index, because the default ``ix_products_name``
+      index cannot serve ``LIKE 'prefix%'`` under a non-C collation;
+    - a generated ``search_vector`` column over the name (weight A) and the
+      description (weight B) with a GIN index, for full-text search;
+    - a ``pg_trgm`` GIN index on the name, for fuzzy name matching.
+
+    On SQLite, used for local testing, search is backed by an FTS5 table kept
+    in sync by triggers instead. Safe to run on every startup.
+
+    Args:
+        engine (Engine): The SQLAlchemy engine to run the DDL on.
+
+    Returns:
+        None
+    """
+    if engine.dialect.name == "sqlite":
+        _upgrade_sqlite(engine)
+        return
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_products_name_pattern "
+                "ON products (name text_pattern_ops)"
+            )
+        )
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(
+            text(
+                """
+                ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', coalesce(name, '')), 'A')
+                    || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+                ) STORED
+            """
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_products_search_vector "
+                "ON products USING GIN (search_vector)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_products_name_trgm "
+                "ON products USING GIN (name gin_trgm_ops)"
+            )
+        )
+
+
+def _upgrade_sqlite(engine: Engine):
+    with engine.begin() as conn:
+        if conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+        ).scalar():
+            return
+
+        conn.execute(
+            text(
+                """
+                CREATE VIRTUAL TABLE products_fts USING fts5(
+                    name, description, content='products', content_rowid='id'
+                )
+            """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN
+                    INSERT INTO products_fts (rowid, name, description)
+                    VALUES (new.id, new.name, new.description);
+                END
+            """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN
+                    INSERT INTO products_fts (products_fts, rowid, name, description)
+                    VALUES ('delete', old.id, old.name, old.description);
+                END
+            """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                CREATE TRIGGER products_fts_update AFTER UPDATE ON products BEGIN
+                    INSERT INTO products_fts (products_fts, rowid, name, description)
+                    VALUES ('delete', old.id, old.name, old.description);
+                    INSERT INTO products_fts (rowid, name, description)
+                    VALUES (new.id, new.name, new.description);
+                END
+            """
+            )
+        )
+        conn.execute(text("INSERT INTO products_fts (products_fts) VALUES ('rebuild')"))
@@ -2,7 +2,7 @@
 This module contains the SQLAlchemy model for the product.
 """
 
-from sqlalchemy import Column, Float, Integer, String
+from sqlalchemy import Column, DateTime, Float, Integer, String, func
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -24,3 +24,24 @@ class Product(Base):
     name = Column(String, index=True)
     description = Column(String)
     price = Column(Float)
+
+
+class ProcessedMessage(Base):
+    """
+    Records a task message whose effect has been committed.
+
+    Rows are written in the same transaction as the task's effect, so a
+    redelivered message finds its ID here and is skipped. Old rows are
+    pruned once redelivery is no longer possible.
+
+    Attributes:
+        message_id (str): The ID the coordinator stamped on the message.
+        processed_at (datetime): When the message was processed.
+    """
+
+    __tablename__ = "processed_messages"
+
+    message_id = Column(String(64), primary_key=True)
+    processed_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), index=True
+    )
@@ -0,0 +1,70 @@
+"""
+This module contains the schema classes for the read API.
+"""
+
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ProductOut(BaseModel):
+    """
+    ProductOut schema class.
+
+    Attributes:
+        id (int): The product ID.
+        name (str): The name of the product.
+        description (str): The description of the product.
+        price (float): The price of the product.
+    """
+
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+
+    class Config:
+        """
+        Pydantic configuration class.
+        """
+
+        from_attributes = True
+
+
+class ProductPage(BaseModel):
+    """
+    ProductPage schema class.
+
+    Attributes:
+        items (List[ProductOut]): The products, ordered by ID.
+        next_cursor (int, optional): The ``after`` value for the next page, or
+            None if this is the last page.
+    """
+
+    items: List[ProductOut]
+    next_cursor: Optional[int] = None
+
+
+class SearchHit(ProductOut):
+    """
+    SearchHit schema class.
+
+    Attributes:
+        rank (float): The relevance of the match; higher is better.
+    """
+
+    rank: float
+
+
+class SearchPage(BaseModel):
+    """
+    SearchPage schema class.
+
+    Attributes:
+        items (List[SearchHit]): The matches, best first.
+        next_offset (int, optional): The ``offset`` for the next page, or
+            None if this is the last page.
+    """
+
+    items: List[SearchHit]
+    next_offset: Optional[int] = None
@@ -0,0 +1,132 @@
+"""
+This module verifies the JWTs attached to incoming tasks.
+
+Verified tokens are cached by digest until they expire, so a burst of tasks
+carrying the same token costs one signature check. The signing key is
+constructed once at import instead of on every decode.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from jose import JWTError, jwk, jwt
+
+from .config import JWT_ALGORITHM, JWT_SECRET_KEY, TOKEN_CACHE_MAX_SIZE
+
+
+class TokenVerifier:
+    """
+    Verify JWTs and cache the decoded payloads.
+
+    Args:
+        key: The verification key, as accepted by ``jose.jwt.decode``.
+        algorithms (list): The accepted signing algorithms.
+        max_size (int): The maximum number of cached tokens. Zero disables
+            the cache.
+    """
+
+    def __init__(self, key, algorithms: list, max_size: int):
+        self.key = key
+        self.algorithms = algorithms
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.decode_count = 0
+        self.decode_seconds = 0.0
+        self._cache: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify(self, token: str) -> dict:
+        """
+        Verifies a JWT token.
+
+        Args:
+            token (str): The JWT token to be verified.
+
+        Returns:
+            dict: The decoded payload if the token is valid.
+
+        Raises:
+            ValueError: If the token is expired or invalid.
+        """
+        if not isinstance(token, str):
+            raise ValueError("Invalid token")
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        with self._lock:
+            entry = self._cache.get(digest)
+            if entry is not None:
+                payload, expires_at = entry
+                if time.time() < expires_at:
+                    self._cache.move_to_end(digest)
+                    self.hits += 1
+                    return payload
+                del self._cache[digest]
+            self.misses += 1
+
+        start = time.perf_counter()
+        try:
+            payload = jwt.decode(token, self.key, algorithms=self.algorithms)
+        except JWTError as exc:
+            raise ValueError("Invalid token") from exc
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.decode_count += 1
+                self.decode_seconds += elapsed
+
+        if self.max_size > 0:
+            expires_at = float(payload.get("exp", float("inf")))
+            with self._lock:
+                self._cache[digest] = (payload, expires_at)
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+        return payload
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return the cache and decode counters.
+
+        Returns:
+            Dict[str, float]: The cache size, hits, misses, hit rate, number
+            of full decodes and their mean duration in seconds.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "decodes": self.decode_count,
+                "mean_decode_seconds": (
+                    self.decode_seconds / self.decode_count
+                    if self.decode_count
+                    else 0.0
+                ),
+            }
+
+
+token_verifier = TokenVerifier(
+    key=jwk.construct(JWT_SECRET_KEY, JWT_ALGORITHM),
+    algorithms=[JWT_ALGORITHM],
+    max_size=TOKEN_CACHE_MAX_SIZE,
+)
+
+
+def verify_token(token: str) -> dict:
+    """
+    Verifies a JWT token using the shared cached verifier.
+
+    Args:
+        token (str): The JWT token to be verified.
+
+    Returns:
+        dict: The decoded payload if the token is valid.
+
+    Raises:
+        ValueError: If the token is expired or invalid.
+    """
+    return token_verifier.verify(token)
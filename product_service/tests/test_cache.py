@@ -0,0 +1,233 @@
+import asyncio
+
+import pytest
+
+from src import api
+from src.cache import ReadThroughCache
+from src.schemas import ProductOut, ProductPage
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def load_none():
+    return None
+
+
+def test_concurrent_misses_share_one_load():
+    cache = ReadThroughCache(max_size=10, ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.get_or_load(("product", 1), loader) for _ in range(5))
+        )
+
+    assert run(main()) == ["value"] * 5
+    assert calls == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_loader_error_reaches_every_caller_and_is_not_cached():
+    cache = ReadThroughCache(max_size=10, ttl=60)
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.get_or_load(("product", 1), loader) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    assert all(isinstance(result, RuntimeError) for result in run(main()))
+    assert cache.stats()["size"] == 0
+
+
+def test_waiter_takes_over_when_first_caller_is_cancelled():
+    cache = ReadThroughCache(max_size=10, ttl=60)
+    calls = []
+
+    def make_loader(name):
+        async def loader():
+            calls.append(name)
+            await asyncio.sleep(0.01)
+            return name
+
+        return loader
+
+    async def main():
+        first = asyncio.create_task(cache.get_or_load(("product", 1), make_loader("a")))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(
+            cache.get_or_load(("product", 1), make_loader("b"))
+        )
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert run(main()) == "b"
+    assert calls == ["a", "b"]
+    assert cache.stats()["size"] == 1
+
+
+def test_invalidate_only_touches_its_namespace():
+    cache = ReadThroughCache(max_size=10, ttl=60)
+
+    async def main():
+        for key in [("product", 1), ("product", 2), ("search", "q")]:
+            await cache.get_or_load(key, load_none)
+
+    run(main())
+    cache.invalidate("product", keys=[("product", 1), ("product", 3)])
+    assert cache.stats()["size"] == 2
+    cache.invalidate("search")
+    assert cache.stats()["size"] == 1
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_load_overlapping_invalidation_of_its_namespace_is_not_stored():
+    cache = ReadThroughCache(max_size=10, ttl=60)
+
+    async def load_during(namespace):
+        async def loader():
+            cache.invalidate(namespace)
+            return "value"
+
+        return await cache.get_or_load(("product", 1), loader)
+
+    assert run(load_during("product")) == "value"
+    assert cache.stats()["size"] == 0
+    assert run(load_during("search")) == "value"
+    assert cache.stats()["size"] == 1
+
+
+def test_lru_eviction_keeps_namespace_index_consistent():
+    cache = ReadThroughCache(max_size=2, ttl=60)
+
+    async def main():
+        for product_id in range(3):
+            await cache.get_or_load(("product", product_id), load_none)
+
+    run(main())
+    assert cache.stats()["evictions"] == 1
+    cache.invalidate("product")
+    assert cache.stats()["size"] == 0
+
+
+def fill(entries):
+    api.cache.clear()
+
+    async def main():
+        for key, value in entries.items():
+
+            async def loader(value=value):
+                return value
+
+            await api.cache.get_or_load(key, loader)
+
+    run(main())
+
+
+def page(next_cursor):
+    return ProductPage(items=[], next_cursor=next_cursor)
+
+
+def test_invalidate_range_drops_only_affected_entries():
+    fill(
+        {
+            ("product", 5): ProductOut(id=5),
+            ("product", 15): None,
+            ("product", 25): None,
+            ("page", 0, 10, None): page(10),
+            ("page", 10, 10, None): page(20),
+            ("page", 20, 10, None): page(None),
+            ("search", "widget", 10, 0): "hits",
+        }
+    )
+    api.invalidate_range(12, 18)
+    assert set(api.cache._entries) == {
+        ("product", 5),
+        ("product", 25),
+        ("page", 0, 10, None),
+        ("page", 20, 10, None),
+    }
+
+
+def test_pending_changes_merge_notifications_into_one_invalidation(monkeypatch):
+    ranges = []
+    monkeypatch.setattr(api, "invalidate_range", lambda *args: ranges.append(args))
+    pending = api.PendingChanges(interval=0.01)
+
+    async def main():
+        pending.add(10, 12)
+        pending.add(20, 25)
+        pending.add(13, 14)
+        await asyncio.sleep(0.05)
+        pending.add(30, 30)
+        pending.discard()
+        await asyncio.sleep(0.05)
+
+    run(main())
+    assert ranges == [(10, 25)]
+
+
+def test_listener_reconnects_when_add_listener_fails(monkeypatch):
+    connections = []
+
+    class FailingConnection:
+        closed = False
+
+        def add_termination_listener(self, callback):
+            pass
+
+        async def add_listener(self, channel, callback):
+            raise api.asyncpg.InterfaceError("connection was closed")
+
+        async def close(self):
+            self.closed = True
+
+    async def connect(dsn):
+        connections.append(FailingConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(api.asyncpg, "connect", connect)
+    monkeypatch.setattr(api, "API_LISTEN_RETRY_DELAY", 0.001)
+
+    async def main():
+        listener = asyncio.create_task(api.listen_for_changes())
+        while len(connections) < 3:
+            await asyncio.sleep(0.001)
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    run(main())
+    assert all(connection.closed for connection in connections[:2])
+
+
+@pytest.mark.parametrize("error", [asyncio.TimeoutError(), RuntimeError("unexpected")])
+def test_listener_keeps_reconnecting_after_other_errors(monkeypatch, error):
+    attempts = 0
+
+    async def listen(dsn):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise error
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(api, "listen", listen)
+    monkeypatch.setattr(api, "API_LISTEN_RETRY_DELAY", 0)
+    with pytest.raises(asyncio.CancelledError):
+        run(api.listen_for_changes())
+    assert attempts == 2
@@ -0,0 +1,53 @@
+import pika
+
+from src.dedup import RecentMessages, get_message_id
+
+
+def test_added_ids_are_seen_and_counted():
+    recent = RecentMessages(10)
+    recent.add(["a", "b"])
+    assert recent.seen("a")
+    assert recent.seen("b")
+    assert not recent.seen("c")
+    assert recent.stats() == {"size": 2, "hits": 2, "stored_duplicates": 0}
+
+
+def test_least_recently_used_ids_are_evicted_first():
+    recent = RecentMessages(3)
+    recent.add(["a", "b", "c"])
+    # Seeing "a" makes "b" the least recently used.
+    assert recent.seen("a")
+    recent.add(["d"])
+    assert not recent.seen("b")
+    assert all(recent.seen(message_id) for message_id in ["a", "c", "d"])
+    assert recent.stats()["size"] == 3
+
+
+def test_re_adding_an_id_refreshes_it():
+    recent = RecentMessages(2)
+    recent.add(["a", "b"])
+    recent.add(["a"])
+    recent.add(["c"])
+    assert recent.seen("a")
+    assert not recent.seen("b")
+
+
+def test_a_batch_larger_than_the_cache_keeps_the_newest_ids():
+    recent = RecentMessages(3)
+    recent.add([str(index) for index in range(10)])
+    assert recent.stats()["size"] == 3
+    assert [recent.seen(str(index)) for index in range(10)] == [False] * 7 + [True] * 3
+
+
+def test_zero_size_disables_the_cache():
+    recent = RecentMessages(0)
+    recent.add(["a"])
+    assert not recent.seen("a")
+    assert recent.stats() == {"size": 0, "hits": 0, "stored_duplicates": 0}
+
+
+def test_get_message_id_treats_a_missing_or_empty_id_as_none():
+    assert get_message_id(pika.BasicProperties(message_id="m-1")) == "m-1"
+    assert get_message_id(pika.BasicProperties(message_id="")) is None
+    assert get_message_id(pika.BasicProperties()) is None
+    assert get_message_id(None) is None
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import msgpack
+import pika
+import pytest
+from jose import jwt
+
+from src import async_consumer, consumer
+from src.config import JWT_ALGORITHM, JWT_SECRET_KEY
+from src.dedup import RecentMessages
+from src.envelope import CONTENT_TYPE_MSGPACK, TOKEN_HEADER, VERSION_HEADER
+from src.failures import DEAD_LETTER_EXCHANGE, FailureHandler
+
+TOKEN = jwt.encode(
+    {"sub": "tester", "exp": int(time.time()) + 3600},
+    JWT_SECRET_KEY,
+    algorithm=JWT_ALGORITHM,
+)
+PRODUCT = {"name": "Widget", "description": "A widget", "price": 9.99}
+
+
+class RecordingChannel:
+    def __init__(self):
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((exchange, routing_key, body, properties))
+
+
+class TimerConnection:
+    def call_later(self, delay, callback):
+        return object()
+
+
+def versioned(token=TOKEN, **headers):
+    return pika.BasicProperties(
+        headers={VERSION_HEADER: 2, TOKEN_HEADER: token, **headers},
+        content_type=CONTENT_TYPE_MSGPACK,
+        type=consumer.TASK_TYPE,
+    )
+
+
+def legacy(document) -> bytes:
+    return json.dumps(document).encode()
+
+
+def make_batcher():
+    return consumer.ProductBatcher(
+        manager=None,
+        connection=TimerConnection(),
+        channel=None,
+        executor=None,
+        session_factory=None,
+        recent=RecentMessages(10),
+        failures=FailureHandler(RecordingChannel()),
+        batch_size=100,
+        batch_timeout=1.0,
+    )
+
+
+def test_valid_messages_are_parsed():
+    body = legacy({"task": PRODUCT, "token": TOKEN})
+    assert consumer.parse_task(body, pika.BasicProperties()) == PRODUCT
+    assert consumer.parse_task(msgpack.packb(PRODUCT), versioned()) == PRODUCT
+
+
+@pytest.mark.parametrize(
+    "body, properties",
+    [
+        (b"[1, 2]", pika.BasicProperties()),
+        (b'"x"', pika.BasicProperties()),
+        (b"\xff", pika.BasicProperties()),
+        (legacy({"task": PRODUCT, "token": 5}), pika.BasicProperties()),
+        (legacy({"task": PRODUCT, "token": ["a"]}), pika.BasicProperties()),
+        (msgpack.packb(PRODUCT), versioned(token=5)),
+        (msgpack.packb(PRODUCT), versioned(**{VERSION_HEADER: 2.5})),
+        (msgpack.packb(PRODUCT), versioned(**{VERSION_HEADER: "two"})),
+        (msgpack.packb([1, 2]), versioned()),
+    ],
+)
+def test_malformed_messages_raise_value_error(body, properties):
+    with pytest.raises(ValueError):
+        consumer.parse_task(body, properties)
+
+
+@pytest.mark.parametrize(
+    "task", [[1, 2], "x", {"name": "Widget"}, {"description": "", "price": 1}]
+)
+def test_malformed_tasks_raise_a_malformed_error(task):
+    with pytest.raises(consumer.MALFORMED_ERRORS):
+        consumer.parse_task(legacy({"task": task, "token": TOKEN}), None)
+
+
+def test_batcher_dead_letters_malformed_messages_and_keeps_going():
+    batcher = make_batcher()
+    for tag, body in enumerate([b"[1, 2]", legacy({"task": PRODUCT, "token": 5})]):
+        batcher.callback(
+            None, SimpleNamespace(delivery_tag=tag), pika.BasicProperties(), body
+        )
+
+    published = batcher.failures.channel.published
+    assert [exchange for exchange, *_ in published] == [DEAD_LETTER_EXCHANGE] * 2
+    assert batcher.pending == 2
+    assert batcher.products == []
+
+
+def test_batcher_dead_letters_unexpected_errors(monkeypatch):
+    def fail(body, properties):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(consumer, "parse_task", fail)
+    batcher = make_batcher()
+    batcher.callback(
+        None, SimpleNamespace(delivery_tag=1), pika.BasicProperties(), b"{}"
+    )
+
+    [(exchange, _, body, _)] = batcher.failures.channel.published
+    assert (exchange, body) == (DEAD_LETTER_EXCHANGE, b"{}")
+    assert batcher.failures.stats()["dead_lettered"] == 1
+    assert batcher.pending == 1
+
+
+def test_unexpected_write_errors_fail_the_messages_instead_of_raising():
+    batcher = make_batcher()
+    error = RuntimeError("bug")
+
+    def fail(batch, message_ids):
+        raise error
+
+    batcher._insert = fail
+    delivery = consumer.Delivery(consumer.QUEUE_NAME, pika.BasicProperties(), b"{}")
+    result = batcher._write([(delivery, None, PRODUCT)], [])
+    assert result.failed == [(delivery, error)]
+    assert result.written == 0
+
+
+class FakeMessage:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.headers = {}
+        self.message_id = None
+        self.acked = False
+
+    async def ack(self):
+        self.acked = True
+
+
+def test_async_consumer_routes_unexpected_errors_and_acknowledges(monkeypatch):
+    def fail(body, properties):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(async_consumer, "parse_task", fail)
+    worker = async_consumer.AsyncProductConsumer()
+    handled = []
+
+    async def handle_failure(message, error):
+        handled.append((message, error))
+
+    worker._handle_failure = handle_failure
+    message = FakeMessage(b"{}")
+    asyncio.run(worker._process(message))
+
+    [(failed, error)] = handled
+    assert failed is message
+    assert isinstance(error, RuntimeError)
+    assert message.acked
+
+
+def test_async_consumer_routes_malformed_messages_and_acknowledges():
+    worker = async_consumer.AsyncProductConsumer()
+    handled = []
+
+    async def handle_failure(message, error):
+        handled.append(error)
+
+    worker._handle_failure = handle_failure
+    message = FakeMessage(b"[1, 2]")
+    asyncio.run(worker._process(message))
+
+    [error] = handled
+    assert isinstance(error, ValueError)
+    assert message.acked
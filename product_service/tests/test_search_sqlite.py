@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.util import greenlet_spawn
+
+from src.crud import search_products
+from src.migrations import upgrade_schema
+from src.models import Base, Product
+
+PRODUCTS = [
+    {"name": "Blue widget", "description": "A small widget", "price": 9.99},
+    {"name": "Red gadget", "description": "Works with any blue widget", "price": 19.99},
+    {"name": "Widgetizer", "description": "Turns gadgets into widgets", "price": 5.0},
+    {"name": "Green lamp", "description": "A desk lamp", "price": 24.5},
+]
+
+
+def search(query, limit=10, offset=0):
+    async def main():
+        # One in-memory database shared by every session of the engine.
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await greenlet_spawn(upgrade_schema, engine.sync_engine)
+        async with engine.begin() as conn:
+            await conn.execute(insert(Product), PRODUCTS)
+
+        async with async_sessionmaker(engine)() as db:
+            hits = await search_products(db, query, limit, offset)
+        await engine.dispose()
+        return hits
+
+    return asyncio.run(main())
+
+
+def names(hits):
+    return [hit["name"] for hit in hits]
+
+
+def test_name_matches_rank_above_description_matches():
+    hits = search("blue widget")
+    assert names(hits) == ["Blue widget", "Red gadget"]
+    assert hits[0]["rank"] > hits[1]["rank"]
+
+
+def test_words_match_as_prefixes():
+    assert set(names(search("widg"))) == {"Blue widget", "Red gadget", "Widgetizer"}
+    assert names(search("lam")) == ["Green lamp"]
+
+
+def test_limit_and_offset_page_the_ranking():
+    ranked = names(search("widget"))
+    assert names(search("widget", limit=1)) == ranked[:1]
+    assert names(search("widget", limit=10, offset=1)) == ranked[1:]
+
+
+@pytest.mark.parametrize("query", ["", "   ", "!!!"])
+def test_queries_without_words_match_nothing(query):
+    assert search(query) == []
+
+
+def test_query_syntax_is_quoted():
+    assert names(search('lamp" OR "widget')) == []
+    assert names(search("desk-lamp")) == ["Green lamp"]